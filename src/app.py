@@ -2,10 +2,13 @@
 Tavern Translator — FastAPI 应用入口
 使用工厂模式创建 FastAPI 应用实例
 """
+import asyncio
+import sqlite3
 import uvicorn
 import logging
 import sys
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import FileResponse
@@ -26,6 +29,41 @@ handler = logging.StreamHandler(sys.stdout)
 handler.setFormatter(logging.Formatter(log_format, datefmt=date_format))
 root_logger.addHandler(handler)
 root_logger.setLevel(logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    """应用生命周期：启动时创建共享工作池，退出时释放共享资源"""
+    from .services.worker_pool import init_batch_worker_pool, shutdown_batch_worker_pool
+    from .services.llm_pool import get_llm_pool
+    from .services.translation_cache import get_translation_cache
+    from .services.upload_index import get_upload_index, close_upload_index
+    from .services.io_pool import shutdown_io_executor
+    from .services.translation_jobs import get_job_manager
+    from .services.work_queue import close_work_queue
+    from .services.batch_checkpoint import close_batch_checkpoint_store
+
+    init_batch_worker_pool()
+    # 增量同步上传目录索引（只重新哈希新增或变化的文件）
+    # 多个工作进程同时启动时索引库可能被其他进程锁住，同步失败不影响启动，缺失的条目按需补建
+    try:
+        await asyncio.to_thread(get_upload_index().sync)
+    except sqlite3.OperationalError as e:
+        logger.warning(f"上传索引同步失败，将在访问时按需更新：{e}")
+    # 启动翻译任务拉取循环，接手队列中未完成的字段（包括其他进程遗留的过期租约）
+    get_job_manager().start()
+    yield
+    await get_job_manager().shutdown()
+    close_work_queue()
+    shutdown_batch_worker_pool()
+    await get_llm_pool().aclose()
+    cache = get_translation_cache()
+    if cache is not None:
+        cache.close()
+    close_upload_index()
+    close_batch_checkpoint_store()
+    shutdown_io_executor()
 
 
 def create_app() -> FastAPI:
@@ -37,6 +75,7 @@ def create_app() -> FastAPI:
         title=settings.app_title,
         description=settings.app_description,
         version=settings.app_version,
+        lifespan=lifespan,
     )
 
     # --- CORS 中间件 ---
@@ -49,11 +88,13 @@ def create_app() -> FastAPI:
     )
 
     # --- 注册路由 ---
-    from .routers import upload, translate, export, ai_chat, health
+    from .routers import upload, translate, jobs, export, bulk, ai_chat, health
 
     application.include_router(upload.router)
     application.include_router(translate.router)
+    application.include_router(jobs.router)
     application.include_router(export.router)
+    application.include_router(bulk.router)
     application.include_router(ai_chat.router)
     application.include_router(health.router)
 
@@ -1,107 +1,351 @@
 import asyncio
 import logging
-from typing import Dict, Any, List
-from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, AsyncIterator, Awaitable, Callable, Optional, Tuple
 from .translate import CharacterCardTranslator
 from .graphs.langgraph_translator import LangGraphCharacterCardTranslator
-from .errors import TranslationError
+from .errors import TranslationError, RetryConfig, parse_openai_error, format_error_for_log
+from .services.text_segmenter import split_text, join_segments
+from .services.worker_pool import BatchWorkerPool, get_batch_worker_pool
+from .services.field_packer import plan_packs, pack_key
+from .services.rate_limiter import AdaptiveConcurrencyLimiter, get_adaptive_limiter
+from .services.batch_checkpoint import BatchCheckpointStore, make_field_hash
+from .services.io_pool import run_io
+from .config.settings import get_settings
 from .utils import retry_with_exponential_backoff  # 仍可保留工具函数（若后续需要），但当前不直接使用异步装饰器
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+_PASSTHROUGH_KEYS = ("key", "_checkpoint", "_group", "_element")
+
+
+def _passthrough(field_data: Dict[str, Any]) -> Dict[str, Any]:
+    """调用方附加的定位键（如字段在角色卡中的路径、检查点哈希）原样带回结果"""
+    return {k: field_data[k] for k in _PASSTHROUGH_KEYS if k in field_data}
+
+
+def _is_translatable(item: Any) -> bool:
+    return isinstance(item, str) and bool(item.strip())
+
+
+def _blank_element(field_name: str, item: Any) -> Dict[str, Any]:
+    return {"field_name": field_name, "original_text": item, "translated_text": item,
+            "success": True, "attempts": 0}
+
+
+def _assemble_list_result(field_data: Dict[str, Any], elements: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """按原顺序重组列表字段的元素结果；失败元素的译文为空字符串"""
+    translated = [e for e in elements if e["attempts"] or e.get("resumed")]
+    errors = [e.get("error") or "未知错误" for e in elements if not e["success"]]
+    result = {
+        **_passthrough(field_data),
+        "field_name": field_data["field_name"],
+        "original_text": list(field_data["text"]),
+        "translated_text": [e["translated_text"] for e in elements],
+        "success": not errors,
+        "attempts": max((e["attempts"] for e in elements), default=0),
+    }
+    if errors:
+        result["error"] = f"{len(errors)}/{len(elements)} 个元素翻译失败：{errors[0]}"
+    if translated and all(e.get("resumed") for e in translated):
+        result["resumed"] = True
+    return result
+
+
 class BatchTranslator:
     """批量翻译器，支持并发和进度回报"""
     
-    def __init__(self, translator: CharacterCardTranslator, max_concurrent: int = 3):
+    def __init__(self, translator: CharacterCardTranslator, max_concurrent: int = 3,
+                 segment_max_chars: Optional[int] = None,
+                 worker_pool: Optional[BatchWorkerPool] = None,
+                 pack_short_fields: Optional[bool] = None,
+                 limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+                 checkpoint: Optional[BatchCheckpointStore] = None):
+        settings = get_settings()
         self.translator = translator
+        # 检查点存储：按批次 ID 记录已完成的字段，重新提交时跳过
+        self.checkpoint = checkpoint
         self.max_concurrent = max_concurrent
-        self.executor = ThreadPoolExecutor(max_workers=max_concurrent)
+        self.segment_max_chars = (
+            settings.batch_segment_max_chars if segment_max_chars is None else segment_max_chars
+        )
+        # 短字段打包：共享同一提示模板的短字段合并为一次 JSON 请求
+        self.pack_short_fields = (
+            settings.batch_packing_enabled if pack_short_fields is None else pack_short_fields
+        )
+        self.pack_max_chars = settings.batch_pack_max_chars
+        self.pack_token_budget = settings.batch_pack_token_budget
+        self.retry_config = RetryConfig(max_retries=settings.batch_max_retries)
+        # 同一上游 (base_url, API Key, 模型) 的自适应并发限制器在进程内共享
+        self.limiter = limiter if limiter is not None else get_adaptive_limiter(
+            translator.base_url, translator.api_key, translator.model_name
+        )
+        # 线程池与全局并发上限由进程内所有批量请求共享
+        self.worker_pool = worker_pool if worker_pool is not None else get_batch_worker_pool()
+        self.executor = self.worker_pool.executor
         self.use_langgraph = isinstance(translator, LangGraphCharacterCardTranslator)
         
-    async def translate_fields(self, fields: List[Dict[str, Any]], progress_callback=None) -> List[Dict[str, Any]]:
+    async def translate_fields(self, fields: List[Dict[str, Any]], progress_callback=None,
+                               batch_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """并发翻译多个字段，支持进度回调"""
-        semaphore = asyncio.Semaphore(self.max_concurrent)
         total_fields = len(fields)
         completed_count = 0
-        
-        async def translate_single_field(field_data: Dict[str, Any]) -> Dict[str, Any]:
-            nonlocal completed_count
-            field_name = field_data["field_name"]
-            text = field_data["text"]
-            max_retries = 5
-            initial_delay = 1
-            max_delay = 16
-            delay = initial_delay
-            attempt = 0
-            last_error = None
-
-            while attempt < max_retries:
-                attempt += 1
-                try:
-                    # 仅在实际调用时占用一个并发槽位
-                    async with semaphore:
-                        if self.use_langgraph:
-                            if field_name == "character_book.content":
-                                async_method = getattr(self.translator, "async_translate_character_book_content", None)
-                                if async_method is None:
-                                    raise AttributeError("translator 缺少 async_translate_character_book_content 方法")
-                                translated_text = await async_method(text)
-                            else:
-                                async_method = getattr(self.translator, "async_translate_field", None)
-                                if async_method is None:
-                                    raise AttributeError("translator 缺少 async_translate_field 方法")
-                                translated_text = await async_method(field_name, text)
-                        else:
-                            loop = asyncio.get_running_loop()
-                            if field_name == "character_book.content":
-                                translated_text = await loop.run_in_executor(self.executor, self.translator.translate_character_book_content, text)
-                            else:
-                                translated_text = await loop.run_in_executor(self.executor, self.translator.translate_field, field_name, text)
-
-                    # 成功则进度+1并返回
-                    completed_count += 1
-                    if progress_callback:
-                        await progress_callback(completed_count, total_fields)
-                    return {
-                        "field_name": field_name,
-                        "original_text": text,
-                        "translated_text": translated_text,
-                        "success": True,
-                        "attempts": attempt
-                    }
-                except Exception as e:
-                    last_error = e
-                    logger.warning(f"字段 {field_name} 第 {attempt} 次尝试失败: {e}")
-                    if attempt >= max_retries:
-                        break
-                    # 指数退避（带上限）
-                    await asyncio.sleep(delay)
-                    delay = min(delay * 2, max_delay)
-
-            # 全部失败，计数+1
+        results = []
+        async for result in self.iter_translate_fields(fields, batch_id):
+            results.append(result)
             completed_count += 1
             if progress_callback:
                 await progress_callback(completed_count, total_fields)
+        return results
+
+    async def iter_translate_fields(self, fields: List[Dict[str, Any]],
+                                    batch_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        并发翻译多个字段，按完成顺序逐个产出结果；迭代提前终止时取消剩余任务。
+        列表字段（text 为字符串列表，如 alternate_greetings、tags）的每个元素作为独立任务翻译，
+        全部元素完成后按原顺序重组为一个结果。
+        提供 batch_id 且启用检查点时，先产出该批次已完成的字段，只翻译其余字段，
+        每个字段翻译成功后立即写入检查点。
+        """
+        expanded: List[Dict[str, Any]] = []
+        lists: Dict[int, List[Optional[Dict[str, Any]]]] = {}
+        for index, field_data in enumerate(fields):
+            if not isinstance(field_data["text"], list):
+                expanded.append(field_data)
+                continue
+            # 空白元素无需翻译，原样保留以维持下标对齐
+            lists[index] = [
+                None if _is_translatable(item) else _blank_element(field_data["field_name"], item)
+                for item in field_data["text"]
+            ]
+            expanded.extend(
+                {"field_name": field_data["field_name"], "text": item, "_element": (index, position)}
+                for position, item in enumerate(field_data["text"]) if _is_translatable(item)
+            )
+
+        remaining = {index: elements.count(None) for index, elements in lists.items()}
+        for index, count in remaining.items():
+            if count == 0:
+                yield _assemble_list_result(fields[index], lists[index])
+
+        async for result in self._iter_checkpointed(expanded, batch_id):
+            if "_element" not in result:
+                yield result
+                continue
+            index, position = result.pop("_element")
+            lists[index][position] = result
+            remaining[index] -= 1
+            if remaining[index] == 0:
+                yield _assemble_list_result(fields[index], lists[index])
+
+    async def _iter_checkpointed(self, fields: List[Dict[str, Any]],
+                                 batch_id: Optional[str]) -> AsyncIterator[Dict[str, Any]]:
+        if batch_id is None or self.checkpoint is None:
+            async for result in self._iter_translate_pending(fields):
+                yield result
+            return
+
+        saved = await run_io(self.checkpoint.load, batch_id)
+        pending = []
+        for field_data in fields:
+            field_hash = make_field_hash(
+                field_data["field_name"], field_data["text"],
+                self.translator._get_system_prompt(field_data["field_name"]),
+                self.translator.model_name, self.translator.glossary,
+            )
+            if field_hash in saved:
+                yield {**saved[field_hash], **_passthrough(field_data), "resumed": True}
+            else:
+                pending.append({**field_data, "_checkpoint": field_hash})
+        if saved:
+            logger.info(f"批次 {batch_id} 从检查点恢复 {len(fields) - len(pending)}/{len(fields)} 个字段。")
+
+        async for result in self._iter_translate_pending(pending):
+            field_hash = result.pop("_checkpoint")
+            if result["success"]:
+                stored = {k: v for k, v in result.items() if k not in _PASSTHROUGH_KEYS}
+                await run_io(self.checkpoint.save, batch_id, field_hash, stored)
+            yield result
+
+    async def _iter_translate_pending(self, fields: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """批内去重：提示词与原文相同的字段只翻译一次，结果分发给每个重复字段"""
+        groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        for field_data in fields:
+            prompt = self.translator._get_system_prompt(field_data["field_name"])
+            groups.setdefault((prompt, field_data["text"]), []).append(field_data)
+        if len(groups) == len(fields):
+            async for result in self._iter_translate_unique(fields):
+                yield result
+            return
+
+        logger.info(f"批内有 {len(fields) - len(groups)} 个重复字段，将复用相同原文的译文。")
+        members = list(groups.values())
+        leaders = [{**group[0], "_group": i} for i, group in enumerate(members)]
+        async for result in self._iter_translate_unique(leaders):
+            shared = {k: v for k, v in result.items() if k not in _PASSTHROUGH_KEYS}
+            for field_data in members[result["_group"]]:
+                yield {**shared, "field_name": field_data["field_name"], **_passthrough(field_data)}
+
+    async def _iter_translate_unique(self, fields: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        if self.pack_short_fields:
+            packs, singles = plan_packs(
+                fields, self.translator._get_system_prompt,
+                self.pack_max_chars, self.pack_token_budget,
+            )
+        else:
+            packs, singles = [], list(range(len(fields)))
+
+        tasks = [
+            asyncio.ensure_future(self._translate_pack([fields[i] for i in pack], semaphore))
+            for pack in packs
+        ] + [
+            asyncio.ensure_future(self._translate_single_field_as_list(fields[i], semaphore))
+            for i in singles
+        ]
+        try:
+            for f in asyncio.as_completed(tasks):
+                for result in await f:
+                    yield result
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _translate_single_field(self, field_data: Dict[str, Any], semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        """翻译单个字段（带重试），超长文本切分后并发翻译各片段，返回结果字典"""
+        field_name = field_data["field_name"]
+        text = field_data["text"]
+
+        segments = split_text(text, self.segment_max_chars)
+        if len(segments) > 1:
+            logger.info(f"字段 {field_name} 过长（{len(text)} 字符），切分为 {len(segments)} 段并发翻译。")
+            pending = [seg for seg in segments if seg.text]
+            outcomes = await asyncio.gather(*(
+                self._translate_with_retry(field_name, seg.text, semaphore)
+                for seg in pending
+            ))
+            attempt = max(attempts for _, attempts, _ in outcomes)
+            errors = [error for translated, _, error in outcomes if translated is None]
+            if not errors:
+                translated_iter = iter(translated for translated, _, _ in outcomes)
+                translated_text = join_segments(
+                    segments, [next(translated_iter) if seg.text else "" for seg in segments]
+                )
+            else:
+                translated_text, last_error = None, errors[0]
+        else:
+            translated_text, attempt, last_error = await self._translate_with_retry(field_name, text, semaphore)
+
+        if translated_text is not None:
             return {
+                **_passthrough(field_data),
                 "field_name": field_name,
                 "original_text": text,
-                "translated_text": "",
-                "success": False,
-                "error": str(last_error) if last_error else "未知错误",
+                "translated_text": translated_text,
+                "success": True,
                 "attempts": attempt
             }
-        
-        # 创建所有翻译任务
-        tasks = [translate_single_field(field_data) for field_data in fields]
-        
-        # 等待所有任务完成
+        return {
+            **_passthrough(field_data),
+            "field_name": field_name,
+            "original_text": text,
+            "translated_text": "",
+            "success": False,
+            "error": str(last_error) if last_error else "未知错误",
+            "attempts": attempt
+        }
+
+    async def _translate_single_field_as_list(self, field_data: Dict[str, Any],
+                                              semaphore: asyncio.Semaphore) -> List[Dict[str, Any]]:
+        return [await self._translate_single_field(field_data, semaphore)]
+
+    async def _translate_pack(self, pack_fields: List[Dict[str, Any]],
+                              semaphore: asyncio.Semaphore) -> List[Dict[str, Any]]:
+        """在一次请求中翻译一组短字段，解析失败的字段回退为逐字段翻译"""
+        # 同一组内的字段共享提示模板，取第一个字段名即可
+        field_name = pack_fields[0]["field_name"]
+        items = {pack_key(i): f["text"] for i, f in enumerate(pack_fields)}
+        translated, attempt, _ = await self._run_with_retry(
+            f"打包字段组 {field_name}×{len(items)}",
+            lambda: self.translator.async_translate_packed(field_name, items),
+            semaphore,
+        )
+        translated = translated or {}
+
         results = []
-        for f in asyncio.as_completed(tasks):
-            result = await f
-            results.append(result)
-            
+        fallback = []
+        for i, field_data in enumerate(pack_fields):
+            key = pack_key(i)
+            if key in translated:
+                results.append({
+                    **_passthrough(field_data),
+                    "field_name": field_data["field_name"],
+                    "original_text": field_data["text"],
+                    "translated_text": translated[key],
+                    "success": True,
+                    "attempts": attempt
+                })
+            else:
+                fallback.append(field_data)
+
+        if fallback:
+            results.extend(await asyncio.gather(*(
+                self._translate_single_field(field_data, semaphore) for field_data in fallback
+            )))
         return results
-        
-    def __del__(self):
-        self.executor.shutdown(wait=True)
\ No newline at end of file
+
+    async def _translate_with_retry(self, field_name: str, text: str,
+                                    semaphore: asyncio.Semaphore) -> Tuple[Optional[str], int, Optional[Exception]]:
+        """调用底层翻译器（带指数退避重试），返回 (译文或 None, 尝试次数, 最后一次错误)"""
+        return await self._run_with_retry(
+            f"字段 {field_name}",
+            lambda: self._invoke_translator(field_name, text),
+            semaphore,
+        )
+
+    async def _invoke_translator(self, field_name: str, text: str) -> str:
+        """按翻译器类型调用对应的翻译方法"""
+        if self.use_langgraph:
+            if field_name == "character_book.content":
+                async_method = getattr(self.translator, "async_translate_character_book_content", None)
+                if async_method is None:
+                    raise AttributeError("translator 缺少 async_translate_character_book_content 方法")
+                return await async_method(text)
+            async_method = getattr(self.translator, "async_translate_field", None)
+            if async_method is None:
+                raise AttributeError("translator 缺少 async_translate_field 方法")
+            return await async_method(field_name, text)
+
+        loop = asyncio.get_running_loop()
+        if field_name == "character_book.content":
+            return await loop.run_in_executor(self.executor, self.translator.translate_character_book_content, text)
+        return await loop.run_in_executor(self.executor, self.translator.translate_field, field_name, text)
+
+    async def _run_with_retry(self, label: str, call: Callable[[], Awaitable[Any]],
+                              semaphore: asyncio.Semaphore) -> Tuple[Optional[Any], int, Optional[Exception]]:
+        """在并发槽位内执行调用（按错误类型退避重试），返回 (结果或 None, 尝试次数, 最后一次错误)"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        attempt = 0
+        last_error = None
+
+        while True:
+            attempt += 1
+            try:
+                # 仅在实际调用时占用请求级、上游自适应和全局三种槽位
+                async with semaphore, self.limiter.slot(), self.worker_pool.slot():
+                    result = await call()
+                self.limiter.record_success()
+                return result, attempt, None
+            except Exception as e:
+                last_error = e
+                error = parse_openai_error(e)
+                self.limiter.record_failure(error)
+                logger.warning(f"{label} 第 {attempt} 次尝试失败: {format_error_for_log(error)}")
+                if not self.retry_config.should_retry(attempt, loop.time() - started, error):
+                    break
+                # 优先遵守 Retry-After，否则按错误类型的退避策略
+                await asyncio.sleep(min(error.get_retry_delay(attempt - 1), self.retry_config.max_delay))
+
+        return None, attempt, last_error
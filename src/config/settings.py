@@ -4,6 +4,7 @@
 """
 import os
 from functools import lru_cache
+from typing import Literal
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -26,6 +27,17 @@ class AppSettings(BaseSettings):
     # --- 文件夹 ---
     upload_folder: str = Field(default=".uploads", description="上传文件保存目录")
     output_folder: str = Field(default=".output", description="输出文件保存目录")
+    upload_index_filename: str = Field(default="upload_index.sqlite3", description="上传目录内容哈希索引数据库文件名")
+    upload_chunk_size: int = Field(default=64 * 1024, description="上传文件流式读取的分块大小（字节）")
+    card_embed_chunk_type: Literal["tEXt", "zTXt", "iTXt"] = Field(
+        default="tEXt", description="导出角色卡时写入的元数据块类型（tEXt 兼容性最好，zTXt/iTXt 为压缩格式）"
+    )
+    card_embed_compression_level: int = Field(default=9, ge=0, le=9, description="zTXt/iTXt 的 zlib 压缩级别")
+    export_cache_max_bytes: int = Field(default=64 * 1024 * 1024, description="导出结果内存缓存容量（字节），0 表示禁用")
+    io_max_workers: int = Field(default=8, description="文件 I/O 线程池的线程数")
+    bulk_max_cards: int = Field(default=1000, description="单次批量导入导出的最大角色卡数")
+    bulk_max_card_size: int = Field(default=50 * 1024 * 1024, description="批量导入中单张角色卡的最大字节数")
+    bulk_import_concurrency: int = Field(default=4, description="批量导入时同时读取并处理的角色卡数（限制内存占用）")
 
     # --- CORS ---
     cors_origins: list[str] = ["*"]
@@ -37,9 +49,51 @@ class AppSettings(BaseSettings):
     default_base_url: str = "https://api.openai.com/v1"
     max_completion_tokens: int = 8192
 
+    # --- LLM 客户端池 ---
+    llm_pool_max_size: int = Field(default=32, description="共享 LLM 客户端的最大数量")
+    llm_pool_idle_timeout: float = Field(default=600.0, description="客户端空闲多久后被回收（秒）")
+    llm_max_connections: int = Field(default=20, description="单个客户端的最大连接数")
+    llm_max_keepalive_connections: int = Field(default=10, description="单个客户端保持的长连接数")
+    llm_keepalive_expiry: float = Field(default=60.0, description="长连接空闲过期时间（秒）")
+
+    # --- 上游配额（令牌桶） ---
+    provider_default_rpm: int = Field(default=0, description="默认每分钟请求数上限，0 表示不限制")
+    provider_default_tpm: int = Field(default=0, description="默认每分钟 token 数上限，0 表示不限制")
+    provider_rate_limits: dict[str, dict[str, int]] = Field(
+        default_factory=dict,
+        description='按 base_url 配置的配额，例如 {"https://api.openai.com/v1": {"rpm": 500, "tpm": 200000}}',
+    )
+
+    # --- 翻译缓存 ---
+    translation_cache_enabled: bool = Field(default=True, description="是否启用翻译结果缓存")
+    translation_cache_filename: str = Field(default="translation_cache.sqlite3", description="缓存数据库文件名（位于上传目录）")
+    translation_cache_memory_size: int = Field(default=1024, description="内存 LRU 层的条目数")
+    translation_cache_max_entries: int = Field(default=100_000, description="磁盘层的最大条目数")
+    translation_cache_ttl: float = Field(default=30 * 24 * 3600, description="缓存有效期（秒），0 表示永不过期")
+    translation_single_flight_enabled: bool = Field(default=True, description="是否合并相同的并发翻译请求（只向上游发送一次）")
+
     # --- 批量翻译 ---
     batch_max_concurrent: int = 3
+    batch_global_max_concurrent: int = Field(default=16, description="进程内所有批量请求共享的并发上限（同时也是工作线程数）")
     batch_max_retries: int = 5
+    lorebook_max_concurrent: int = Field(default=8, description="整本角色书翻译时单个请求的并发上限")
+    lorebook_max_entries: int = Field(default=2000, description="整本角色书翻译允许的最大条目数")
+    batch_checkpoint_enabled: bool = Field(default=True, description="是否为带批次 ID 的批量翻译记录检查点")
+    batch_checkpoint_filename: str = Field(default="batch_checkpoints.sqlite3", description="检查点数据库文件名（位于上传目录）")
+    batch_checkpoint_ttl: float = Field(default=7 * 24 * 3600, description="检查点保留时长（秒），0 表示永不过期")
+    job_queue_filename: str = Field(default="job_queue.sqlite3", description="跨进程共享的翻译任务队列数据库文件名（位于上传目录下）")
+    job_worker_concurrency: int = Field(default=8, description="每个进程同时执行的任务字段数")
+    job_global_budget: int = Field(default=16, description="所有进程同时执行的任务字段总数上限")
+    job_lease_seconds: float = Field(default=300.0, description="字段租约时长（秒），进程失联超过该时长后由其他进程接手")
+    job_poll_interval: float = Field(default=0.5, description="工作循环与状态订阅轮询队列的间隔（秒）")
+    job_retention_seconds: float = Field(default=3600.0, description="已结束的翻译任务保留时长（秒）")
+    adaptive_initial_concurrency: int = Field(default=4, description="每个上游 (base_url, API Key, 模型) 的初始并发上限")
+    adaptive_min_concurrency: int = Field(default=1, description="自适应并发的下限")
+    adaptive_max_concurrency: int = Field(default=32, description="自适应并发的上限")
+    batch_packing_enabled: bool = Field(default=False, description="是否默认将短字段打包为单次 JSON 请求")
+    batch_pack_max_chars: int = Field(default=300, description="可参与打包的字段最大长度（字符）")
+    batch_pack_token_budget: int = Field(default=1500, description="单个打包请求的输入 token 预算")
+    batch_segment_max_chars: int = Field(default=4000, description="超过该长度的字段按段落切分后并发翻译，0 表示不切分")
 
     model_config = {
         "env_prefix": "TT_",
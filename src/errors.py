@@ -2,6 +2,7 @@
 错误类型定义模块
 参照 OpenAI API 和标准 HTTP 状态码定义完整的错误类型体系
 """
+import re
 import time
 from enum import Enum
 from typing import Optional, Dict, Any
@@ -131,17 +132,12 @@ def parse_http_error(status_code: int, response_text: str = "") -> TranslationEr
         if response_text:
             message += f": {response_text}"
         
-        retry_after = None
-        if status_code == 429:
-            # 对于 429 错误，尝试从响应中提取 Retry-After 信息
-            retry_after = 30  # 默认30秒
-        
+        # 429 未携带 Retry-After 时不设默认值，由调用方按指数退避处理
         return TranslationError(
             error_code=error_code,
             message=message,
             severity=severity,
             http_status=status_code,
-            retry_after=retry_after,
             context={"response_text": response_text}
         )
     else:
@@ -154,8 +150,44 @@ def parse_http_error(status_code: int, response_text: str = "") -> TranslationEr
         )
 
 
+_RETRY_AFTER_PATTERN = re.compile(
+    r"(?:try again in|retry after|retry-after:?)\s*(\d+(?:\.\d+)?)\s*(ms|s|sec|seconds?)?",
+    re.IGNORECASE,
+)
+
+
+def extract_retry_after(exception: Exception) -> Optional[int]:
+    """从异常的响应头（Retry-After）或错误消息中提取建议的重试延迟（秒）。"""
+    response = getattr(exception, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is not None:
+        value = headers.get("retry-after")
+        if value:
+            try:
+                return max(1, int(float(value) + 0.999))
+            except ValueError:
+                pass
+        value = headers.get("retry-after-ms")
+        if value:
+            try:
+                return max(1, int(float(value) / 1000 + 0.999))
+            except ValueError:
+                pass
+
+    match = _RETRY_AFTER_PATTERN.search(str(exception))
+    if match:
+        seconds = float(match.group(1))
+        if (match.group(2) or "").lower() == "ms":
+            seconds /= 1000
+        return max(1, int(seconds + 0.999))
+    return None
+
+
 def parse_openai_error(exception: Exception) -> TranslationError:
     """解析 OpenAI API 错误，返回对应的翻译错误。"""
+    if isinstance(exception, TranslationError):
+        return exception
+
     error_str = str(exception).lower()
     
     # 检查常见的 OpenAI 错误模式
@@ -176,7 +208,8 @@ def parse_openai_error(exception: Exception) -> TranslationError:
             error_code=ErrorCode.RATE_LIMIT_ERROR,
             message=f"API请求频率超限: {str(exception)}",
             severity=ErrorSeverity.MEDIUM,
-            retry_after=30
+            http_status=getattr(exception, "status_code", None),
+            retry_after=extract_retry_after(exception)
         )
     elif "timeout" in error_str:
         return TranslationError(
@@ -1,155 +1,269 @@
 from PIL import Image
+import os
 import zlib
 import base64
 import json
 import logging
-from typing import Union
+from typing import BinaryIO, Union
 
-def extract_embedded_text(source: Union[str, bytes]):
+from .config.settings import get_settings
+from .png_chunks import (
+    iter_chunks, index_chunks, open_png, is_png, build_chunk,
+    iter_png_parts, write_png_parts, iter_chunk_headers, read_chunk_data,
+    TEXT_CHUNK_TYPES,
+)
+
+# 角色卡元数据使用的文本块关键字（V2 为 chara，V3 为 ccv3）
+CHARACTER_KEYWORDS = ("chara", "ccv3")
+# PNG 规范中关键字最长 79 字节，加上分隔符
+_MAX_KEYWORD_PREFIX = 80
+
+def _decode_text_chunk(chunk_type: bytes, chunk_data: bytes):
+    """解析文本块，返回 (keyword, text_data)。"""
+    if chunk_type == b'tEXt':
+        # tEXt格式: keyword\0text
+        null_pos = chunk_data.find(b'\x00')
+        if null_pos != -1:
+            keyword = chunk_data[:null_pos].decode('latin-1')
+            text_data = chunk_data[null_pos+1:].decode('latin-1')
+        else:
+            # 没有null分隔符，尝试直接解码
+            text_data = chunk_data.decode('utf-8')
+            keyword = None
+    elif chunk_type == b'iTXt':
+        # iTXt格式: keyword\0compression_flag compression_method language\0translated_keyword\0text
+        null_pos = chunk_data.find(b'\x00')
+        keyword = chunk_data[:null_pos].decode('latin-1')
+        compression_flag = chunk_data[null_pos+1]
+        rest = chunk_data[null_pos+3:]
+        language_end = rest.find(b'\x00')
+        translated_end = rest.find(b'\x00', language_end + 1)
+        text_bytes = rest[translated_end+1:]
+        if compression_flag:
+            text_bytes = zlib.decompress(text_bytes)
+        text_data = text_bytes.decode('utf-8')
+    else:
+        # zTXt格式: keyword\0compression_method\0compressed_text
+        null_pos = chunk_data.find(b'\x00')
+        if null_pos != -1:
+            keyword = chunk_data[:null_pos].decode('latin-1')
+            compressed = chunk_data[null_pos+2:]  # 跳过keyword和compression_method
+            text_data = zlib.decompress(compressed).decode('utf-8')
+        else:
+            text_data = zlib.decompress(chunk_data).decode('utf-8')
+            keyword = None
+    return keyword, text_data
+
+
+def _parse_character_text(keyword, text_data):
+    """从文本块内容中解析角色卡 JSON，不匹配时返回 None。"""
+    # 情况1: keyword是"chara"/"ccv3"，text_data是base64编码的JSON
+    if keyword in CHARACTER_KEYWORDS:
+        try:
+            decoded_data = base64.b64decode(text_data).decode('utf-8')
+            return json.loads(decoded_data)
+        except:
+            pass
+        # 情况1b: iTXt 中直接存放 UTF-8 JSON（未经 base64 编码）
+        if text_data.lstrip().startswith('{'):
+            try:
+                return json.loads(text_data)
+            except:
+                pass
+
+    # 情况2: text_data以"chara\0"开头（旧格式）
+    if text_data.startswith("chara"):
+        try:
+            b64_data = text_data[6:]  # 跳过 "chara\0"
+            decoded_data = base64.b64decode(b64_data).decode('utf-8')
+            return json.loads(decoded_data)
+        except:
+            pass
+    return None
+
+
+def _is_character_chunk(prefix: bytes) -> bool:
+    """根据文本块数据开头的关键字判断是否为角色卡数据块"""
+    null_pos = prefix.find(b'\x00', 0, _MAX_KEYWORD_PREFIX)
+    return null_pos != -1 and prefix[:null_pos].decode('latin-1') in CHARACTER_KEYWORDS
+
+
+def extract_from_text_chunks(text_chunks):
+    """
+    从 (块类型, 块数据) 序列中解析第一个角色卡数据，未找到时返回 None。
+    只解码 chara/ccv3 关键字的文本块，单个损坏的块会被跳过。
+    """
+    for chunk_type, chunk_data in text_chunks:
+        if chunk_type not in TEXT_CHUNK_TYPES or not _is_character_chunk(chunk_data):
+            continue
+        try:
+            keyword, text_data = _decode_text_chunk(chunk_type, chunk_data)
+        except Exception as e:
+            logging.warning(f"跳过无法解码的角色卡文本块：{e}")
+            continue
+        character = _parse_character_text(keyword, text_data)
+        if character is not None:
+            return character
+    # 未找到嵌入的文本
+    return None
+
+
+def extract_from_buffer(buf, chunks=None):
+    """
+    从 PNG 缓冲区（bytes/memoryview/mmap）中提取角色数据。
+    可传入已建立的块索引以避免重复遍历；只复制文本块本身的数据。
+    """
+    view = memoryview(buf)
+    if chunks is None:
+        chunks = iter_chunks(view)
+    return extract_from_text_chunks(
+        (chunk.type, bytes(chunk.data(view)))
+        for chunk in chunks if chunk.type in TEXT_CHUNK_TYPES
+    )
+
+
+def extract_embedded_text(source: Union[str, bytes, bytearray, memoryview]):
     """从PNG文件路径或字节流中提取嵌入的文本数据。"""
     try:
         if isinstance(source, str):
-            with open(source, 'rb') as f:
-                data = f.read()
-        elif isinstance(source, bytes):
-            data = source
+            with open_png(source) as view:
+                if not is_png(view):
+                    logging.warning("无效的PNG文件格式")
+                    return None
+                return extract_from_buffer(view)
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            if not is_png(source):
+                logging.warning("无效的PNG文件格式")
+                return None
+            return extract_from_buffer(source)
         else:
             raise TypeError("源必须是文件路径（str）或字节（bytes）。")
 
-        # 验证PNG文件头
-        png_signature = b'\x89PNG\r\n\x1a\n'
-        if not data.startswith(png_signature):
-            logging.warning("无效的PNG文件格式")
-            return None
-
-        # 遍历PNG块
-        offset = len(png_signature)
-        while offset < len(data):
-            chunk_length = int.from_bytes(data[offset:offset+4], byteorder='big')
-            chunk_type = data[offset+4:offset+8]
-
-            if chunk_type in (b'tEXt', b'zTXt'):
-                chunk_data = data[offset+8:offset+8+chunk_length]
-                
-                # 处理不同类型的文本块
-                if chunk_type == b'tEXt':
-                    # tEXt格式: keyword\0text
-                    null_pos = chunk_data.find(b'\x00')
-                    if null_pos != -1:
-                        keyword = chunk_data[:null_pos].decode('latin-1')
-                        text_data = chunk_data[null_pos+1:].decode('latin-1')
-                    else:
-                        # 没有null分隔符，尝试直接解码
-                        text_data = chunk_data.decode('utf-8')
-                        keyword = None
-                elif chunk_type == b'zTXt':
-                    # zTXt格式: keyword\0compression_method\0compressed_text
-                    null_pos = chunk_data.find(b'\x00')
-                    if null_pos != -1:
-                        keyword = chunk_data[:null_pos].decode('latin-1')
-                        compressed = chunk_data[null_pos+2:]  # 跳过keyword和compression_method
-                        text_data = zlib.decompress(compressed).decode('utf-8')
-                    else:
-                        text_data = zlib.decompress(chunk_data).decode('utf-8')
-                        keyword = None
-                
-                # 处理角色卡数据
-                # 情况1: keyword是"chara"，text_data是base64编码的JSON
-                if keyword == "chara":
-                    try:
-                        decoded_data = base64.b64decode(text_data).decode('utf-8')
-                        return json.loads(decoded_data)
-                    except:
-                        pass
-                
-                # 情况2: text_data以"chara\0"开头（旧格式）
-                if text_data.startswith("chara"):
-                    try:
-                        b64_data = text_data[6:]  # 跳过 "chara\0"
-                        decoded_data = base64.b64decode(b64_data).decode('utf-8')
-                        return json.loads(decoded_data)
-                    except:
-                        pass
-            
-            offset += 8 + chunk_length + 4
-
-        # 未找到嵌入的文本
+    except Exception as e:
+        logging.error(f"提取文本数据时出错：{e}")
         return None
 
+
+def read_character_metadata(source: Union[str, BinaryIO]):
+    """
+    只读取块头的早停式元数据读取器。
+    逐块读取 8 字节块头，seek 跳过 IDAT 等图像数据，对文本块仅先读取关键字前缀，
+    命中 chara/ccv3 关键字的第一个文本块后立即返回解析结果；未找到时返回 None。
+    source 可以是文件路径或可 seek 的二进制文件对象。
+    """
+    try:
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                return _read_character_metadata(f)
+        return _read_character_metadata(source)
     except Exception as e:
-        logging.error(f"提取文本数据时出错：{e}")
+        logging.error(f"读取角色元数据时出错：{e}")
         return None
 
-def embed_text_in_png(png_file_path, text_data, output_path=None):
+
+def _read_character_metadata(f: BinaryIO):
+    for chunk in iter_chunk_headers(f):
+        # IDAT 等非文本块只读块头，数据直接跳过
+        if chunk.type not in TEXT_CHUNK_TYPES:
+            continue
+        if not _is_character_chunk(read_chunk_data(f, chunk, limit=_MAX_KEYWORD_PREFIX)):
+            continue
+        keyword, text_data = _decode_text_chunk(chunk.type, read_chunk_data(f, chunk))
+        character = _parse_character_text(keyword, text_data)
+        if character is not None:
+            return character
+    return None
+
+
+def _unwrap_character_data(text_data):
+    # 提取实际的角色数据（去掉 "data" 包装层如果存在）
+    if isinstance(text_data, dict) and "data" in text_data and len(text_data) == 1:
+        # 只有 "data" 一个键，这是包装格式，提取内部数据
+        return text_data["data"]
+    return text_data
+
+
+def build_text_chunk(text_data, chunk_type: bytes = b'tEXt', keyword: str = "chara",
+                     compression_level: int = 6) -> bytes:
+    """
+    将角色数据编码为文本块：
+    - tEXt: keyword\0base64(JSON)
+    - zTXt: keyword\0\0zlib(base64(JSON))（zTXt 只允许 Latin-1 文本，仍使用 base64）
+    - iTXt: keyword\0\x01\0\0\0zlib(JSON)（UTF-8 JSON 直接压缩，体积最小）
+    """
+    json_bytes = json.dumps(_unwrap_character_data(text_data), ensure_ascii=False).encode('utf-8')
+    prefix = keyword.encode('latin-1') + b'\x00'
+    if chunk_type == b'iTXt':
+        # 压缩标志 1、压缩方法 0、空语言标签、空翻译关键字
+        return build_chunk(b'iTXt', prefix + b'\x01\x00\x00\x00' + zlib.compress(json_bytes, compression_level))
+
+    # 将数据编码为JSON字符串，然后base64编码
+    b64_data = base64.b64encode(json_bytes)
+    if chunk_type == b'zTXt':
+        return build_chunk(b'zTXt', prefix + b'\x00' + zlib.compress(b64_data, compression_level))
+    return build_chunk(b'tEXt', prefix + b64_data)
+
+
+def build_card_chunks(text_data, chunk_type=None, compression_level=None) -> list:
+    """
+    按配置的块类型与压缩级别构造角色卡元数据块。
+    V3 角色卡（spec 为 chara_card_v3）同时写入 chara 与 ccv3 两个关键字。
+    """
+    settings = get_settings()
+    if chunk_type is None:
+        chunk_type = settings.card_embed_chunk_type.encode('ascii')
+    if compression_level is None:
+        compression_level = settings.card_embed_compression_level
+
+    keywords = ["chara"]
+    actual_data = _unwrap_character_data(text_data)
+    if isinstance(actual_data, dict) and actual_data.get("spec") == "chara_card_v3":
+        keywords.append("ccv3")
+    return [build_text_chunk(text_data, chunk_type, keyword, compression_level) for keyword in keywords]
+
+
+def embed_text_in_bytes(png_data, text_data, chunk_type=None, compression_level=None) -> bytes:
+    """
+    在内存中将文本数据嵌入PNG：单次遍历块索引，拼接除文本块外的原始字节区间和新的元数据块。
+    输入不是合法PNG时抛出 ValueError。
+    """
+    view = memoryview(png_data)
+    chunks = index_chunks(view)
+    new_chunks = build_card_chunks(text_data, chunk_type, compression_level)
+    return b''.join(iter_png_parts(view, chunks, new_chunks))
+
+
+def embed_text_in_png(png_file_path, text_data, output_path=None, chunk_type=None, compression_level=None):
     """
     将文本数据嵌入PNG文件:
-    1. 读取原始PNG二进制数据
-    2. 遍历所有块，忽略原有的文本块
-    3. 构造新的tEXt块并在IEND前插入
+    1. 以只读 mmap 打开原始PNG，单次遍历建立块索引
+    2. 流式写出除文本块外的原始字节区间（不复制图像数据）
+    3. 在IEND前插入新的元数据块（tEXt/zTXt/iTXt，见 build_card_chunks）
+    输出路径与输入相同时先写入临时文件再原子替换。
     """
     try:
         if output_path is None:
             output_path = png_file_path
 
-        with open(png_file_path, 'rb') as f:
-            data = f.read()
-
-        if not data.startswith(b'\x89PNG\r\n\x1a\n'):
-            raise ValueError("非法的PNG文件格式")
-
-        # 收集除文本块和IEND块外的所有PNG块
-        chunks = []
-        offset = 8
-        while offset < len(data):
-            chunk_length = int.from_bytes(data[offset:offset+4], byteorder='big')
-            chunk_type = data[offset+4:offset+8]
-            chunk_data = data[offset+8:offset+8+chunk_length]
-            chunk_crc = data[offset+8+chunk_length:offset+8+chunk_length+4]
-            if chunk_type not in (b'tEXt', b'zTXt', b'IEND'):
-                chunks.append((chunk_length, chunk_type, chunk_data, chunk_crc))
-            offset += 8 + chunk_length + 4
-
-        # 构造新的文本块（使用tEXt块，不做压缩）
-        # 提取实际的角色数据（去掉 "data" 包装层如果存在）
-        if isinstance(text_data, dict) and "data" in text_data and len(text_data) == 1:
-            # 只有 "data" 一个键，这是包装格式，提取内部数据
-            actual_data = text_data["data"]
-        else:
-            actual_data = text_data
-        
-        # 将数据编码为JSON字符串，然后base64编码
-        json_str = json.dumps(actual_data, ensure_ascii=False)
-        b64_data = base64.b64encode(json_str.encode('utf-8')).decode('utf-8')
-        
-        # tEXt块格式: keyword\0text
-        # keyword = "chara", text = base64编码的JSON
-        keyword = b'chara'
-        text_bytes = b64_data.encode('utf-8')
-        chunk_content = keyword + b'\x00' + text_bytes
-        
-        new_chunk_length = len(chunk_content)
-        new_length_bytes = new_chunk_length.to_bytes(4, byteorder='big')
-        new_chunk_type = b'tEXt'
-        new_chunk_crc = zlib.crc32(new_chunk_type + chunk_content).to_bytes(4, byteorder='big')
-        new_text_chunk = new_length_bytes + new_chunk_type + chunk_content + new_chunk_crc
-
-        # 重构PNG文件：在IEND前插入新的文本块
-        new_data = bytearray(b'\x89PNG\r\n\x1a\n')
-        for cl, ct, cd, crc in chunks:
-            new_data.extend(cl.to_bytes(4, byteorder='big'))
-            new_data.extend(ct)
-            new_data.extend(cd)
-            new_data.extend(crc)
-        
-        # 在IEND前添加新的文本块
-        new_data.extend(new_text_chunk)
-
-        # 在末尾添加IEND块
-        iend_chunk = b'\x00\x00\x00\x00IEND\xaeB`\x82'
-        new_data.extend(iend_chunk)
-
-        with open(output_path, 'wb') as f:
-            f.write(new_data)
+        new_chunks = build_card_chunks(text_data, chunk_type, compression_level)
+        in_place = os.path.abspath(output_path) == os.path.abspath(png_file_path)
+        target_path = f"{output_path}.{os.getpid()}.tmp" if in_place else output_path
+
+        try:
+            with open_png(png_file_path) as view:
+                chunks = index_chunks(view)
+                parts = iter_png_parts(view, chunks, new_chunks)
+                try:
+                    with open(target_path, 'wb') as f:
+                        write_png_parts(parts, f)
+                finally:
+                    parts.close()
+                del parts, chunks
+            if in_place:
+                os.replace(target_path, output_path)
+        finally:
+            if in_place and os.path.exists(target_path):
+                os.remove(target_path)
         return output_path
 
     except Exception as e:
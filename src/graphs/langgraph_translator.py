@@ -1,11 +1,12 @@
 """
 基于 LangGraph 的翻译器，继承 BaseTranslator 并集成 LangGraph 工作流
 """
-from typing import Dict
+from typing import Dict, Optional
 import logging
 
 from .translation_graph import translation_graph, async_translation_graph
 from ..services.translation_service import BaseTranslator
+from ..services.translation_cache import TranslationCache
 from ..errors import parse_openai_error
 
 logger = logging.getLogger(__name__)
@@ -16,8 +17,8 @@ class LangGraphCharacterCardTranslator(BaseTranslator):
 
     def __init__(self, model_name: str, base_url: str, api_key: str,
                  prompts: Dict[str, str], glossary: str = '',
-                 custom_logger=None):
-        super().__init__(model_name, base_url, api_key, prompts, glossary, custom_logger)
+                 custom_logger=None, cache: Optional[TranslationCache] = None):
+        super().__init__(model_name, base_url, api_key, prompts, glossary, custom_logger, cache)
 
     # ------------------------------------------------------------------
     # 内部工具方法
@@ -35,6 +36,7 @@ class LangGraphCharacterCardTranslator(BaseTranslator):
             "system_prompt": system_prompt,
             "status": "pending",
             "error_message": None,
+            "error": None,
         }
 
     def _handle_graph_result(self, final_state: dict, label: str) -> str:
@@ -44,7 +46,8 @@ class LangGraphCharacterCardTranslator(BaseTranslator):
             return final_state["translated_text"]
         else:
             self.logger.error(f"翻译 {label} 失败: {final_state['error_message']}")
-            error = parse_openai_error(Exception(final_state["error_message"]))
+            # 优先使用图节点中解析的原始错误，保留 HTTP 状态码与 Retry-After 响应头
+            error = final_state.get("error") or parse_openai_error(Exception(final_state["error_message"]))
             raise error
 
     # ------------------------------------------------------------------
@@ -58,11 +61,17 @@ class LangGraphCharacterCardTranslator(BaseTranslator):
             return text
 
         system_prompt = self._get_system_prompt(field_name)
+        cached = self._get_cached_translation(system_prompt, text)
+        if cached is not None:
+            self.logger.debug(f"字段 {field_name} 命中翻译缓存。")
+            return cached
         initial_state = self._build_initial_state(field_name, text, system_prompt)
 
         try:
             final_state = translation_graph.invoke(initial_state)
-            return self._handle_graph_result(final_state, f"字段 {field_name}")
+            translated = self._handle_graph_result(final_state, f"字段 {field_name}")
+            self._store_cached_translation(system_prompt, text, translated)
+            return translated
         except Exception as e:
             self.logger.error(f"LangGraph 翻译字段 {field_name} 失败: {str(e)}")
             error = parse_openai_error(e)
@@ -75,11 +84,17 @@ class LangGraphCharacterCardTranslator(BaseTranslator):
             return content
 
         system_prompt = self.prompts.get("base_template", "") + self._build_glossary_instruction()
+        cached = self._get_cached_translation(system_prompt, content)
+        if cached is not None:
+            self.logger.debug("character_book.content 命中翻译缓存。")
+            return cached
         initial_state = self._build_initial_state("character_book.content", content, system_prompt)
 
         try:
             final_state = translation_graph.invoke(initial_state)
-            return self._handle_graph_result(final_state, "character_book.content")
+            translated = self._handle_graph_result(final_state, "character_book.content")
+            self._store_cached_translation(system_prompt, content, translated)
+            return translated
         except Exception as e:
             self.logger.error(f"LangGraph 翻译 character_book.content 失败: {str(e)}")
             error = parse_openai_error(e)
@@ -96,11 +111,20 @@ class LangGraphCharacterCardTranslator(BaseTranslator):
             return text
 
         system_prompt = self._get_system_prompt(field_name)
+        cached = self._get_cached_translation(system_prompt, text)
+        if cached is not None:
+            self.logger.debug(f"字段 {field_name} 命中翻译缓存。")
+            return cached
         initial_state = self._build_initial_state(field_name, text, system_prompt)
 
-        try:
+        async def run() -> str:
             final_state = await async_translation_graph.ainvoke(initial_state)
-            return self._handle_graph_result(final_state, f"字段 {field_name}")
+            translated = self._handle_graph_result(final_state, f"字段 {field_name}")
+            self._store_cached_translation(system_prompt, text, translated)
+            return translated
+
+        try:
+            return await self._coalesced(system_prompt, text, run)
         except Exception as e:
             self.logger.error(f"异步 LangGraph 翻译字段 {field_name} 失败: {str(e)}")
             error = parse_openai_error(e)
@@ -113,12 +137,33 @@ class LangGraphCharacterCardTranslator(BaseTranslator):
             return content
 
         system_prompt = self.prompts.get("base_template", "") + self._build_glossary_instruction()
+        cached = self._get_cached_translation(system_prompt, content)
+        if cached is not None:
+            self.logger.debug("character_book.content 命中翻译缓存。")
+            return cached
         initial_state = self._build_initial_state("character_book.content", content, system_prompt)
 
-        try:
+        async def run() -> str:
             final_state = await async_translation_graph.ainvoke(initial_state)
-            return self._handle_graph_result(final_state, "character_book.content")
+            translated = self._handle_graph_result(final_state, "character_book.content")
+            self._store_cached_translation(system_prompt, content, translated)
+            return translated
+
+        try:
+            return await self._coalesced(system_prompt, content, run)
         except Exception as e:
             self.logger.error(f"异步 LangGraph 翻译 character_book.content 失败: {str(e)}")
             error = parse_openai_error(e)
-            raise error
\ No newline at end of file
+            raise error
+
+    async def _async_complete(self, label: str, system_prompt: str, text: str) -> str:
+        """使用自定义系统提示词执行异步翻译图，返回原始回复"""
+        initial_state = self._build_initial_state(label, text, system_prompt)
+
+        try:
+            final_state = await async_translation_graph.ainvoke(initial_state)
+            return self._handle_graph_result(final_state, label)
+        except Exception as e:
+            self.logger.error(f"异步 LangGraph 执行 {label} 失败: {str(e)}")
+            error = parse_openai_error(e)
+            raise error
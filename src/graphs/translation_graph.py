@@ -1,14 +1,16 @@
 """
 基于LangGraph的角色卡翻译工作流
 """
-from typing import TypedDict, Annotated, Literal
+from typing import TypedDict, Annotated, Literal, Optional
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
 from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_openai import ChatOpenAI
-from pydantic import SecretStr
 import logging
 
+from ..services.llm_pool import get_chat_llm
+from ..services.rate_limiter import get_token_bucket, estimate_request_tokens
+from ..errors import TranslationError, parse_openai_error
+
 logger = logging.getLogger(__name__)
 
 class TranslationState(TypedDict):
@@ -22,15 +24,12 @@ class TranslationState(TypedDict):
     system_prompt: str
     status: Literal["pending", "translating", "completed", "error"]
     error_message: str | None
+    # 解析后的上游错误，保留 HTTP 状态码与响应头中的 Retry-After
+    error: Optional[TranslationError]
 
 def create_translation_llm(model_name: str, base_url: str, api_key: str):
-    """创建配置好的LLM用于翻译"""
-    return ChatOpenAI(
-        model=model_name,
-        base_url=base_url,
-        api_key=SecretStr(api_key),
-        max_completion_tokens=8192,
-    )
+    """获取配置好的LLM用于翻译（从共享客户端池复用）"""
+    return get_chat_llm(model_name, base_url, api_key)
 
 def validate_input(state: TranslationState) -> TranslationState:
     """验证输入参数"""
@@ -64,6 +63,10 @@ def translate_text(state: TranslationState) -> TranslationState:
             SystemMessage(content=state["system_prompt"]),
             HumanMessage(content=state["original_text"])
         ]
+
+        bucket = get_token_bucket(state["base_url"], state["api_key"])
+        if bucket is not None:
+            bucket.acquire_sync(estimate_request_tokens(state["system_prompt"], state["original_text"]))
         
         response = llm.invoke(messages)
         
@@ -83,7 +86,8 @@ def translate_text(state: TranslationState) -> TranslationState:
         return {
             **state,
             "status": "error",
-            "error_message": str(e)
+            "error_message": str(e),
+            "error": parse_openai_error(e)
         }
 
 def handle_error(state: TranslationState) -> TranslationState:
@@ -136,6 +140,10 @@ async def async_translate_text(state: TranslationState) -> TranslationState:
             SystemMessage(content=state["system_prompt"]),
             HumanMessage(content=state["original_text"])
         ]
+
+        bucket = get_token_bucket(state["base_url"], state["api_key"])
+        if bucket is not None:
+            await bucket.acquire(estimate_request_tokens(state["system_prompt"], state["original_text"]))
         
         response = await llm.ainvoke(messages)
         
@@ -155,7 +163,8 @@ async def async_translate_text(state: TranslationState) -> TranslationState:
         return {
             **state,
             "status": "error",
-            "error_message": str(e)
+            "error_message": str(e),
+            "error": parse_openai_error(e)
         }
 
 # Create async graph builder
@@ -1,16 +1,30 @@
 """
 文件名迁移脚本
 将 UPLOAD_FOLDER 中的文件名从旧格式迁移到新格式（基于角色名称）
+
+用法: python -m src.migration [--folder DIR] [--workers N] [--batch-size N]
+- 元数据提取在进程池中并行执行，只读取 PNG 块头和文本块
+- 只有目标文件名冲突时才计算内容哈希（按需、经索引缓存），不做全库哈希
+- 重命名分批执行，每批的索引更新在一个事务中提交，随后追加写入进度日志，
+  中断后再次运行会跳过已处理的文件
+- 结束时输出吞吐量统计
 """
+import argparse
+import json
+import logging
 import os
 import re
-import hashlib
-import logging
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
-from .extract_text import extract_embedded_text
+from .extract_text import read_character_metadata
+from .config.settings import get_settings
+from .services.upload_index import UploadIndex
 
 # --- 配置 ---
 UPLOAD_FOLDER = os.path.abspath(os.path.join(os.path.dirname(__file__), '../.uploads'))
+JOURNAL_FILENAME = ".migration_journal.jsonl"
 
 # --- 日志设置 ---
 logging.basicConfig(
@@ -27,74 +41,176 @@ def sanitize_filename(name: str) -> str:
     return sanitized.strip('._ ') or "未命名"
 
 
-def migrate_filenames():
-    """将 UPLOAD_FOLDER 中的文件名从旧格式迁移到新格式。"""
-    logging.info(f"开始迁移目录：{UPLOAD_FOLDER}")
-
-    if not os.path.isdir(UPLOAD_FOLDER):
-        logging.error(f"上传目录 {UPLOAD_FOLDER} 不存在，操作中止。")
+def read_character_name(path: str) -> Tuple[str, Optional[str], Optional[str]]:
+    """（在工作进程中执行）读取角色名称，返回 (文件名, 角色名或 None, 错误信息或 None)"""
+    filename = os.path.basename(path)
+    try:
+        character_data = read_character_metadata(path)
+    except Exception as e:
+        return filename, None, str(e)
+    if not character_data:
+        return filename, None, None
+    # 与上传接口一致：没有 data 包装层的卡片数据本身即为角色数据
+    data = character_data.get("data", character_data)
+    if not isinstance(data, dict) or not data.get("name"):
+        return filename, None, None
+    return filename, data["name"], None
+
+
+def _iter_character_names(folder: str, filenames: List[str], workers: int) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    paths = [os.path.join(folder, f) for f in filenames]
+    if workers <= 1 or len(paths) < 2:
+        yield from map(read_character_name, paths)
         return
-
-    files_to_process = [f for f in os.listdir(UPLOAD_FOLDER) if f.endswith('.png')]
-    total_files = len(files_to_process)
-    logging.info(f"发现 {total_files} 个 .png 文件需要处理。")
-
-    renamed_count = 0
-    skipped_count = 0
-
-    for filename in files_to_process:
-        old_path = os.path.join(UPLOAD_FOLDER, filename)
-
-        try:
-            with open(old_path, 'rb') as f:
-                content = f.read()
-
-            character_data = extract_embedded_text(content)
-
-            if not character_data or "data" not in character_data or "name" not in character_data["data"]:
-                logging.warning(f"跳过 '{filename}'：未找到有效的角色名称。")
-                skipped_count += 1
+    chunksize = max(1, min(256, len(paths) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(read_character_name, paths, chunksize=chunksize)
+
+
+def _load_journal(journal_path: str) -> Set[str]:
+    """读取进度日志，返回已处理完成的文件名（含重命名后的新文件名）"""
+    done: Set[str] = set()
+    if not os.path.exists(journal_path):
+        return done
+    with open(journal_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # 中断时可能留下半行
                 continue
-
-            char_name = character_data["data"]["name"]
-            sanitized_name = sanitize_filename(char_name)
-            new_filename = f"{sanitized_name}.png"
-            new_path = os.path.join(UPLOAD_FOLDER, new_filename)
-
-            if old_path == new_path:
-                logging.info(f"跳过 '{filename}'：文件名已正确。")
-                skipped_count += 1
+            if entry.get("result") == "failed":
                 continue
-
-            if os.path.exists(new_path):
-                existing_hash = hashlib.sha256(open(new_path, 'rb').read()).hexdigest()
-                current_hash = hashlib.sha256(content).hexdigest()
-
-                if existing_hash == current_hash:
-                    logging.warning(f"发现 '{new_filename}' 的重复文件。正在删除冗余文件：'{filename}'")
-                    os.remove(old_path)
-                    skipped_count += 1
-                    continue
-                else:
-                    unique_suffix = current_hash[:7]
-                    new_filename = f"{sanitized_name}_{unique_suffix}.png"
-                    new_path = os.path.join(UPLOAD_FOLDER, new_filename)
-                    logging.warning(f"'{sanitized_name}.png' 存在名称冲突。重命名为唯一名称：'{new_filename}'")
-
-            os.rename(old_path, new_path)
-            logging.info(f"重命名 '{filename}' -> '{new_filename}'")
-            renamed_count += 1
-
-        except Exception as e:
-            logging.error(f"处理 '{filename}' 时失败：{e}")
-            skipped_count += 1
-
+            done.add(entry["filename"])
+            if entry.get("target"):
+                done.add(entry["target"])
+    return done
+
+
+def _append_journal(journal_path: str, entries: Iterable[Dict]) -> None:
+    with open(journal_path, 'a', encoding='utf-8') as f:
+        for entry in entries:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _commit_batch(index: UploadIndex, journal_path: str, batch: List[Dict]) -> None:
+    """一次事务同步本批的改名与删除，再写入进度日志"""
+    index.apply_renames(
+        [(e["filename"], e["target"]) for e in batch if e["result"] == "renamed"],
+        [e["filename"] for e in batch if e["result"] == "duplicate"],
+    )
+    _append_journal(journal_path, batch)
+
+
+def _migrate_one(folder: str, index: UploadIndex, filename: str, char_name: Optional[str],
+                 error: Optional[str]) -> Dict:
+    """按角色名称处理单个文件，返回进度日志条目（索引由调用方按批同步）"""
+    if error is not None:
+        logging.error(f"处理 '{filename}' 时失败：{error}")
+        return {"filename": filename, "result": "failed", "error": error}
+    if char_name is None:
+        logging.warning(f"跳过 '{filename}'：未找到有效的角色名称。")
+        return {"filename": filename, "result": "skipped"}
+
+    sanitized_name = sanitize_filename(char_name)
+    new_filename = f"{sanitized_name}.png"
+    if filename == new_filename:
+        logging.debug(f"跳过 '{filename}'：文件名已正确。")
+        return {"filename": filename, "result": "unchanged"}
+
+    old_path = os.path.join(folder, filename)
+    try:
+        existing_hash = index.get_hash(new_filename)
+        if existing_hash is not None:
+            current_hash = index.get_hash(filename)
+
+            if existing_hash == current_hash:
+                logging.warning(f"发现 '{new_filename}' 的重复文件。正在删除冗余文件：'{filename}'")
+                os.remove(old_path)
+                return {"filename": filename, "result": "duplicate", "target": new_filename}
+
+            new_filename = f"{sanitized_name}_{current_hash[:7]}.png"
+            if filename == new_filename:
+                return {"filename": filename, "result": "unchanged"}
+            logging.warning(f"'{sanitized_name}.png' 存在名称冲突。重命名为唯一名称：'{new_filename}'")
+
+        os.rename(old_path, os.path.join(folder, new_filename))
+        logging.info(f"重命名 '{filename}' -> '{new_filename}'")
+        return {"filename": filename, "result": "renamed", "target": new_filename}
+    except Exception as e:
+        logging.error(f"处理 '{filename}' 时失败：{e}")
+        return {"filename": filename, "result": "failed", "error": str(e)}
+
+
+def migrate_filenames(folder: str = UPLOAD_FOLDER, workers: Optional[int] = None,
+                      batch_size: int = 500) -> Dict[str, int]:
+    """将目录中的文件名从旧格式迁移到新格式，返回各类结果的数量。"""
+    logging.info(f"开始迁移目录：{folder}")
+
+    if not os.path.isdir(folder):
+        logging.error(f"上传目录 {folder} 不存在，操作中止。")
+        return {}
+
+    started = time.monotonic()
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    journal_path = os.path.join(folder, JOURNAL_FILENAME)
+    done = _load_journal(journal_path)
+    if done:
+        logging.info(f"从进度日志恢复，已处理 {len(done)} 个文件名。")
+
+    # 哈希索引随迁移同步更新；不做全量同步，冲突时由 get_hash 按需（仅在索引缺失或过期时）计算哈希
+    index = UploadIndex(folder, db_path=os.path.join(folder, get_settings().upload_index_filename))
+
+    all_files = [f for f in os.listdir(folder) if f.endswith('.png')]
+    files_to_process = [f for f in all_files if f not in done]
+    total_files = len(files_to_process)
+    logging.info(f"发现 {len(all_files)} 个 .png 文件，其中 {total_files} 个需要处理。")
+
+    counts = {"renamed": 0, "duplicate": 0, "unchanged": 0, "skipped": 0, "failed": 0}
+    batch: List[Dict] = []
+    processed = 0
+    try:
+        # 重命名必须串行决定冲突，元数据读取在进程池中并行
+        for filename, char_name, error in _iter_character_names(folder, files_to_process, workers):
+            entry = _migrate_one(folder, index, filename, char_name, error)
+            counts[entry["result"]] += 1
+            batch.append(entry)
+            processed += 1
+            if len(batch) >= batch_size:
+                _commit_batch(index, journal_path, batch)
+                batch.clear()
+                elapsed = time.monotonic() - started
+                logging.info(f"进度 {processed}/{total_files}，{processed / elapsed:.1f} 个文件/秒")
+        if batch:
+            _commit_batch(index, journal_path, batch)
+    finally:
+        index.close()
+
+    # 全部完成后清除进度日志，下次运行重新检查所有文件
+    if os.path.exists(journal_path):
+        os.remove(journal_path)
+
+    elapsed = time.monotonic() - started
     logging.info("--- 迁移摘要 ---")
     logging.info(f"总共处理文件数：{total_files}")
-    logging.info(f"成功重命名：{renamed_count}")
-    logging.info(f"跳过或失败：{skipped_count}")
+    logging.info(f"成功重命名：{counts['renamed']}")
+    logging.info(f"删除重复：{counts['duplicate']}")
+    logging.info(f"跳过或失败：{counts['unchanged'] + counts['skipped'] + counts['failed']}")
+    logging.info(f"耗时 {elapsed:.2f} 秒，吞吐量 {total_files / elapsed if elapsed > 0 else 0:.1f} 个文件/秒")
     logging.info("迁移过程结束。")
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="按角色名称迁移上传目录中的角色卡文件名")
+    parser.add_argument("--folder", default=UPLOAD_FOLDER, help="上传目录")
+    parser.add_argument("--workers", type=int, default=None, help="元数据提取进程数（默认 CPU 核数）")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批写入进度日志的文件数")
+    args = parser.parse_args(argv)
+    migrate_filenames(folder=os.path.abspath(args.folder), workers=args.workers, batch_size=args.batch_size)
 
 
 if __name__ == "__main__":
-    migrate_filenames()
\ No newline at end of file
+    main()
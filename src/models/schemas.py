@@ -2,7 +2,7 @@
 API 请求与响应的 Pydantic 模型
 为所有端点提供类型安全的数据校验
 """
-from typing import Any, Optional
+from typing import Any, Optional, Union
 from pydantic import BaseModel, Field
 
 
@@ -57,10 +57,37 @@ class TranslateCharacterBookResponse(BaseModel):
     translated_content: str
 
 
+class TranslateLorebookRequest(BaseModel):
+    """整本角色书翻译请求"""
+    character_book: dict[str, Any]
+    settings: TranslationSettingsModel
+    prompts: PromptsModel
+    glossary: str = Field(default="", description="词库文本")
+    use_langgraph: bool = Field(default=True)
+    translate_keys: bool = Field(default=True, description="是否翻译条目的 keys / secondary_keys")
+    translate_comments: bool = Field(default=True, description="是否翻译条目备注")
+    pack_short_fields: Optional[bool] = Field(
+        default=None, description="是否将短字段（关键词、备注）打包为单次请求，默认打包"
+    )
+    batch_id: Optional[str] = Field(
+        default=None, min_length=1, max_length=128,
+        description="批次 ID：中断后以相同 ID 重新提交时跳过已完成的字段",
+    )
+
+
+class TranslateLorebookResponse(BaseModel):
+    """整本角色书翻译响应"""
+    character_book: dict[str, Any] = Field(..., description="写入译文后的角色书，失败的字段保留原文")
+    progress: dict[str, int]
+    errors: list[str] = Field(default_factory=list, description="翻译失败的字段及原因")
+
+
 class BatchFieldItem(BaseModel):
     """批量翻译中的单个字段"""
     field_name: str
-    text: str
+    text: Union[str, list[str]] = Field(
+        ..., description="待翻译文本；列表字段（如 alternate_greetings、tags）传字符串列表，逐元素翻译"
+    )
 
 
 class BatchTranslateRequest(BaseModel):
@@ -70,16 +97,24 @@ class BatchTranslateRequest(BaseModel):
     prompts: PromptsModel
     glossary: str = Field(default="", description="词库文本")
     use_langgraph: bool = Field(default=True)
+    pack_short_fields: Optional[bool] = Field(
+        default=None, description="是否将短字段打包为单次请求，留空则使用服务端配置"
+    )
+    batch_id: Optional[str] = Field(
+        default=None, min_length=1, max_length=128,
+        description="批次 ID：中断后以相同 ID 重新提交时跳过已完成的字段",
+    )
 
 
 class BatchTranslateResultItem(BaseModel):
     """批量翻译单个结果"""
     field_name: str
-    original_text: str
-    translated_text: str
+    original_text: Union[str, list[str]]
+    translated_text: Union[str, list[str]] = Field(..., description="列表字段按原顺序返回，失败元素为空字符串")
     success: bool
     error: Optional[str] = None
     attempts: int = 1
+    resumed: bool = Field(default=False, description="结果是否来自批次检查点")
 
 
 class BatchTranslateResponse(BaseModel):
@@ -88,6 +123,31 @@ class BatchTranslateResponse(BaseModel):
     progress: dict[str, int]
 
 
+class TranslationJobRequest(BaseModel):
+    """角色卡翻译任务请求：提交整张角色卡，由后台任务翻译全部字段"""
+    character_data: dict[str, Any]
+    settings: TranslationSettingsModel
+    prompts: PromptsModel
+    glossary: str = Field(default="", description="词库文本")
+    use_langgraph: bool = Field(default=True)
+    pack_short_fields: Optional[bool] = Field(
+        default=None, description="是否将短字段打包为单次请求，留空则使用服务端配置"
+    )
+
+
+class TranslationJobStatus(BaseModel):
+    """角色卡翻译任务状态"""
+    job_id: str
+    status: str
+    completed: int
+    total: int
+    error: Optional[str] = None
+    created_at: float
+    finished_at: Optional[float] = None
+    results: Optional[list[BatchTranslateResultItem]] = None
+    character_data: Optional[dict[str, Any]] = Field(default=None, description="任务完成后翻译好的角色卡")
+
+
 # ============================================
 # AI Chat API
 # ============================================
@@ -117,7 +177,40 @@ class AIChatResponse(BaseModel):
 class UploadResponse(BaseModel):
     """上传角色卡响应"""
     character_data: dict[str, Any]
-    image_b64: str
+    image_url: str
+    image_hash: str
+    image_b64: Optional[str] = None
+
+
+# ============================================
+# 批量导入导出 API
+# ============================================
+
+class BulkImportItem(BaseModel):
+    """批量导入中单张角色卡的结果"""
+    filename: str
+    success: bool
+    character_data: Optional[dict[str, Any]] = None
+    image_url: Optional[str] = None
+    image_hash: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BulkImportResponse(BaseModel):
+    """批量导入响应"""
+    cards: list[BulkImportItem]
+
+
+class BulkExportItem(BaseModel):
+    """批量导出中的单张角色卡：引用已上传的基础图片哈希"""
+    image_hash: str = Field(..., description="基础图片的内容哈希（上传或批量导入时返回）")
+    character_data: dict[str, Any]
+    filename: Optional[str] = Field(default=None, description="压缩包内的文件名，默认使用角色名称")
+
+
+class BulkExportRequest(BaseModel):
+    """批量导出请求"""
+    cards: list[BulkExportItem] = Field(..., min_length=1)
 
 
 # ============================================
@@ -0,0 +1,231 @@
+"""
+PNG 块索引工具
+在 memoryview（或只读 mmap）上单次遍历 PNG 块，只记录偏移量而不复制数据；
+写出时按原始字节区间流式写入未改动的块，仅新建需要插入的块
+"""
+import mmap
+import os
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Iterator, List, Sequence, Union
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+IEND_CHUNK = b'\x00\x00\x00\x00IEND\xaeB`\x82'
+TEXT_CHUNK_TYPES = (b'tEXt', b'zTXt', b'iTXt')
+
+Buffer = Union[bytes, bytearray, memoryview, mmap.mmap]
+
+
+@dataclass(frozen=True)
+class ChunkInfo:
+    """单个 PNG 块的位置信息（offset 指向长度字段起点）"""
+    type: bytes
+    offset: int
+    length: int
+
+    @property
+    def data_start(self) -> int:
+        return self.offset + 8
+
+    @property
+    def data_end(self) -> int:
+        return self.offset + 8 + self.length
+
+    @property
+    def end(self) -> int:
+        """块结束位置（含 CRC）"""
+        return self.offset + 12 + self.length
+
+    def data(self, view: memoryview) -> memoryview:
+        """返回块数据的零拷贝视图"""
+        return view[self.data_start:self.data_end]
+
+
+def is_png(buf: Buffer) -> bool:
+    return bytes(memoryview(buf)[:8]) == PNG_SIGNATURE
+
+
+def iter_chunks(buf: Buffer) -> Iterator[ChunkInfo]:
+    """遍历 PNG 块，遇到 IEND 或数据截断时停止；签名无效时抛出 ValueError。"""
+    view = memoryview(buf)
+    if bytes(view[:8]) != PNG_SIGNATURE:
+        raise ValueError("非法的PNG文件格式")
+
+    offset = len(PNG_SIGNATURE)
+    total = len(view)
+    while offset + 8 <= total:
+        length = int.from_bytes(view[offset:offset + 4], byteorder='big')
+        chunk_type = bytes(view[offset + 4:offset + 8])
+        chunk = ChunkInfo(type=chunk_type, offset=offset, length=length)
+        if chunk.end > total:
+            break
+        yield chunk
+        if chunk_type == b'IEND':
+            break
+        offset = chunk.end
+
+
+def index_chunks(buf: Buffer) -> List[ChunkInfo]:
+    """建立 PNG 块索引"""
+    return list(iter_chunks(buf))
+
+
+def iter_chunk_headers(f: BinaryIO) -> Iterator[ChunkInfo]:
+    """
+    从可 seek 的二进制文件对象中逐个读取块头（每块仅读 8 字节），
+    每次产出后自动 seek 到下一个块，调用方未读取的数据（如 IDAT）不会被读入内存。
+    PNG 可以从文件的任意位置开始，块偏移量为文件中的绝对位置，可直接传给 read_chunk_data。
+    签名无效时抛出 ValueError。
+    """
+    if f.read(8) != PNG_SIGNATURE:
+        raise ValueError("非法的PNG文件格式")
+
+    offset = f.tell()
+    while True:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            break
+        chunk = ChunkInfo(
+            type=header[4:8],
+            offset=offset,
+            length=int.from_bytes(header[:4], byteorder='big'),
+        )
+        yield chunk
+        if chunk.type == b'IEND':
+            break
+        offset = chunk.end
+
+
+def read_chunk_data(f: BinaryIO, chunk: ChunkInfo, limit: int = -1) -> bytes:
+    """读取 iter_chunk_headers 产出的块的数据（limit >= 0 时最多读取 limit 字节）"""
+    f.seek(chunk.data_start)
+    size = chunk.length if limit < 0 else min(limit, chunk.length)
+    return f.read(size)
+
+
+@contextmanager
+def open_png(path: str) -> Iterator[memoryview]:
+    """以只读 mmap 打开 PNG 文件，产出其 memoryview；空文件退化为空视图。"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield memoryview(b'')
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            view = memoryview(mm)
+            try:
+                yield view
+            finally:
+                view.release()
+
+
+def build_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """构造一个完整的 PNG 块（长度 + 类型 + 数据 + CRC）"""
+    crc = zlib.crc32(data, zlib.crc32(chunk_type)) & 0xffffffff
+    return len(data).to_bytes(4, byteorder='big') + chunk_type + data + crc.to_bytes(4, byteorder='big')
+
+
+def iter_png_parts(buf: Buffer, chunks: Sequence[ChunkInfo],
+                   new_chunks: Iterable[bytes] = (),
+                   drop_types: Sequence[bytes] = TEXT_CHUNK_TYPES) -> Iterator[Union[bytes, memoryview]]:
+    """
+    按顺序产出新 PNG 的各个字节片段：
+    签名、保留块（相邻块合并为一个连续区间的零拷贝视图）、新块、IEND。
+    """
+    view = memoryview(buf)
+    yield PNG_SIGNATURE
+
+    run_start = run_end = None
+    for chunk in chunks:
+        if chunk.type in drop_types or chunk.type == b'IEND':
+            if run_start is not None:
+                yield view[run_start:run_end]
+                run_start = run_end = None
+            continue
+        if run_start is not None and chunk.offset == run_end:
+            run_end = chunk.end
+        else:
+            if run_start is not None:
+                yield view[run_start:run_end]
+            run_start, run_end = chunk.offset, chunk.end
+    if run_start is not None:
+        yield view[run_start:run_end]
+
+    for new_chunk in new_chunks:
+        yield new_chunk
+    yield IEND_CHUNK
+
+
+def write_png_parts(parts: Iterable[Union[bytes, memoryview]], out: BinaryIO) -> int:
+    """将字节片段流式写入文件对象，返回写入的字节数"""
+    written = 0
+    for part in parts:
+        out.write(part)
+        written += len(part)
+    return written
+
+
+class PngStreamScanner:
+    """
+    增量式 PNG 块扫描器。
+    按任意大小的数据片段调用 feed()，只缓存块头与需要捕获的文本块数据，
+    图像数据直接跳过，适合在上传流式落盘的同时解析元数据。
+    """
+
+    def __init__(self, capture_types: Sequence[bytes] = TEXT_CHUNK_TYPES,
+                 max_capture: int = 32 * 1024 * 1024):
+        self.capture_types = capture_types
+        self.max_capture = max_capture
+        self.is_png = None
+        self.text_chunks: List[tuple] = []
+        self._state = "signature"
+        self._pending = bytearray()
+        self._remaining = 0
+        self._current_type = b''
+        self._capture = None
+
+    @property
+    def done(self) -> bool:
+        return self._state == "done"
+
+    def feed(self, data: Buffer) -> None:
+        """送入下一段数据"""
+        view = memoryview(data)
+        pos = 0
+        total = len(view)
+        while pos < total and self._state != "done":
+            if self._state == "data":
+                take = min(self._remaining, total - pos)
+                if self._capture is not None:
+                    self._capture += view[pos:pos + take]
+                self._remaining -= take
+                pos += take
+                if self._remaining == 0:
+                    self._state = "crc"
+                continue
+
+            need = 8 if self._state in ("signature", "header") else 4
+            take = min(need - len(self._pending), total - pos)
+            self._pending += view[pos:pos + take]
+            pos += take
+            if len(self._pending) == need:
+                self._advance(bytes(self._pending))
+                self._pending.clear()
+
+    def _advance(self, field: bytes) -> None:
+        if self._state == "signature":
+            self.is_png = field == PNG_SIGNATURE
+            self._state = "header" if self.is_png else "done"
+        elif self._state == "header":
+            length = int.from_bytes(field[:4], byteorder='big')
+            self._current_type = field[4:8]
+            capture = self._current_type in self.capture_types and length <= self.max_capture
+            self._capture = bytearray() if capture else None
+            self._remaining = length
+            self._state = "data" if length > 0 else "crc"
+        else:
+            if self._capture is not None:
+                self.text_chunks.append((self._current_type, bytes(self._capture)))
+                self._capture = None
+            self._state = "done" if self._current_type == b'IEND' else "header"
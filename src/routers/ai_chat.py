@@ -3,10 +3,22 @@ AI 辅助角色卡生成对话路由
 """
 import json
 import logging
-
-from fastapi import APIRouter, HTTPException
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from langchain_core.messages import (
+    SystemMessage as LCSystemMessage,
+    HumanMessage,
+    AIMessage,
+    BaseMessage,
+)
+from pydantic import ValidationError
 
 from ..models.schemas import AIChatRequest, AIChatResponse
+from ..config.settings import get_settings
+from ..services.llm_pool import get_chat_llm
+from ..services.rate_limiter import get_token_bucket, estimate_request_tokens
 
 router = APIRouter(prefix="/api/v1", tags=["ai-chat"])
 logger = logging.getLogger(__name__)
@@ -57,64 +69,177 @@ AI_CHAT_SYSTEM_PROMPT = """你是一个专业的 SillyTavern 角色卡创建助
 在对话中要友好、专业，并根据用户的语言（中文或英文）来回复。"""
 
 
+def _build_messages(data: AIChatRequest) -> List[BaseMessage]:
+    """根据对话历史和角色卡上下文构建 LangChain 消息列表"""
+    # 构建系统提示词
+    system_prompt = AI_CHAT_SYSTEM_PROMPT
+
+    if data.character_card and isinstance(data.character_card, dict):
+        card_data = data.character_card.get('data', data.character_card)
+        card_info = json.dumps(card_data, ensure_ascii=False, indent=2)
+        system_prompt += (
+            f"\n\n当前角色卡数据：\n```json\n{card_info}\n```\n"
+            "请基于上述现有数据为用户提供建议和帮助。"
+        )
+
+    lc_messages: List[BaseMessage] = [LCSystemMessage(content=system_prompt)]
+
+    for msg in data.messages:
+        if msg.role == 'user':
+            lc_messages.append(HumanMessage(content=msg.content))
+        elif msg.role == 'assistant':
+            lc_messages.append(AIMessage(content=msg.content))
+
+    return lc_messages
+
+
+def _classify_chat_error(e: Exception) -> Tuple[int, str]:
+    """将 LLM 调用异常映射为 (HTTP 状态码, 提示信息)"""
+    error_message = str(e)
+    if "auth" in error_message.lower() or "api key" in error_message.lower():
+        return 401, "API Key 无效或已过期。"
+    elif "rate" in error_message.lower():
+        return 429, "请求过于频繁，请稍后再试。"
+    return 500, f"AI 对话过程中发生错误：{error_message}"
+
+
+def _config_error(data: AIChatRequest) -> Optional[str]:
+    """校验请求中的模型配置，返回错误提示，配置有效时返回 None"""
+    if not data.settings.api_key.strip():
+        return "请先在设置中提供您的 API Key。"
+    return None
+
+
+def _parse_ws_request(raw: str) -> AIChatRequest:
+    """解析 WebSocket 消息为对话请求，格式或配置无效时抛出 ValueError"""
+    try:
+        payload = json.loads(raw)
+    except json.JSONDecodeError:
+        raise ValueError("消息不是有效的 JSON。")
+    try:
+        data = AIChatRequest.model_validate(payload)
+    except ValidationError as e:
+        raise ValueError(str(e))
+    error = _config_error(data)
+    if error:
+        raise ValueError(error)
+    return data
+
+
+def _get_llm(data: AIChatRequest):
+    return get_chat_llm(
+        data.settings.model_name,
+        data.settings.base_url,
+        data.settings.api_key,
+    )
+
+
+async def _wait_for_quota(data: AIChatRequest, lc_messages: List[BaseMessage]) -> None:
+    """按上游 RPM/TPM 配额等待（未配置配额时立即返回）"""
+    bucket = get_token_bucket(data.settings.base_url, data.settings.api_key)
+    if bucket is None:
+        return
+    texts = [m.content if isinstance(m.content, str) else str(m.content) for m in lc_messages]
+    # 对话回复长度未知，按最大输出的四分之一预留
+    expected_output = get_settings().max_completion_tokens // 4
+    await bucket.acquire(estimate_request_tokens(*texts, expected_output=expected_output))
+
+
+async def _iter_chat_events(data: AIChatRequest) -> AsyncIterator[Dict[str, Any]]:
+    """
+    以 astream 逐块产出回复：
+    - {"type": "token", "content": "..."}
+    - {"type": "done", "reply": "完整回复"}
+    - {"type": "error", "status": 429, "detail": "..."}
+    """
+    chunks: List[str] = []
+    try:
+        lc_messages = _build_messages(data)
+        await _wait_for_quota(data, lc_messages)
+        async for chunk in _get_llm(data).astream(lc_messages):
+            content = chunk.content if isinstance(chunk.content, str) else str(chunk.content)
+            if not content:
+                continue
+            chunks.append(content)
+            yield {"type": "token", "content": content}
+    except Exception as e:
+        logger.error(f"AI 流式对话过程中发生错误：{e}")
+        status, detail = _classify_chat_error(e)
+        yield {"type": "error", "status": status, "detail": detail}
+        return
+
+    yield {"type": "done", "reply": "".join(chunks)}
+
+
 @router.post("/character/ai-chat", response_model=AIChatResponse)
 async def ai_chat(data: AIChatRequest):
     """
     AI 辅助角色卡生成对话接口。
     接收对话历史和当前角色卡上下文，返回 AI 回复以帮助生成/完善角色卡。
     """
-    if not data.settings.api_key:
-        raise HTTPException(status_code=400, detail="请先在设置中提供您的 API Key。")
+    error = _config_error(data)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
 
     try:
-        from langchain_openai import ChatOpenAI
-        from pydantic import SecretStr
-        from langchain_core.messages import (
-            SystemMessage as LCSystemMessage,
-            HumanMessage,
-            AIMessage,
-        )
+        lc_messages = _build_messages(data)
+        await _wait_for_quota(data, lc_messages)
+        response = await _get_llm(data).ainvoke(lc_messages)
 
-        llm = ChatOpenAI(
-            model=data.settings.model_name,
-            base_url=data.settings.base_url,
-            api_key=SecretStr(data.settings.api_key),
-            max_completion_tokens=8192,
-        )
+        ai_content = response.content if isinstance(response.content, str) else str(response.content)
 
-        # 构建系统提示词
-        system_prompt = AI_CHAT_SYSTEM_PROMPT
+        return AIChatResponse(reply=ai_content)
 
-        if data.character_card and isinstance(data.character_card, dict):
-            card_data = data.character_card.get('data', data.character_card)
-            card_info = json.dumps(card_data, ensure_ascii=False, indent=2)
-            system_prompt += (
-                f"\n\n当前角色卡数据：\n```json\n{card_info}\n```\n"
-                "请基于上述现有数据为用户提供建议和帮助。"
-            )
+    except Exception as e:
+        logger.error(f"AI 对话过程中发生错误：{e}")
+        status, detail = _classify_chat_error(e)
+        raise HTTPException(status_code=status, detail=detail)
 
-        # 构建 LangChain 消息列表
-        lc_messages = [LCSystemMessage(content=system_prompt)]
 
-        for msg in data.messages:
-            if msg.role == 'user':
-                lc_messages.append(HumanMessage(content=msg.content))
-            elif msg.role == 'assistant':
-                lc_messages.append(AIMessage(content=msg.content))
+@router.post("/character/ai-chat/stream")
+async def ai_chat_stream(data: AIChatRequest):
+    """
+    流式 AI 对话接口（Server-Sent Events）。
+    每个 token 块作为一个 SSE 事件推送，结束时推送包含完整回复的 done 事件。
+    """
+    error = _config_error(data)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
 
-        response = llm.invoke(lc_messages)
+    async def sse_events():
+        async for event in _iter_chat_events(data):
+            yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
 
-        ai_content = response.content if isinstance(response.content, str) else str(response.content)
+    return StreamingResponse(
+        sse_events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
-        return AIChatResponse(reply=ai_content)
 
-    except Exception as e:
-        logger.error(f"AI 对话过程中发生错误：{e}")
-        error_message = str(e)
-        if "auth" in error_message.lower() or "api key" in error_message.lower():
-            raise HTTPException(status_code=401, detail="API Key 无效或已过期。")
-        elif "rate" in error_message.lower():
-            raise HTTPException(status_code=429, detail="请求过于频繁，请稍后再试。")
-        raise HTTPException(
-            status_code=500, detail=f"AI 对话过程中发生错误：{error_message}"
-        )
+@router.websocket("/character/ai-chat/ws")
+async def ai_chat_ws(websocket: WebSocket):
+    """
+    WebSocket AI 对话接口。
+    连接保持期间，客户端每发送一条 AIChatRequest JSON，服务端即推送该轮回复的 token 事件及 done 事件；
+    无效消息（非 JSON、字段校验失败、缺少 API Key）返回 error 事件，连接保持不变。
+    """
+    await websocket.accept()
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            raw = message.get("text")
+            if raw is None:
+                raw = (message.get("bytes") or b"").decode("utf-8", errors="replace")
+            try:
+                data = _parse_ws_request(raw)
+            except ValueError as e:
+                await websocket.send_json({"type": "error", "status": 400, "detail": str(e)})
+                continue
+
+            async for event in _iter_chat_events(data):
+                await websocket.send_json(event)
+    except WebSocketDisconnect:
+        logger.info("客户端断开了 AI 对话 WebSocket 连接。")
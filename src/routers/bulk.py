@@ -0,0 +1,227 @@
+"""
+角色卡批量导入导出路由
+导入：接收 ZIP 压缩包（或多个 PNG 文件），有界并发地逐个读取成员、只读块头解析元数据并保存；
+导出：按图片哈希引用已上传的基础图片，逐张嵌入数据并以流式 ZIP 返回
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import zipfile
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.responses import StreamingResponse
+
+from ..extract_text import read_character_metadata, embed_text_in_bytes
+from ..png_chunks import is_png, open_png
+from ..models.schemas import BulkExportRequest, BulkImportResponse
+from ..services.io_pool import run_io
+from ..services.upload_index import get_upload_index
+from ..utils import handle_uploaded_file, link_content_object, get_content_object_path, sanitize_character_name
+from ..config.settings import get_settings
+from .export import content_disposition
+
+router = APIRouter(prefix="/api/v1", tags=["bulk"])
+logger = logging.getLogger(__name__)
+
+
+# ---- 导入 ----
+
+# 读取单个成员：返回 (内容或 None, 错误信息或 None)
+MemberReader = Callable[[], Tuple[Optional[bytes], Optional[str]]]
+
+
+def _read_limited(f: BinaryIO, max_size: int) -> Tuple[Optional[bytes], Optional[str]]:
+    content = f.read(max_size + 1)
+    if len(content) > max_size:
+        return None, "文件过大"
+    return content, None
+
+
+def _open_zip_members(fileobj, max_cards: int,
+                      max_size: int) -> Tuple[zipfile.ZipFile, List[Tuple[str, MemberReader]]]:
+    """打开压缩包并列出 PNG 成员，只读取目录，成员内容在导入时按需读取"""
+    archive = zipfile.ZipFile(fileobj)
+    infos = [
+        info for info in archive.infolist()
+        if not info.is_dir() and info.filename.lower().endswith('.png')
+        and not info.filename.startswith('__MACOSX/')
+    ]
+    if len(infos) > max_cards:
+        archive.close()
+        raise ValueError(f"压缩包包含 {len(infos)} 张角色卡，超过上限 {max_cards}。")
+
+    def reader(info: zipfile.ZipInfo) -> MemberReader:
+        def read() -> Tuple[Optional[bytes], Optional[str]]:
+            # 目录中的大小可能被伪造，读取时再次限制
+            if info.file_size > max_size:
+                return None, "文件过大"
+            with archive.open(info) as member:
+                return _read_limited(member, max_size)
+        return read
+
+    return archive, [(info.filename, reader(info)) for info in infos]
+
+
+def _upload_members(files: List[UploadFile], max_cards: int, max_size: int) -> List[Tuple[str, MemberReader]]:
+    """列出多个直接上传的 PNG 文件，内容在导入时按需读取"""
+    if len(files) > max_cards:
+        raise ValueError(f"上传了 {len(files)} 张角色卡，超过上限 {max_cards}。")
+    return [
+        (upload.filename or "", lambda upload=upload: _read_limited(upload.file, max_size))
+        for upload in files
+    ]
+
+
+def _store_card(content: bytes, upload_folder: str, character_data: Dict) -> str:
+    """保存角色卡并建立内容寻址入口，返回内容哈希"""
+    content_hash = hashlib.sha256(content).hexdigest()
+    saved_path = handle_uploaded_file(content, upload_folder, character_data, get_upload_index(), content_hash)
+    link_content_object(saved_path, upload_folder, content_hash)
+    return content_hash
+
+
+def _import_member(filename: str, read: MemberReader, upload_folder: str) -> Dict:
+    """读取、解析并保存单张角色卡（在 I/O 线程中执行，内容只在本函数内存活）"""
+    content, error = read()
+    if error is not None:
+        return {"filename": filename, "success": False, "error": error}
+    if not is_png(content):
+        return {"filename": filename, "success": False, "error": "不是有效的 PNG 文件"}
+    # 只读块头，跳过图像数据
+    character_data = read_character_metadata(io.BytesIO(content))
+    if not character_data:
+        character_data = {"data": {"name": "新角色", "description": ""}}
+    elif "data" not in character_data:
+        character_data = {"data": character_data}
+    content_hash = _store_card(content, upload_folder, character_data)
+    return {
+        "filename": filename,
+        "success": True,
+        "character_data": character_data,
+        "image_url": f"/api/v1/character/image/{content_hash}",
+        "image_hash": content_hash,
+    }
+
+
+async def _import_card(filename: str, read: MemberReader, upload_folder: str,
+                       semaphore: asyncio.Semaphore) -> Dict:
+    async with semaphore:
+        try:
+            return await run_io(_import_member, filename, read, upload_folder)
+        except Exception as e:
+            logger.error(f"批量导入 {filename} 失败：{e}")
+            return {"filename": filename, "success": False, "error": "解析角色卡失败"}
+
+
+@router.post("/character/bulk/import", response_model=BulkImportResponse, response_model_exclude_none=True)
+async def bulk_import_character_cards(files: List[UploadFile] = File(...)):
+    """
+    批量导入角色卡：上传一个 ZIP 压缩包或多个 PNG 文件。
+    成员按需逐个读取，同时处理的数量受 bulk_import_concurrency 限制，
+    结果按输入顺序返回，单张失败不影响其他角色卡。
+    """
+    settings = get_settings()
+    archive = None
+    try:
+        if len(files) == 1 and (files[0].filename or "").lower().endswith('.zip'):
+            archive, members = await run_io(
+                _open_zip_members, files[0].file, settings.bulk_max_cards, settings.bulk_max_card_size
+            )
+        else:
+            members = _upload_members(files, settings.bulk_max_cards, settings.bulk_max_card_size)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="无效的 ZIP 压缩包。")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    semaphore = asyncio.Semaphore(max(1, settings.bulk_import_concurrency))
+    try:
+        cards = await asyncio.gather(*(
+            _import_card(filename, read, settings.upload_folder_abs, semaphore)
+            for filename, read in members
+        ))
+    finally:
+        if archive is not None:
+            archive.close()
+    logger.info(f"批量导入完成：{sum(card['success'] for card in cards)}/{len(cards)} 张成功。")
+    return {"cards": cards}
+
+
+# ---- 导出 ----
+
+class _ZipStream(io.RawIOBase):
+    """只追加写入的缓冲区，供 zipfile 以不可 seek 模式写入后分段取出"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._buffer += data
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _iter_export_zip(entries: List[Tuple[str, str, Dict]]) -> Iterator[bytes]:
+    """逐张生成角色卡并写入 ZIP，每写完一张即产出已生成的字节"""
+    stream = _ZipStream()
+    # PNG 本身已压缩，直接存储
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for arcname, object_path, character_data in entries:
+            with open_png(object_path) as view:
+                png_data = embed_text_in_bytes(view, character_data)
+            archive.writestr(arcname, png_data)
+            yield stream.drain()
+    yield stream.drain()
+
+
+def _unique_arcname(name: str, used: set) -> str:
+    stem, suffix = name[:-4], name[-4:]
+    candidate, n = name, 1
+    while candidate in used:
+        n += 1
+        candidate = f"{stem}_{n}{suffix}"
+    used.add(candidate)
+    return candidate
+
+
+@router.post("/character/bulk/export")
+async def bulk_export_character_cards(request: BulkExportRequest):
+    """
+    批量导出角色卡：按图片哈希引用已上传的基础图片，返回流式 ZIP。
+    所有图片在开始输出前校验存在，缺失时返回 404。
+    """
+    settings = get_settings()
+    if len(request.cards) > settings.bulk_max_cards:
+        raise HTTPException(status_code=400, detail=f"单次最多导出 {settings.bulk_max_cards} 张角色卡。")
+
+    entries = []
+    used_names: set = set()
+    for card in request.cards:
+        object_path = get_content_object_path(settings.upload_folder_abs, card.image_hash)
+        if object_path is None or not await run_io(os.path.isfile, object_path):
+            raise HTTPException(status_code=404, detail=f"图片不存在：{card.image_hash}")
+        character_data = card.character_data
+        if card.filename:
+            name = os.path.basename(card.filename)
+        else:
+            wrapped = character_data if "data" in character_data else {"data": character_data}
+            name = sanitize_character_name(wrapped)
+        if not name.lower().endswith('.png'):
+            name += '.png'
+        entries.append((_unique_arcname(name, used_names), object_path, character_data))
+
+    return StreamingResponse(
+        _iter_export_zip(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": content_disposition("character_cards.zip")},
+    )
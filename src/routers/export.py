@@ -1,20 +1,63 @@
 """
 角色卡导出路由
 """
-import os
-import uuid
 import json
 import logging
+from typing import Iterator
+from urllib.parse import quote
 
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
 
-from ..extract_text import embed_text_in_png
-from ..config.settings import get_settings
+from ..extract_text import embed_text_in_bytes
+from ..services.io_pool import run_io
+from ..services.export_cache import get_export_cache, make_export_key
 
 router = APIRouter(prefix="/api/v1", tags=["export"])
 logger = logging.getLogger(__name__)
 
+_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _iter_bytes(data: bytes) -> Iterator[memoryview]:
+    view = memoryview(data)
+    for start in range(0, len(view), _STREAM_CHUNK_SIZE):
+        yield view[start:start + _STREAM_CHUNK_SIZE]
+
+
+def content_disposition(filename: str) -> str:
+    """与 FileResponse 相同的附件文件名编码（非 ASCII 文件名使用 RFC 5987）"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def png_download_response(png_data: bytes, download_name: str) -> StreamingResponse:
+    """以流式响应返回内存中的 PNG"""
+    return StreamingResponse(
+        _iter_bytes(png_data),
+        media_type="image/png",
+        headers={
+            "Content-Length": str(len(png_data)),
+            "Content-Disposition": content_disposition(download_name),
+        },
+    )
+
+
+def _export_card(image_content: bytes, character_data) -> bytes:
+    """生成嵌入角色数据的 PNG，命中导出缓存时直接返回缓存结果"""
+    cache = get_export_cache()
+    key = make_export_key(image_content, character_data) if cache is not None else None
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    png_data = embed_text_in_bytes(image_content, character_data)
+    if cache is not None:
+        cache.set(key, png_data)
+    return png_data
+
 
 @router.post("/character/export")
 async def export_character_card(
@@ -23,42 +66,29 @@ async def export_character_card(
 ):
     """
     接收角色卡的 JSON 数据和一张基础图片，生成并返回嵌入了该数据的新 PNG 图片。
+    图片在内存中生成并以流式响应返回，不写入任何临时文件。
     """
     try:
         character_data = json.loads(json_data)
     except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="提供了无效的 JSON 数据。")
 
-    settings = get_settings()
-    temp_image_path = os.path.join(
-        settings.upload_folder_abs, f"export_base_{uuid.uuid4().hex}.png"
-    )
-    output_path = os.path.join(
-        settings.output_folder_abs, f"character_export_{uuid.uuid4().hex}.png"
-    )
-
     try:
-        with open(temp_image_path, "wb") as buffer:
-            buffer.write(await image_file.read())
-
-        result_path = embed_text_in_png(temp_image_path, character_data, output_path)
-
-        if result_path:
-            if "data" in character_data and isinstance(character_data["data"], dict):
-                char_name = character_data["data"].get("name", "character")
-            else:
-                char_name = character_data.get("name", "character")
-            download_name = f"{char_name}.png"
-            return FileResponse(
-                path=result_path, media_type='image/png', filename=download_name
-            )
+        image_content = await image_file.read()
+        try:
+            # 哈希与 PNG 重写放到 I/O 线程池，不阻塞事件循环
+            png_data = await run_io(_export_card, image_content, character_data)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="基础图片不是有效的 PNG 文件。")
+
+        if "data" in character_data and isinstance(character_data["data"], dict):
+            char_name = character_data["data"].get("name", "character")
         else:
-            raise HTTPException(status_code=500, detail="无法将数据嵌入图片。")
+            char_name = character_data.get("name", "character")
+        download_name = f"{char_name}.png"
+        return png_download_response(png_data, download_name)
     except HTTPException:
         raise
     except Exception as e:
         logger.error(f"导出角色卡时出错：{e}")
         raise HTTPException(status_code=500, detail="导出过程中发生内部错误。")
-    finally:
-        if os.path.exists(temp_image_path):
-            os.remove(temp_image_path)
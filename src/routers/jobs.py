@@ -0,0 +1,78 @@
+"""
+角色卡翻译任务路由：提交任务、查询状态、流式订阅结果、取消任务
+任务保存在跨进程共享的队列中，任意工作进程都可以查询或订阅
+"""
+import json
+import logging
+from contextlib import aclosing
+from typing import Any, Dict
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+
+from ..models.schemas import TranslationJobRequest, TranslationJobStatus
+from ..services.translation_jobs import get_job_manager
+
+router = APIRouter(prefix="/api/v1", tags=["jobs"])
+logger = logging.getLogger(__name__)
+
+
+async def _get_job_or_404(job_id: str, include_results: bool = False) -> Dict[str, Any]:
+    job = await get_job_manager().get(job_id, include_results=include_results)
+    if job is None:
+        raise HTTPException(status_code=404, detail="翻译任务不存在或已过期。")
+    return job
+
+
+@router.post("/character/translate-jobs", response_model=TranslationJobStatus,
+             response_model_exclude_none=True, status_code=202)
+async def submit_translation_job(data: TranslationJobRequest):
+    """提交整张角色卡的翻译任务，立即返回任务 ID，翻译在后台进行"""
+    options = {
+        "settings": data.settings.model_dump(),
+        "prompts": data.prompts.model_dump(),
+        "glossary": data.glossary,
+        "use_langgraph": data.use_langgraph,
+        "pack_short_fields": data.pack_short_fields,
+    }
+    try:
+        return await get_job_manager().submit(data.character_data, options)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/character/translate-jobs/{job_id}", response_model=TranslationJobStatus,
+            response_model_exclude_none=True)
+async def get_translation_job(job_id: str, include_results: bool = False):
+    """查询任务状态；include_results=true 时附带已完成字段的结果"""
+    return await _get_job_or_404(job_id, include_results)
+
+
+@router.get("/character/translate-jobs/{job_id}/stream")
+async def stream_translation_job(job_id: str):
+    """
+    以 NDJSON 流式订阅任务：先推送已完成的结果，再推送新完成的结果，
+    任务结束时推送 done 帧。断开订阅不会影响任务本身。
+    """
+    await _get_job_or_404(job_id)
+
+    async def ndjson_lines():
+        async with aclosing(get_job_manager().iter_events(job_id)) as events:
+            async for event in events:
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        ndjson_lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.delete("/character/translate-jobs/{job_id}", response_model=TranslationJobStatus,
+               response_model_exclude_none=True)
+async def cancel_translation_job(job_id: str):
+    """取消任务；已完成的字段结果仍可查询"""
+    await _get_job_or_404(job_id)
+    if not await get_job_manager().cancel(job_id):
+        raise HTTPException(status_code=409, detail="任务已结束，无法取消。")
+    return await _get_job_or_404(job_id)
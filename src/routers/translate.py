@@ -1,18 +1,27 @@
 """
-翻译相关路由：单字段翻译、角色书翻译、批量翻译
+翻译相关路由：单字段翻译、角色书翻译、批量翻译（含流式变体）
 """
+import json
 import logging
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 
 from ..models.schemas import (
     TranslateRequest, TranslateResponse,
     TranslateCharacterBookRequest, TranslateCharacterBookResponse,
-    BatchTranslateRequest, BatchTranslateResponse,
+    TranslateLorebookRequest, TranslateLorebookResponse,
+    BatchTranslateRequest, BatchTranslateResponse, BatchTranslateResultItem,
 )
 from ..errors import TranslationError
 from ..utils import get_translator
 from ..batch_translate import BatchTranslator
+from ..services.translation_cache import get_translation_cache
+from ..services.batch_checkpoint import get_batch_checkpoint_store
+from ..services.lorebook import collect_lorebook_fields, count_lorebook_entries, rebuild_lorebook
 from ..config.settings import get_settings
 
 router = APIRouter(prefix="/api/v1", tags=["translate"])
@@ -31,8 +40,9 @@ async def translate_text_field(data: TranslateRequest):
             data.prompts.model_dump(),
             data.use_langgraph,
             data.glossary,
+            cache=get_translation_cache(),
         )
-        translated_text = translator.translate_field(data.field_name, data.text)
+        translated_text = await translator.async_translate_field(data.field_name, data.text)
         return TranslateResponse(translated_text=translated_text)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -57,8 +67,11 @@ async def translate_character_book_content(data: TranslateCharacterBookRequest):
             data.prompts.model_dump(),
             data.use_langgraph,
             data.glossary,
+            cache=get_translation_cache(),
+        )
+        translated_content = await translator.async_translate_character_book_content(
+            data.content
         )
-        translated_content = translator.translate_character_book_content(data.content)
         return TranslateCharacterBookResponse(translated_content=translated_content)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -70,15 +83,20 @@ async def translate_character_book_content(data: TranslateCharacterBookRequest):
         raise HTTPException(status_code=500, detail="翻译过程中发生内部错误。")
 
 
-@router.post("/character/batch-translate", response_model=BatchTranslateResponse)
-async def batch_translate_fields(data: BatchTranslateRequest):
-    """批量翻译多个字段"""
+@router.post("/character/translate-character-book/bulk", response_model=TranslateLorebookResponse)
+async def translate_lorebook(data: TranslateLorebookRequest):
+    """
+    整本翻译角色书：相同文本只翻译一次，关键词与备注打包翻译，条目内容在并发上限内并行翻译，
+    返回重建后的角色书
+    """
     settings = get_settings()
+    book = data.character_book
+    if count_lorebook_entries(book) > settings.lorebook_max_entries:
+        raise HTTPException(status_code=400, detail=f"角色书条目数超过上限 {settings.lorebook_max_entries}。")
 
-    if not data.fields:
-        return BatchTranslateResponse(
-            results=[], progress={"completed": 0, "total": 0}
-        )
+    fields = collect_lorebook_fields(book, data.translate_keys, data.translate_comments)
+    if not fields:
+        return TranslateLorebookResponse(character_book=book, progress={"completed": 0, "total": 0})
 
     try:
         translator = get_translator(
@@ -86,11 +104,95 @@ async def batch_translate_fields(data: BatchTranslateRequest):
             data.prompts.model_dump(),
             data.use_langgraph,
             data.glossary,
+            cache=get_translation_cache(),
         )
         batch_translator = BatchTranslator(
-            translator, max_concurrent=settings.batch_max_concurrent
+            translator,
+            max_concurrent=settings.lorebook_max_concurrent,
+            # 关键词与备注数量多且短，默认打包，避免逐个调用上游
+            pack_short_fields=True if data.pack_short_fields is None else data.pack_short_fields,
+            checkpoint=get_batch_checkpoint_store() if data.batch_id else None,
+        )
+        results = await batch_translator.translate_fields(fields, batch_id=data.batch_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except TranslationError as e:
+        logger.error(f"角色书翻译失败：{e.message}")
+        raise HTTPException(status_code=500, detail=e.message)
+    except Exception as e:
+        logger.error(f"角色书翻译过程中发生意外错误：{e}")
+        raise HTTPException(status_code=500, detail="角色书翻译过程中发生内部错误。")
+
+    errors = [
+        f"{'.'.join(str(part) for part in r['key'])}: {r.get('error') or '未知错误'}"
+        for r in results if not r["success"]
+    ]
+    logger.info(f"角色书翻译完成：{len(results) - len(errors)}/{len(results)} 个字段成功。")
+    return TranslateLorebookResponse(
+        character_book=rebuild_lorebook(book, results),
+        progress={"completed": len(results), "total": len(fields)},
+        errors=errors,
+    )
+
+
+def create_batch_translator(data: BatchTranslateRequest) -> BatchTranslator:
+    """根据批量翻译请求构建 BatchTranslator"""
+    settings = get_settings()
+    translator = get_translator(
+        data.settings.model_dump(),
+        data.prompts.model_dump(),
+        data.use_langgraph,
+        data.glossary,
+        cache=get_translation_cache(),
+    )
+    return BatchTranslator(
+        translator,
+        max_concurrent=settings.batch_max_concurrent,
+        pack_short_fields=data.pack_short_fields,
+        checkpoint=get_batch_checkpoint_store() if data.batch_id else None,
+    )
+
+
+async def _iter_batch_frames(batch_translator: BatchTranslator,
+                             data: BatchTranslateRequest) -> AsyncIterator[Dict[str, Any]]:
+    """
+    逐帧产出批量翻译事件：
+    - {"type": "progress", "completed": n, "total": N}
+    - {"type": "result", "result": BatchTranslateResultItem, "completed": n, "total": N}
+    - {"type": "done", "progress": {"completed": N, "total": N}}
+    """
+    formatted_fields = [
+        {"field_name": f.field_name, "text": f.text} for f in data.fields
+    ]
+    total = len(formatted_fields)
+    completed = 0
+    yield {"type": "progress", "completed": completed, "total": total}
+
+    async with aclosing(batch_translator.iter_translate_fields(formatted_fields, data.batch_id)) as results:
+        async for result in results:
+            completed += 1
+            item = BatchTranslateResultItem(**result)
+            yield {
+                "type": "result",
+                "result": item.model_dump(),
+                "completed": completed,
+                "total": total,
+            }
+
+    yield {"type": "done", "progress": {"completed": completed, "total": total}}
+
+
+@router.post("/character/batch-translate", response_model=BatchTranslateResponse)
+async def batch_translate_fields(data: BatchTranslateRequest):
+    """批量翻译多个字段"""
+    if not data.fields:
+        return BatchTranslateResponse(
+            results=[], progress={"completed": 0, "total": 0}
         )
 
+    try:
+        batch_translator = create_batch_translator(data)
+
         # 转换字段格式
         formatted_fields = [
             {"field_name": f.field_name, "text": f.text} for f in data.fields
@@ -103,7 +205,7 @@ async def batch_translate_fields(data: BatchTranslateRequest):
             progress_info["completed"] = completed
 
         results = await batch_translator.translate_fields(
-            formatted_fields, progress_callback
+            formatted_fields, progress_callback, batch_id=data.batch_id
         )
         return BatchTranslateResponse(results=results, progress=progress_info)
 
@@ -115,3 +217,64 @@ async def batch_translate_fields(data: BatchTranslateRequest):
     except Exception as e:
         logger.error(f"批量翻译过程中发生意外错误：{e}")
         raise HTTPException(status_code=500, detail="批量翻译过程中发生内部错误。")
+
+
+@router.post("/character/batch-translate/stream")
+async def batch_translate_fields_stream(data: BatchTranslateRequest):
+    """
+    流式批量翻译：以 NDJSON 格式逐行返回进度帧和每个字段的结果，
+    字段一旦翻译完成立即推送，无需等待整批结束。
+    """
+    try:
+        batch_translator = create_batch_translator(data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def ndjson_lines():
+        try:
+            async with aclosing(_iter_batch_frames(batch_translator, data)) as frames:
+                async for frame in frames:
+                    yield json.dumps(frame, ensure_ascii=False) + "\n"
+        except Exception as e:
+            logger.error(f"流式批量翻译过程中发生意外错误：{e}")
+            yield json.dumps(
+                {"type": "error", "detail": "批量翻译过程中发生内部错误。"},
+                ensure_ascii=False,
+            ) + "\n"
+
+    return StreamingResponse(
+        ndjson_lines(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/character/batch-translate/ws")
+async def batch_translate_fields_ws(websocket: WebSocket):
+    """
+    WebSocket 批量翻译：客户端连接后发送一条 BatchTranslateRequest JSON，
+    服务端按完成顺序推送与 NDJSON 接口相同的帧，结束后关闭连接。
+    """
+    await websocket.accept()
+    try:
+        try:
+            data = BatchTranslateRequest.model_validate(await websocket.receive_json())
+            batch_translator = create_batch_translator(data)
+        except (ValidationError, ValueError) as e:
+            await websocket.send_json({"type": "error", "detail": str(e)})
+            await websocket.close(code=1008)
+            return
+
+        async with aclosing(_iter_batch_frames(batch_translator, data)) as frames:
+            async for frame in frames:
+                await websocket.send_json(frame)
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info("客户端断开了批量翻译 WebSocket 连接，已取消剩余任务。")
+    except Exception as e:
+        logger.error(f"WebSocket 批量翻译过程中发生意外错误：{e}")
+        try:
+            await websocket.send_json({"type": "error", "detail": "批量翻译过程中发生内部错误。"})
+            await websocket.close(code=1011)
+        except Exception:
+            pass
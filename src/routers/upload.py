@@ -2,48 +2,125 @@
 角色卡上传路由
 """
 import base64
+import hashlib
 import logging
+import os
+import uuid
 
 from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi.responses import FileResponse
 
-from ..extract_text import extract_embedded_text
-from ..utils import handle_uploaded_file
+from ..extract_text import extract_from_text_chunks
+from ..png_chunks import PngStreamScanner
+from ..utils import store_spooled_upload, get_content_object_path
+from ..services.upload_index import get_upload_index
+from ..services.io_pool import run_io
 from ..config.settings import get_settings
 
 router = APIRouter(prefix="/api/v1", tags=["upload"])
 logger = logging.getLogger(__name__)
 
 
+class _UploadSpooler:
+    """将上传内容分块写入临时文件，同时增量计算 SHA-256 并解析 PNG 块"""
+
+    def __init__(self, spool_path: str):
+        self.spool_path = spool_path
+        self.hasher = hashlib.sha256()
+        self.scanner = PngStreamScanner()
+        self._file = open(spool_path, "wb")
+
+    def consume(self, chunk: bytes) -> None:
+        self.hasher.update(chunk)
+        self.scanner.feed(chunk)
+        self._file.write(chunk)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+async def _spool_upload(file: UploadFile, spool_path: str, chunk_size: int):
+    """流式落盘上传内容，文件操作均在 I/O 线程池中执行，返回 (内容哈希, PNG 扫描器)"""
+    spooler = await run_io(_UploadSpooler, spool_path)
+    try:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            await run_io(spooler.consume, chunk)
+    finally:
+        await run_io(spooler.close)
+    return spooler.hasher.hexdigest(), spooler.scanner
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _remove_if_exists(path: str) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+
 @router.post("/character/upload")
-async def upload_character_card(file: UploadFile = File(...)):
+async def upload_character_card(file: UploadFile = File(...), inline_image: bool = False):
     """
-    接收上传的角色卡图片，提取 JSON 数据，并返回 JSON 和图片的 Base64 编码。
-    文件将根据角色名称保存，并通过哈希校验避免重复。
+    接收上传的角色卡图片，提取 JSON 数据，并返回 JSON 和按内容哈希寻址的图片 URL。
+    文件将根据角色名称保存，并通过哈希校验避免重复；inline_image=true 时额外返回 Base64 图片。
     """
     if not file.filename or not file.filename.endswith('.png'):
         raise HTTPException(status_code=400, detail="文件类型无效，请上传 .png 文件。")
 
-    content = await file.read()
     settings = get_settings()
+    spool_path = os.path.join(settings.upload_folder_abs, f".upload_{uuid.uuid4().hex}.part")
 
     try:
-        # 从图片内容中提取角色数据
-        character_data = extract_embedded_text(content)
+        content_hash, scanner = await _spool_upload(file, spool_path, settings.upload_chunk_size)
+
+        # 从流式解析得到的文本块中提取角色数据
+        character_data = extract_from_text_chunks(scanner.text_chunks) if scanner.is_png else None
         if not character_data:
             character_data = {"data": {"name": "新角色", "description": ""}}
         else:
             if "data" not in character_data:
                 character_data = {"data": character_data}
 
-        # 使用辅助函数保存文件
-        handle_uploaded_file(content, settings.upload_folder_abs, character_data)
+        # 将临时文件移动到最终位置
+        saved_path = await run_io(
+            store_spooled_upload,
+            spool_path, content_hash, settings.upload_folder_abs, character_data, get_upload_index()
+        )
 
         # 准备响应
-        image_b64 = base64.b64encode(content).decode('utf-8')
-        image_b64_data_uri = f"data:image/png;base64,{image_b64}"
-
-        return {"character_data": character_data, "image_b64": image_b64_data_uri}
+        response = {
+            "character_data": character_data,
+            "image_url": f"/api/v1/character/image/{content_hash}",
+            "image_hash": content_hash,
+        }
+        if inline_image:
+            image_b64 = base64.b64encode(await run_io(_read_file, saved_path)).decode('utf-8')
+            response["image_b64"] = f"data:image/png;base64,{image_b64}"
+        return response
 
     except Exception as e:
         logger.error(f"处理上传的卡片时出错：{e}")
         raise HTTPException(status_code=500, detail="处理上传的卡片时发生内部错误。")
+    finally:
+        await run_io(_remove_if_exists, spool_path)
+
+
+@router.get("/character/image/{content_hash}")
+async def get_character_image(content_hash: str):
+    """按内容哈希返回已上传的角色卡图片（内容不可变，允许长期缓存）"""
+    object_path = get_content_object_path(get_settings().upload_folder_abs, content_hash)
+    if object_path is None or not os.path.isfile(object_path):
+        raise HTTPException(status_code=404, detail="图片不存在。")
+    return FileResponse(
+        object_path,
+        media_type="image/png",
+        headers={
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "ETag": f'"{content_hash}"',
+        },
+    )
@@ -0,0 +1,123 @@
+"""
+批量翻译检查点
+每个字段翻译成功后立即以 (批次 ID, 字段内容哈希) 为键持久化，哈希覆盖字段、原文、系统提示词、模型与词库，
+更换提示词、模型或词库后重新提交的批次不会复用旧译文；
+进程重启或连接中断后客户端以相同批次 ID 重新提交，已完成的字段直接返回，不再调用上游
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ..config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def make_field_hash(field_name: str, text: str, system_prompt: str, model_name: str, glossary: str = "") -> str:
+    """计算字段内容哈希（字段名决定提示模板，因此一并计入）"""
+    digest = hashlib.sha256()
+    for part in (field_name, text, system_prompt, model_name, glossary or ""):
+        encoded = part.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class BatchCheckpointStore:
+    """SQLite 持久化的批量翻译检查点（线程安全），只记录成功的字段结果"""
+
+    def __init__(self, db_path: str, ttl: float = 7 * 24 * 3600):
+        self.db_path = db_path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            " batch_id TEXT NOT NULL,"
+            " field_hash TEXT NOT NULL,"
+            " result TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (batch_id, field_hash))"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_checkpoints_created ON checkpoints (created_at)"
+        )
+        self._conn.commit()
+
+    def load(self, batch_id: str) -> Dict[str, Dict[str, Any]]:
+        """返回批次中已完成字段的结果，键为字段内容哈希"""
+        cutoff = time.time() - self.ttl if self.ttl > 0 else 0
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT field_hash, result FROM checkpoints WHERE batch_id = ? AND created_at >= ?",
+                (batch_id, cutoff),
+            ).fetchall()
+        return {field_hash: json.loads(result) for field_hash, result in rows}
+
+    def save(self, batch_id: str, field_hash: str, result: Dict[str, Any]) -> None:
+        """记录一个已完成字段的结果"""
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints (batch_id, field_hash, result, created_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    (batch_id, field_hash, json.dumps(result, ensure_ascii=False), now),
+                )
+                self._conn.commit()
+                self._writes_since_prune += 1
+                if self._writes_since_prune >= 500 and self.ttl > 0:
+                    self._writes_since_prune = 0
+                    self._conn.execute("DELETE FROM checkpoints WHERE created_at < ?", (now - self.ttl,))
+                    self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"写入批量翻译检查点失败: {e}")
+
+    def discard(self, batch_id: str) -> None:
+        """删除批次的全部检查点"""
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE batch_id = ?", (batch_id,))
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_store: Optional[BatchCheckpointStore] = None
+_store_lock = threading.Lock()
+
+
+def get_batch_checkpoint_store() -> Optional[BatchCheckpointStore]:
+    """获取进程级共享的检查点存储；配置中禁用时返回 None"""
+    global _store
+    settings = get_settings()
+    if not settings.batch_checkpoint_enabled:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = BatchCheckpointStore(
+                    os.path.join(settings.upload_folder_abs, settings.batch_checkpoint_filename),
+                    ttl=settings.batch_checkpoint_ttl,
+                )
+    return _store
+
+
+def close_batch_checkpoint_store() -> None:
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
@@ -0,0 +1,69 @@
+"""
+导出结果缓存
+以 (基础图片哈希, 角色卡 JSON 哈希) 为键缓存导出的 PNG，容量按总字节数限制（内存 LRU）
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+from ..config.settings import get_settings
+
+
+def make_export_key(image_data: bytes, character_data: Any) -> str:
+    """计算导出缓存键；JSON 按规范化形式哈希，键顺序不同的同一张卡共用缓存"""
+    card_json = json.dumps(character_data, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    card_hash = hashlib.sha256(card_json.encode("utf-8")).hexdigest()
+    return f"{hashlib.sha256(image_data).hexdigest()}:{card_hash}"
+
+
+class ExportCache:
+    """按总字节数淘汰的 LRU 缓存（线程安全）"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def set(self, key: str, data: bytes) -> None:
+        # 单个结果超过总容量时不缓存
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= len(old)
+            self._entries[key] = data
+            self.total_bytes += len(data)
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_cache: Optional[ExportCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_export_cache() -> Optional[ExportCache]:
+    """获取进程级共享的导出缓存；容量配置为 0 时返回 None"""
+    global _cache
+    max_bytes = get_settings().export_cache_max_bytes
+    if max_bytes <= 0:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ExportCache(max_bytes=max_bytes)
+    return _cache
@@ -0,0 +1,83 @@
+"""
+短字段打包
+将共享同一提示模板的多个短字段合并为一个 JSON 请求，并校验模型返回的映射
+"""
+import json
+import re
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from .token_estimator import estimate_tokens
+
+PACKED_INSTRUCTION = (
+    "\n\n【批量模式 / Batch Mode】\n"
+    "输入是一个 JSON 对象，键为编号，值为待翻译文本。请按照上述要求分别翻译每个值，"
+    "只输出一个 JSON 对象，键保持不变，值替换为对应译文，不要输出任何额外说明。\n"
+    "The input is a JSON object mapping ids to source texts. Translate every value "
+    "according to the instructions above and reply with ONLY a JSON object that has "
+    "exactly the same keys, each mapped to its translation."
+)
+
+_FENCE_PATTERN = re.compile(r"^```(?:json)?\s*|\s*```$", re.IGNORECASE)
+
+
+def pack_key(index: int) -> str:
+    """打包请求中字段的编号键"""
+    return f"f{index}"
+
+
+def plan_packs(fields: List[Dict[str, Any]], prompt_of: Callable[[str], str],
+               max_field_chars: int, token_budget: int,
+               max_items: int = 40) -> Tuple[List[List[int]], List[int]]:
+    """
+    规划打包方案。
+    返回 (packs, singles)：packs 为可合并请求的字段下标组，singles 为需单独翻译的字段下标。
+    """
+    groups: Dict[str, List[int]] = {}
+    singles: List[int] = []
+    for index, field_data in enumerate(fields):
+        text = field_data["text"]
+        if not text or not text.strip() or len(text) > max_field_chars:
+            singles.append(index)
+            continue
+        groups.setdefault(prompt_of(field_data["field_name"]), []).append(index)
+
+    packs: List[List[int]] = []
+    for indexes in groups.values():
+        current: List[int] = []
+        current_tokens = 0
+        for index in indexes:
+            tokens = estimate_tokens(fields[index]["text"]) + 4
+            if current and (current_tokens + tokens > token_budget or len(current) >= max_items):
+                packs.append(current)
+                current, current_tokens = [], 0
+            current.append(index)
+            current_tokens += tokens
+        if current:
+            packs.append(current)
+
+    # 只有一个字段的组没有打包意义
+    for pack in [p for p in packs if len(p) == 1]:
+        packs.remove(pack)
+        singles.extend(pack)
+    return packs, sorted(singles)
+
+
+def parse_packed_response(raw: str, keys: Iterable[str]) -> Dict[str, str]:
+    """解析模型返回的 JSON 映射，只保留预期键中值为非空字符串的条目。"""
+    text = _FENCE_PATTERN.sub("", raw.strip())
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+
+    parsed = {}
+    for key in keys:
+        value = data.get(key)
+        if isinstance(value, str) and value.strip():
+            parsed[key] = value
+    return parsed
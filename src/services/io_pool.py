@@ -0,0 +1,46 @@
+"""
+进程级文件 I/O 线程池
+路由中的磁盘读写、PNG 重写等阻塞操作统一提交到容量有限的线程池，避免阻塞事件循环
+"""
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from ..config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_io_executor() -> ThreadPoolExecutor:
+    """获取共享 I/O 线程池；未经生命周期初始化时按需创建"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                max_workers = get_settings().io_max_workers
+                _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="file-io")
+                logger.info(f"文件 I/O 线程池已创建，线程数 {max_workers}。")
+    return _executor
+
+
+async def run_io(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """在共享 I/O 线程池中执行阻塞函数"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_io_executor(), functools.partial(func, *args, **kwargs))
+
+
+def shutdown_io_executor() -> None:
+    """关闭共享 I/O 线程池（应用退出时调用）"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
@@ -0,0 +1,185 @@
+"""
+进程级 ChatOpenAI 客户端池
+按 (base_url, api_key 哈希, 模型, 连接限制) 复用 LLM 实例及其底层 httpx 连接池，
+避免每次调用都重新建立 TLS 连接
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+import httpx
+from langchain_openai import ChatOpenAI
+from pydantic import SecretStr
+
+from ..config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+PoolKey = Tuple[str, str, str, int, int, int]
+
+
+def hash_api_key(api_key: str) -> str:
+    """返回 API Key 的短哈希，避免明文密钥出现在缓存键或日志中。"""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def _close_http_clients(http_client: httpx.Client, http_async_client: httpx.AsyncClient) -> None:
+    """关闭一对 HTTP 客户端；没有运行中的事件循环时在临时循环中关闭异步客户端"""
+    try:
+        http_client.close()
+    except Exception as e:
+        logger.warning(f"关闭同步 HTTP 客户端失败: {e}")
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    try:
+        if loop is not None:
+            loop.create_task(http_async_client.aclose())
+        else:
+            asyncio.run(http_async_client.aclose())
+    except Exception as e:
+        logger.warning(f"关闭异步 HTTP 客户端失败: {e}")
+
+
+@dataclass
+class _PoolEntry:
+    """池中的单个 LLM 实例及其 HTTP 客户端"""
+    llm: ChatOpenAI
+    http_client: httpx.Client
+    http_async_client: httpx.AsyncClient
+    # LLM 实例被回收时关闭其 HTTP 客户端
+    finalizer: weakref.finalize
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class LLMClientPool:
+    """带 LRU 上限和空闲淘汰的 ChatOpenAI 客户端注册表（线程安全）"""
+
+    def __init__(self, max_size: int = 32, idle_timeout: float = 600.0,
+                 max_connections: int = 20, max_keepalive_connections: int = 10,
+                 keepalive_expiry: float = 60.0, max_completion_tokens: int = 8192):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.max_completion_tokens = max_completion_tokens
+        self._entries: "OrderedDict[PoolKey, _PoolEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _make_key(self, model_name: str, base_url: str, api_key: str) -> PoolKey:
+        return (
+            base_url.rstrip("/"),
+            hash_api_key(api_key),
+            model_name,
+            self.max_completion_tokens,
+            self.max_connections,
+            self.max_keepalive_connections,
+        )
+
+    def _create_entry(self, model_name: str, base_url: str, api_key: str) -> _PoolEntry:
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        http_client = httpx.Client(limits=limits)
+        http_async_client = httpx.AsyncClient(limits=limits)
+        llm = ChatOpenAI(
+            model=model_name,
+            base_url=base_url,
+            api_key=SecretStr(api_key),
+            max_completion_tokens=self.max_completion_tokens,
+            http_client=http_client,
+            http_async_client=http_async_client,
+        )
+        # 被淘汰的实例可能仍被调用方持有（如翻译器的 self.llm 或进行中的请求），
+        # 因此不在淘汰时关闭，而是在实例不再被引用、被回收时关闭
+        finalizer = weakref.finalize(llm, _close_http_clients, http_client, http_async_client)
+        return _PoolEntry(llm=llm, http_client=http_client, http_async_client=http_async_client,
+                          finalizer=finalizer)
+
+    def get(self, model_name: str, base_url: str, api_key: str) -> ChatOpenAI:
+        """获取（或创建）与给定配置对应的共享 LLM 实例。"""
+        key = self._make_key(model_name, base_url, api_key)
+        with self._lock:
+            # 淘汰只是从池中移除，客户端在实例不再被引用后由 finalizer 关闭
+            self._evict_idle_locked()
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._create_entry(model_name, base_url, api_key)
+                self._entries[key] = entry
+                logger.debug(f"创建新的 LLM 客户端: {key[0]} / {model_name}")
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+            else:
+                self._entries.move_to_end(key)
+            entry.last_used = time.monotonic()
+        return entry.llm
+
+    def _evict_idle_locked(self) -> None:
+        """移除空闲超时的条目（调用方需持有锁）。"""
+        if self.idle_timeout <= 0:
+            return
+        now = time.monotonic()
+        for key in [k for k, e in self._entries.items() if now - e.last_used > self.idle_timeout]:
+            del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """关闭并清空所有客户端（同步调用）。"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            entry.finalizer()
+
+    async def aclose(self) -> None:
+        """关闭并清空所有客户端，等待异步客户端释放连接。"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            if not entry.finalizer.detach():
+                continue
+            try:
+                entry.http_client.close()
+                await entry.http_async_client.aclose()
+            except Exception as e:
+                logger.warning(f"关闭 HTTP 客户端失败: {e}")
+
+
+_pool: Optional[LLMClientPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_llm_pool() -> LLMClientPool:
+    """获取进程级共享的客户端池单例"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                settings = get_settings()
+                _pool = LLMClientPool(
+                    max_size=settings.llm_pool_max_size,
+                    idle_timeout=settings.llm_pool_idle_timeout,
+                    max_connections=settings.llm_max_connections,
+                    max_keepalive_connections=settings.llm_max_keepalive_connections,
+                    keepalive_expiry=settings.llm_keepalive_expiry,
+                    max_completion_tokens=settings.max_completion_tokens,
+                )
+    return _pool
+
+
+def get_chat_llm(model_name: str, base_url: str, api_key: str) -> ChatOpenAI:
+    """从共享池中获取 ChatOpenAI 实例"""
+    return get_llm_pool().get(model_name, base_url, api_key)
@@ -0,0 +1,71 @@
+"""
+角色书（lorebook）整本翻译
+将角色书拆分为批量翻译字段：条目内容逐条翻译，关键词按列表字段逐元素翻译，备注作为短字段参与打包；
+相同文本由 BatchTranslator 批内去重，翻译完成后按字段路径重建角色书
+"""
+import copy
+from typing import Any, Dict, List
+
+# V2 规范使用 entries，旧版前端使用 lore
+ENTRY_LIST_NAMES = ("entries", "lore")
+
+
+def _is_text(value: Any) -> bool:
+    return isinstance(value, str) and bool(value.strip())
+
+
+def count_lorebook_entries(book: Dict[str, Any]) -> int:
+    return sum(len(book[name]) for name in ENTRY_LIST_NAMES if isinstance(book.get(name), list))
+
+
+def collect_lorebook_fields(book: Dict[str, Any], translate_keys: bool = True,
+                            translate_comments: bool = True) -> List[Dict[str, Any]]:
+    """
+    收集角色书中需要翻译的字段，key 为字段在角色书中的路径。
+    keys / secondary_keys 以列表字段提交，保持下标对齐。
+    """
+    fields = []
+    if _is_text(book.get("description")):
+        fields.append({"field_name": "character_book.description", "text": book["description"],
+                       "key": ["description"]})
+
+    for list_name in ENTRY_LIST_NAMES:
+        entries = book.get(list_name)
+        if not isinstance(entries, list):
+            continue
+        for i, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                continue
+            if _is_text(entry.get("content")):
+                fields.append({"field_name": "character_book.content", "text": entry["content"],
+                               "key": [list_name, i, "content"]})
+            if translate_comments and _is_text(entry.get("comment")):
+                fields.append({"field_name": "character_book.comment", "text": entry["comment"],
+                               "key": [list_name, i, "comment"]})
+            if not translate_keys:
+                continue
+            for keys_name in ("keys", "secondary_keys"):
+                keys = entry.get(keys_name)
+                if isinstance(keys, list) and any(_is_text(k) for k in keys):
+                    fields.append({"field_name": f"character_book.{keys_name}",
+                                   "text": [k if isinstance(k, str) else "" for k in keys],
+                                   "key": [list_name, i, keys_name]})
+    return fields
+
+
+def rebuild_lorebook(book: Dict[str, Any], results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """返回写入译文的角色书副本：失败字段保留原文，列表字段中失败的元素保留原文"""
+    translated = copy.deepcopy(book)
+    for result in results:
+        *parents, last = result["key"]
+        target = translated
+        for part in parents:
+            target = target[part]
+        if isinstance(result["translated_text"], list):
+            original = target[last]
+            target[last] = [
+                text or original[i] for i, text in enumerate(result["translated_text"])
+            ]
+        elif result.get("success"):
+            target[last] = result["translated_text"]
+    return translated
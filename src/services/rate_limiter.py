@@ -0,0 +1,237 @@
+"""
+上游限流控制
+- 按 (base_url, api_key 哈希, 模型) 维护进程内共享的 AIMD 自适应并发限制器：
+  调用成功时缓慢放大并发，遇到 429/5xx 时减半；429 时只暂停该密钥的调用，
+  优先遵守 Retry-After，未提供时按连续 429 次数短指数退避
+- 按 (base_url, api_key 哈希) 维护令牌桶，依据已知的 RPM/TPM 配额预先控制调用节奏
+"""
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+
+from ..config.settings import get_settings
+from ..errors import ErrorCode, TranslationError
+from .token_estimator import estimate_tokens
+from .llm_pool import hash_api_key
+
+logger = logging.getLogger(__name__)
+
+# 视为上游过载、需要收缩并发的错误
+OVERLOAD_ERROR_CODES = {
+    ErrorCode.RATE_LIMIT_ERROR,
+    ErrorCode.TOO_MANY_REQUESTS,
+    ErrorCode.INTERNAL_ERROR,
+    ErrorCode.BAD_GATEWAY,
+    ErrorCode.SERVICE_UNAVAILABLE,
+    ErrorCode.GATEWAY_TIMEOUT,
+    ErrorCode.API_TIMEOUT_ERROR,
+}
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD 自适应并发限制器"""
+
+    def __init__(self, initial: float = 4, min_limit: float = 1, max_limit: float = 32,
+                 decrease_factor: float = 0.5, decrease_cooldown: float = 1.0,
+                 backoff_base: float = 1.0, backoff_max: float = 30.0):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._rate_limit_streak = 0
+        self._conditions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Condition]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        condition = self._conditions.get(loop)
+        if condition is None:
+            condition = asyncio.Condition()
+            self._conditions[loop] = condition
+        return condition
+
+    async def acquire(self) -> None:
+        """等待直到并发未超限且不处于 Retry-After 暂停期。"""
+        condition = self._condition()
+        async with condition:
+            while True:
+                wait = self.blocked_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                try:
+                    await asyncio.wait_for(condition.wait(), timeout=wait if wait > 0 else None)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self) -> None:
+        condition = self._condition()
+        async with condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            condition.notify_all()
+
+    @asynccontextmanager
+    async def slot(self):
+        """占用一个自适应并发槽位"""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            await self.release()
+
+    def record_success(self) -> None:
+        """加性增长：每完成约 limit 次成功调用，并发上限 +1。"""
+        self._rate_limit_streak = 0
+        self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def record_failure(self, error: TranslationError) -> None:
+        """乘性减少：上游过载时收缩并发，并按 Retry-After（429 时缺省为指数退避）暂停后续调用。"""
+        if error.error_code not in OVERLOAD_ERROR_CODES and not (
+            error.http_status and (error.http_status == 429 or error.http_status >= 500)
+        ):
+            return
+
+        now = time.monotonic()
+        pause = error.retry_after
+        if error.error_code in (ErrorCode.RATE_LIMIT_ERROR, ErrorCode.TOO_MANY_REQUESTS) or error.http_status == 429:
+            self._rate_limit_streak += 1
+            if not pause:
+                pause = min(self.backoff_max, self.backoff_base * 2 ** (self._rate_limit_streak - 1))
+        if pause:
+            self.blocked_until = max(self.blocked_until, now + pause)
+        # 同一波并发失败只收缩一次
+        if now - self._last_decrease >= self.decrease_cooldown:
+            self._last_decrease = now
+            old_limit = self.limit
+            self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+            logger.info(f"上游过载（{error.error_code.value}），并发上限 {old_limit:.1f} -> {self.limit:.1f}")
+
+
+_limiters: Dict[Tuple[str, str, str], AdaptiveConcurrencyLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_adaptive_limiter(base_url: str, api_key: str, model_name: str) -> AdaptiveConcurrencyLimiter:
+    """获取 (base_url, api_key 哈希, 模型) 对应的进程级共享限制器；配额按密钥计算，一个密钥被限流不影响其他密钥"""
+    key = (base_url.rstrip("/"), hash_api_key(api_key or ""), model_name)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            settings = get_settings()
+            limiter = AdaptiveConcurrencyLimiter(
+                initial=settings.adaptive_initial_concurrency,
+                min_limit=settings.adaptive_min_concurrency,
+                max_limit=settings.adaptive_max_concurrency,
+            )
+            _limiters[key] = limiter
+    return limiter
+
+
+class TokenBucketLimiter:
+    """
+    RPM/TPM 双令牌桶。
+    采用预留模式：调用前立即扣除令牌（允许透支），再按透支量计算需要等待的时间，
+    因此并发调用者按到达顺序公平排队。同时提供同步与异步等待接口。
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._request_level = float(requests_per_minute)
+        self._token_level = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill_locked(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        if self.requests_per_minute > 0:
+            self._request_level = min(
+                float(self.requests_per_minute),
+                self._request_level + elapsed * self.requests_per_minute / 60.0,
+            )
+        if self.tokens_per_minute > 0:
+            self._token_level = min(
+                float(self.tokens_per_minute),
+                self._token_level + elapsed * self.tokens_per_minute / 60.0,
+            )
+
+    def reserve(self, tokens: int) -> float:
+        """预留一次调用所需的配额，返回调用前需要等待的秒数。"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill_locked(now)
+            wait = 0.0
+            if self.requests_per_minute > 0:
+                self._request_level -= 1
+                if self._request_level < 0:
+                    wait = max(wait, -self._request_level * 60.0 / self.requests_per_minute)
+            if self.tokens_per_minute > 0:
+                # 单次调用超过整桶容量时按整桶计，避免永远无法满足
+                self._token_level -= min(tokens, self.tokens_per_minute)
+                if self._token_level < 0:
+                    wait = max(wait, -self._token_level * 60.0 / self.tokens_per_minute)
+            return wait
+
+    def acquire_sync(self, tokens: int) -> None:
+        """同步等待配额（用于同步翻译节点）。"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            logger.debug(f"令牌桶限流，等待 {wait:.2f} 秒")
+            time.sleep(wait)
+
+    async def acquire(self, tokens: int) -> None:
+        """异步等待配额。"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            logger.debug(f"令牌桶限流，等待 {wait:.2f} 秒")
+            await asyncio.sleep(wait)
+
+
+def estimate_request_tokens(*texts: str, expected_output: Optional[int] = None) -> int:
+    """
+    估算一次调用消耗的 token 数：输入文本之和加上预期输出。
+    未指定预期输出时按最后一段文本（待翻译原文）的长度估计。
+    """
+    input_tokens = sum(estimate_tokens(text) for text in texts)
+    if expected_output is None:
+        expected_output = estimate_tokens(texts[-1]) if texts else 0
+    return input_tokens + expected_output
+
+
+_buckets: Dict[Tuple[str, str], TokenBucketLimiter] = {}
+_buckets_lock = threading.Lock()
+
+
+def get_token_bucket(base_url: str, api_key: str) -> Optional[TokenBucketLimiter]:
+    """
+    获取 (base_url, api_key 哈希) 对应的令牌桶。
+    配额来自 provider_rate_limits 中与 base_url 匹配的条目，否则使用默认 RPM/TPM；
+    两者均为 0 时不限流，返回 None。
+    """
+    normalized_url = base_url.rstrip("/")
+    settings = get_settings()
+    limits = settings.provider_rate_limits.get(normalized_url) or settings.provider_rate_limits.get(base_url) or {}
+    rpm = limits.get("rpm", settings.provider_default_rpm)
+    tpm = limits.get("tpm", settings.provider_default_tpm)
+    if rpm <= 0 and tpm <= 0:
+        return None
+
+    key = (normalized_url, hash_api_key(api_key))
+    with _buckets_lock:
+        bucket = _buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucketLimiter(requests_per_minute=rpm, tokens_per_minute=tpm)
+            _buckets[key] = bucket
+    return bucket
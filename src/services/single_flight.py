@@ -0,0 +1,97 @@
+"""
+进行中请求去重（single-flight）
+相同 (上游地址, API Key, 模型, 系统提示词, 原文) 的并发翻译只向上游发送一次，结果分发给所有等待者。
+上游调用在独立任务中执行：单个等待者被取消不影响其他等待者，全部取消时才取消上游调用。
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import weakref
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from .llm_pool import hash_api_key
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def make_flight_key(base_url: str, api_key: str, model_name: str, system_prompt: str, text: str) -> str:
+    """计算去重键；按 API Key 隔离，不同用户的请求不会合并到他人的密钥上"""
+    digest = hashlib.sha256()
+    for part in (base_url or "", hash_api_key(api_key or ""), model_name, system_prompt, text):
+        encoded = part.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """按键合并并发调用（asyncio 任务绑定事件循环，按循环分别维护）"""
+
+    def __init__(self):
+        self.coalesced = 0
+        self._flights: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, _Flight]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def _loop_flights(self) -> Dict[str, _Flight]:
+        loop = asyncio.get_running_loop()
+        flights = self._flights.get(loop)
+        if flights is None:
+            flights = {}
+            self._flights[loop] = flights
+        return flights
+
+    def in_flight(self) -> int:
+        """当前事件循环中进行中的调用数"""
+        return len(self._loop_flights())
+
+    async def do(self, key: str, call: Callable[[], Awaitable[T]]) -> T:
+        """执行 call；若相同键的调用正在进行，则等待其结果（成功或异常）"""
+        flights = self._loop_flights()
+        flight = flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(call()))
+            flights[key] = flight
+
+            def forget(_task: asyncio.Task, flight: _Flight = flight) -> None:
+                if flights.get(key) is flight:
+                    del flights[key]
+
+            flight.task.add_done_callback(forget)
+        else:
+            self.coalesced += 1
+            logger.debug("合并了一个相同的进行中翻译请求。")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # 所有等待者都已取消，不再需要上游结果
+                flight.task.cancel()
+
+
+_single_flight: Optional[SingleFlight] = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight() -> SingleFlight:
+    """获取进程级共享的去重器"""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+    return _single_flight
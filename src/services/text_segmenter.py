@@ -0,0 +1,116 @@
+"""
+长文本分段器
+按 <START> 标记、段落、对话轮次、行、句子的优先级切分超长字段，
+保证切分点不落在 {{char}}/{{user}} 等宏内部，且各段按序拼接后与原文完全一致
+"""
+import re
+from dataclasses import dataclass
+from typing import List
+
+# 切分边界（零宽匹配），按优先级从粗到细排列
+_BOUNDARIES = [
+    # mes_example 中每个 <START> 开启一段新的示例对话
+    re.compile(r"(?=<START>)"),
+    # 空行分隔的段落
+    re.compile(r"(?<=\n\n)(?=[^\n])"),
+    # 以 {{char}} / {{user}} 开头的对话轮次
+    re.compile(r"(?<=\n)(?=\{\{(?:char|user)\}\})", re.IGNORECASE),
+    # 普通换行
+    re.compile(r"(?<=\n)(?=[^\n])"),
+    # 句末标点
+    re.compile(r"(?<=[。！？])(?=[^。！？])|(?<=[.!?…] )"),
+]
+
+# 末尾未闭合的宏；也匹配只剩一个 "{" 的情况（切分点落在两个左花括号之间）
+_OPEN_MACRO = re.compile(r"\{\{?(?:(?!\}\}).)*$", re.DOTALL)
+
+
+@dataclass
+class TextSegment:
+    """待翻译片段；leading/trailing 为原样保留的首尾空白"""
+    leading: str
+    text: str
+    trailing: str
+
+
+def _hard_split(text: str, max_chars: int) -> List[str]:
+    """没有可用边界时按长度硬切，避开未闭合的宏。"""
+    pieces = []
+    while len(text) > max_chars:
+        cut = max_chars
+        match = _OPEN_MACRO.search(text[:cut])
+        if match and match.start() > 0:
+            cut = match.start()
+        pieces.append(text[:cut])
+        text = text[cut:]
+    if text:
+        pieces.append(text)
+    return pieces
+
+
+def _split_recursive(text: str, max_chars: int, level: int = 0) -> List[str]:
+    if len(text) <= max_chars:
+        return [text]
+    if level >= len(_BOUNDARIES):
+        return _hard_split(text, max_chars)
+
+    parts = [p for p in _BOUNDARIES[level].split(text) if p]
+    if len(parts) <= 1:
+        return _split_recursive(text, max_chars, level + 1)
+
+    units = []
+    for part in parts:
+        units.extend(_split_recursive(part, max_chars, level + 1))
+    return units
+
+
+def _pack(units: List[str], max_chars: int) -> List[str]:
+    """贪心合并相邻的小片段，减少请求数。"""
+    chunks: List[str] = []
+    current = ""
+    for unit in units:
+        if current and len(current) + len(unit) > max_chars:
+            chunks.append(current)
+            current = unit
+        else:
+            current += unit
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_text(text: str, max_chars: int) -> List[TextSegment]:
+    """
+    将文本切分为不超过 max_chars 的片段。
+    max_chars <= 0 或文本不超长时返回单个片段。
+    """
+    if max_chars <= 0 or len(text) <= max_chars:
+        chunks = [text]
+    else:
+        chunks = _pack(_split_recursive(text, max_chars), max_chars)
+
+    segments = []
+    for chunk in chunks:
+        core = chunk.strip()
+        if not core:
+            # 纯空白片段并入前一个片段的尾部
+            if segments:
+                segments[-1].trailing += chunk
+            else:
+                segments.append(TextSegment(leading=chunk, text="", trailing=""))
+            continue
+        start = chunk.index(core)
+        segments.append(TextSegment(
+            leading=chunk[:start],
+            text=core,
+            trailing=chunk[start + len(core):],
+        ))
+    return segments
+
+
+def join_segments(segments: List[TextSegment], translations: List[str]) -> str:
+    """按原顺序拼接译文，恢复原文的首尾空白。"""
+    return "".join(
+        seg.leading + (translated.strip() if seg.text else "") + seg.trailing
+        for seg, translated in zip(segments, translations)
+    )
@@ -0,0 +1,17 @@
+"""
+粗略的 token 数估算
+不依赖具体模型的分词器：CJK 字符约 1 token/字，其余字符约 4 字符/token
+"""
+import math
+import re
+
+_CJK_PATTERN = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]")
+
+
+def estimate_tokens(text: str) -> int:
+    """估算文本的 token 数（偏保守）"""
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    other = len(text) - cjk
+    return cjk + math.ceil(other / 4)
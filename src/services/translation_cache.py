@@ -0,0 +1,219 @@
+"""
+内容寻址的翻译缓存
+以 (模型名, 完整系统提示词, 原文) 的哈希为键，内存 LRU 层在前，SQLite 磁盘层在后。
+命中时只读：访问时间先记在内存中，随后续写入批量落盘，过期条目由定期清理删除
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from ..config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+# 内存中积累的访问时间超过该数量时，即使没有写入也批量落盘
+ACCESS_FLUSH_THRESHOLD = 1024
+
+
+def make_cache_key(model_name: str, system_prompt: str, text: str) -> str:
+    """计算翻译缓存键"""
+    digest = hashlib.sha256()
+    for part in (model_name, system_prompt, text):
+        encoded = part.encode("utf-8")
+        # 写入长度前缀，避免不同切分方式拼出相同的字节串
+        digest.update(len(encoded).to_bytes(8, "big"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+class TranslationCache:
+    """两级翻译缓存：内存 LRU + SQLite，支持 TTL 与容量淘汰（线程安全）"""
+
+    def __init__(self, db_path: Optional[str] = None, memory_size: int = 1024,
+                 max_entries: int = 100_000, ttl: float = 30 * 24 * 3600):
+        self.db_path = db_path
+        self.memory_size = memory_size
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes_since_prune = 0
+        # 磁盘命中的访问时间，延迟到下次写入时批量更新
+        self._pending_access: Dict[str, float] = {}
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path: str) -> None:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS translations ("
+                " key TEXT PRIMARY KEY,"
+                " translated TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_translations_accessed"
+                " ON translations (accessed_at)"
+            )
+            self._conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"无法打开翻译缓存数据库 {db_path}，仅使用内存缓存: {e}")
+            self._conn = None
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl > 0 and now - created_at > self.ttl
+
+    def _remember_locked(self, key: str, translated: str, created_at: float) -> None:
+        self._memory[key] = (translated, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """查询缓存，未命中或已过期返回 None。"""
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                translated, created_at = cached
+                if not self._is_expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return translated
+                del self._memory[key]
+
+            if self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT translated, created_at FROM translations WHERE key = ?",
+                        (key,),
+                    ).fetchone()
+                    if row is not None:
+                        translated, created_at = row
+                        if not self._is_expired(created_at, now):
+                            self._pending_access[key] = now
+                            if len(self._pending_access) >= ACCESS_FLUSH_THRESHOLD:
+                                self._flush_access_locked()
+                                self._conn.commit()
+                            self._remember_locked(key, translated, created_at)
+                            self.hits += 1
+                            return translated
+                except sqlite3.Error as e:
+                    logger.warning(f"读取翻译缓存失败: {e}")
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, translated: str) -> None:
+        """写入缓存。"""
+        now = time.time()
+        with self._lock:
+            self._remember_locked(key, translated, now)
+            if self._conn is None:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO translations (key, translated, created_at, accessed_at)"
+                    " VALUES (?, ?, ?, ?)",
+                    (key, translated, now, now),
+                )
+                self._pending_access.pop(key, None)
+                self._flush_access_locked()
+                self._conn.commit()
+                self._writes_since_prune += 1
+                if self._writes_since_prune >= 100:
+                    self._prune_locked(now)
+            except sqlite3.Error as e:
+                logger.warning(f"写入翻译缓存失败: {e}")
+
+    def _flush_access_locked(self) -> None:
+        """将积累的访问时间写入数据库（由调用方提交）"""
+        if not self._pending_access:
+            return
+        self._conn.executemany(
+            "UPDATE translations SET accessed_at = ? WHERE key = ? AND accessed_at < ?",
+            [(accessed_at, key, accessed_at) for key, accessed_at in self._pending_access.items()],
+        )
+        self._pending_access.clear()
+
+    def _prune_locked(self, now: float) -> None:
+        """清理过期条目，并按最近访问时间淘汰超出容量的条目。"""
+        self._writes_since_prune = 0
+        if self.ttl > 0:
+            self._conn.execute(
+                "DELETE FROM translations WHERE created_at < ?", (now - self.ttl,)
+            )
+        if self.max_entries > 0:
+            self._conn.execute(
+                "DELETE FROM translations WHERE key IN ("
+                " SELECT key FROM translations ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """返回命中/未命中计数及当前容量。"""
+        with self._lock:
+            disk_entries = 0
+            if self._conn is not None:
+                try:
+                    disk_entries = self._conn.execute(
+                        "SELECT COUNT(*) FROM translations"
+                    ).fetchone()[0]
+                except sqlite3.Error:
+                    pass
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
+
+    def close(self) -> None:
+        """关闭数据库连接。"""
+        with self._lock:
+            if self._conn is not None:
+                try:
+                    self._flush_access_locked()
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"写入翻译缓存访问时间失败: {e}")
+                self._conn.close()
+                self._conn = None
+
+
+_cache: Optional[TranslationCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_translation_cache() -> Optional[TranslationCache]:
+    """获取进程级共享的翻译缓存；配置中禁用时返回 None"""
+    global _cache
+    settings = get_settings()
+    if not settings.translation_cache_enabled:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TranslationCache(
+                    db_path=os.path.join(
+                        settings.upload_folder_abs, settings.translation_cache_filename
+                    ),
+                    memory_size=settings.translation_cache_memory_size,
+                    max_entries=settings.translation_cache_max_entries,
+                    ttl=settings.translation_cache_ttl,
+                )
+    return _cache
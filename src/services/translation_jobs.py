@@ -0,0 +1,290 @@
+"""
+角色卡级翻译任务
+提交整张角色卡后立即返回任务 ID，字段写入跨进程共享的工作队列，由各工作进程的后台循环
+领取并使用 BatchTranslator 翻译；客户端可在任意进程轮询状态或流式订阅结果，
+浏览器断开或代理超时不会丢失已完成的翻译
+"""
+import asyncio
+import copy
+import logging
+import os
+import socket
+import threading
+import uuid
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional, Set
+
+from ..batch_translate import BatchTranslator
+from ..utils import get_translator
+from ..config.settings import get_settings
+from .translation_cache import get_translation_cache
+from .work_queue import SharedWorkQueue, get_work_queue
+from .io_pool import run_io
+
+logger = logging.getLogger(__name__)
+
+# 角色卡 data 下直接翻译的文本字段
+CARD_TEXT_FIELDS = (
+    "description", "personality", "scenario", "first_mes", "mes_example", "creator_notes",
+)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINISHED_STATES = (JOB_COMPLETED, JOB_FAILED, JOB_CANCELLED)
+
+
+def _card_data(card: Dict[str, Any]) -> Dict[str, Any]:
+    data = card.get("data")
+    return data if isinstance(data, dict) else card
+
+
+def _is_text(value: Any) -> bool:
+    return isinstance(value, str) and bool(value.strip())
+
+
+def collect_card_fields(card: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    收集角色卡中所有需要翻译的字段。
+    每项包含 field_name（决定提示模板）、text 和 key（字段在 data 下的路径）。
+    """
+    data = _card_data(card)
+    fields = []
+    for name in CARD_TEXT_FIELDS:
+        if _is_text(data.get(name)):
+            fields.append({"field_name": name, "text": data[name], "key": [name]})
+
+    # 列表字段逐元素入队，各元素可由不同工作进程并行翻译
+    for list_name in ("alternate_greetings", "tags"):
+        items = data.get(list_name)
+        if not isinstance(items, list):
+            continue
+        for i, item in enumerate(items):
+            if _is_text(item):
+                fields.append({"field_name": list_name, "text": item, "key": [list_name, i]})
+
+    book = data.get("character_book")
+    if isinstance(book, dict):
+        if _is_text(book.get("description")):
+            fields.append({"field_name": "character_book.description", "text": book["description"],
+                           "key": ["character_book", "description"]})
+        # V2 规范使用 entries，旧版前端使用 lore
+        for list_name in ("entries", "lore"):
+            entries = book.get(list_name)
+            if not isinstance(entries, list):
+                continue
+            for i, entry in enumerate(entries):
+                if isinstance(entry, dict) and _is_text(entry.get("content")):
+                    fields.append({"field_name": "character_book.content", "text": entry["content"],
+                                   "key": ["character_book", list_name, i, "content"]})
+    return fields
+
+
+def apply_translations(card: Dict[str, Any], results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """返回写入了成功译文的角色卡副本，失败的字段保留原文"""
+    translated = copy.deepcopy(card)
+    data = _card_data(translated)
+    for result in results:
+        if not result.get("success") or "key" not in result:
+            continue
+        target = data
+        *parents, last = result["key"]
+        for part in parents:
+            target = target[part]
+        target[last] = result["translated_text"]
+    return translated
+
+
+def build_batch_translator(options: Dict[str, Any]) -> BatchTranslator:
+    """根据任务选项（API 设置、提示词、词库等）构建 BatchTranslator；选项无效时抛出 ValueError"""
+    translator = get_translator(
+        options["settings"],
+        options["prompts"],
+        options.get("use_langgraph", True),
+        options.get("glossary", ""),
+        cache=get_translation_cache(),
+    )
+    return BatchTranslator(
+        translator,
+        max_concurrent=get_settings().batch_max_concurrent,
+        pack_short_fields=options.get("pack_short_fields"),
+    )
+
+
+def _snapshot(job: Dict[str, Any], include_results: bool = False) -> Dict[str, Any]:
+    """由队列中的任务记录生成对外状态；完成后附带翻译后的角色卡"""
+    state = {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "completed": len(job["results"]),
+        "total": job["total"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "finished_at": job["finished_at"],
+    }
+    if include_results:
+        state["results"] = job["results"]
+    if job["status"] == JOB_COMPLETED:
+        state["character_data"] = apply_translations(job["card"], job["results"])
+    return state
+
+
+class TranslationJobManager:
+    """
+    基于共享工作队列的翻译任务管理器。
+    每个工作进程运行一个拉取循环，在本地并发上限内领取任意任务的字段，
+    按任务分组交给 BatchTranslator 翻译，并定期为执行中的字段续租。
+    """
+
+    def __init__(self, queue: SharedWorkQueue, concurrency: int = 8,
+                 poll_interval: float = 0.5, retention: float = 3600.0):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._worker: Optional[asyncio.Task] = None
+        self._groups: Set[asyncio.Task] = set()
+        self._in_flight: Set[int] = set()
+
+    # ---- 任务接口 ----
+
+    async def submit(self, card: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+        """提交角色卡翻译任务，返回任务状态"""
+        # 提前构建一次翻译器以校验选项
+        build_batch_translator(options)
+        job_id = uuid.uuid4().hex
+        fields = collect_card_fields(card)
+        await run_io(self.queue.enqueue_job, job_id, options, card, fields)
+        self.start()
+        logger.info(f"翻译任务 {job_id} 已提交，共 {len(fields)} 个字段。")
+        return await self.get(job_id)
+
+    async def get(self, job_id: str, include_results: bool = False) -> Optional[Dict[str, Any]]:
+        job = await run_io(self.queue.get_job, job_id)
+        return _snapshot(job, include_results) if job is not None else None
+
+    async def cancel(self, job_id: str) -> bool:
+        """取消未结束的任务，已完成的字段结果仍然保留"""
+        return await run_io(self.queue.cancel_job, job_id)
+
+    async def iter_events(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        订阅任务事件（轮询共享队列，任务可能由其他进程执行）：
+        先产出当前进度，再依次产出每个已完成和新完成的字段结果，
+        任务结束时产出 done 帧（含最终状态与翻译后的角色卡）。
+        """
+        sent = 0
+        first = True
+        while True:
+            job = await run_io(self.queue.get_job, job_id)
+            if job is None:
+                return
+            if first:
+                first = False
+                yield {"type": "progress", "completed": len(job["results"]), "total": job["total"],
+                       "status": job["status"]}
+            for result in job["results"][sent:]:
+                sent += 1
+                yield {"type": "result", "result": result, "completed": sent, "total": job["total"]}
+            if job["status"] in FINISHED_STATES:
+                yield {"type": "done", "job": _snapshot(job)}
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    # ---- 工作循环 ----
+
+    def start(self) -> None:
+        """在当前事件循环中启动拉取循环（已运行时忽略）"""
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._work_loop())
+
+    async def _work_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        last_heartbeat = last_prune = loop.time()
+        while True:
+            try:
+                capacity = self.concurrency - len(self._in_flight)
+                leased = await run_io(self.queue.lease, self.owner, capacity) if capacity > 0 else []
+                groups: Dict[str, List] = {}
+                for task_id, job_id, field_data, options in leased:
+                    self._in_flight.add(task_id)
+                    groups.setdefault(job_id, [options, []])[1].append((task_id, field_data))
+                for job_id, (options, tasks) in groups.items():
+                    group = asyncio.create_task(self._run_group(job_id, options, tasks))
+                    self._groups.add(group)
+                    group.add_done_callback(self._groups.discard)
+
+                now = loop.time()
+                if now - last_heartbeat >= self.queue.lease_seconds / 3:
+                    last_heartbeat = now
+                    await run_io(self.queue.heartbeat, self.owner, list(self._in_flight))
+                if now - last_prune >= 600:
+                    last_prune = now
+                    await run_io(self.queue.prune, self.retention)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"翻译任务拉取循环出错：{e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def _run_group(self, job_id: str, options: Dict[str, Any], tasks: List) -> None:
+        """翻译同一任务的一组字段，逐个提交结果；异常或取消时归还未完成的字段"""
+        pending = {task_id: field_data for task_id, field_data in tasks}
+        error = None
+        try:
+            batch_translator = build_batch_translator(options)
+            # 以任务 ID 作为定位键，结果中再还原字段在角色卡中的路径
+            fields = [{**field_data, "key": task_id} for task_id, field_data in pending.items()]
+            async with aclosing(batch_translator.iter_translate_fields(fields)) as results:
+                async for result in results:
+                    task_id = result["key"]
+                    field_data = pending.pop(task_id)
+                    if "key" in field_data:
+                        result["key"] = field_data["key"]
+                    else:
+                        del result["key"]
+                    self._in_flight.discard(task_id)
+                    await run_io(self.queue.complete, task_id, self.owner, result)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = str(e)
+            logger.error(f"翻译任务 {job_id} 的字段执行失败，归还队列重试：{e}")
+        finally:
+            if pending:
+                try:
+                    await run_io(self.queue.release, self.owner, list(pending), error)
+                finally:
+                    self._in_flight.difference_update(pending)
+
+    async def shutdown(self) -> None:
+        """停止拉取循环并归还执行中的字段（应用退出时调用）"""
+        tasks = [t for t in [self._worker, *self._groups] if t is not None and not t.done()]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker = None
+
+
+_manager: Optional[TranslationJobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> TranslationJobManager:
+    """获取进程级共享的任务管理器"""
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                settings = get_settings()
+                _manager = TranslationJobManager(
+                    get_work_queue(),
+                    concurrency=settings.job_worker_concurrency,
+                    poll_interval=settings.job_poll_interval,
+                    retention=settings.job_retention_seconds,
+                )
+    return _manager
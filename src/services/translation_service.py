@@ -2,25 +2,40 @@
 翻译服务基类
 抽取 CharacterCardTranslator 和 LangGraphCharacterCardTranslator 的共享逻辑
 """
+import json
 import logging
+import re
 from abc import ABC, abstractmethod
-from typing import Dict
+from typing import Awaitable, Callable, Dict, Optional
 
+from ..config.settings import get_settings
+from .translation_cache import TranslationCache, make_cache_key
+from .single_flight import get_single_flight, make_flight_key
+from .field_packer import PACKED_INSTRUCTION, parse_packed_response
 
 logger = logging.getLogger(__name__)
 
+# 字段名末尾的元素下标，如 alternate_greetings[0]
+_INDEX_SUFFIX = re.compile(r"\[\d+\]$")
+
+
+def base_field_name(field_name: str) -> str:
+    """去掉列表元素下标，使 alternate_greetings[0] 与 alternate_greetings 使用同一提示模板"""
+    return _INDEX_SUFFIX.sub("", field_name)
+
 
 class BaseTranslator(ABC):
     """翻译器基类，封装共享的 glossary 和 prompt 选择逻辑"""
 
     def __init__(self, model_name: str, base_url: str, api_key: str,
                  prompts: Dict[str, str], glossary: str = '',
-                 custom_logger=None):
+                 custom_logger=None, cache: Optional[TranslationCache] = None):
         self.model_name = model_name
         self.base_url = base_url
         self.api_key = api_key
         self.prompts = prompts
         self.glossary = glossary
+        self.cache = cache
         self.logger = custom_logger if custom_logger else logging.getLogger(
             self.__class__.__name__
         )
@@ -43,6 +58,7 @@ class BaseTranslator(ABC):
 
     def _get_system_prompt(self, field_name: str) -> str:
         """根据字段类型获取相应的系统提示词（含词库指示）"""
+        field_name = base_field_name(field_name)
         if field_name == "description":
             base_prompt = self.prompts.get("description_template", "")
         elif field_name in ("first_mes", "mes_example", "alternate_greetings"):
@@ -51,10 +67,68 @@ class BaseTranslator(ABC):
             base_prompt = self.prompts.get("base_template", "")
         return base_prompt + self._build_glossary_instruction()
 
+    def _get_cached_translation(self, system_prompt: str, text: str) -> Optional[str]:
+        """查询翻译缓存，未启用缓存或未命中时返回 None。"""
+        if self.cache is None:
+            return None
+        return self.cache.get(make_cache_key(self.model_name, system_prompt, text))
+
+    def _store_cached_translation(self, system_prompt: str, text: str, translated: str) -> None:
+        """将成功的翻译结果写入缓存。"""
+        if self.cache is None or not translated:
+            return
+        self.cache.set(make_cache_key(self.model_name, system_prompt, text), translated)
+
+    async def _coalesced(self, system_prompt: str, text: str, call: Callable[[], Awaitable[str]]) -> str:
+        """相同 (上游, API Key, 模型, 系统提示词, 原文) 的并发翻译合并为一次上游调用"""
+        if not get_settings().translation_single_flight_enabled:
+            return await call()
+        key = make_flight_key(self.base_url, self.api_key, self.model_name, system_prompt, text)
+        return await get_single_flight().do(key, call)
+
+    # ------------------------------------------------------------------
+    # 打包翻译
+    # ------------------------------------------------------------------
+
+    async def async_translate_packed(self, field_name: str, items: Dict[str, str]) -> Dict[str, str]:
+        """
+        在一次请求中翻译多个共享 field_name 提示模板的短文本。
+        返回成功解析的 {键: 译文}，缺失的键由调用方回退为逐字段翻译。
+        """
+        system_prompt = self._get_system_prompt(field_name)
+        results: Dict[str, str] = {}
+        pending: Dict[str, str] = {}
+        for key, text in items.items():
+            cached = self._get_cached_translation(system_prompt, text)
+            if cached is not None:
+                results[key] = cached
+            else:
+                pending[key] = text
+
+        if pending:
+            raw = await self._async_complete(
+                f"打包请求 {field_name}×{len(pending)}",
+                system_prompt + PACKED_INSTRUCTION,
+                json.dumps(pending, ensure_ascii=False),
+            )
+            parsed = parse_packed_response(raw, pending.keys())
+            missing = len(pending) - len(parsed)
+            if missing:
+                self.logger.warning(f"打包请求 {field_name} 有 {missing} 个键未能解析，将逐字段重试。")
+            for key, translated in parsed.items():
+                self._store_cached_translation(system_prompt, pending[key], translated)
+            results.update(parsed)
+        return results
+
     # ------------------------------------------------------------------
     # 子类必须实现的翻译方法
     # ------------------------------------------------------------------
 
+    @abstractmethod
+    async def _async_complete(self, label: str, system_prompt: str, text: str) -> str:
+        """使用给定系统提示词异步调用模型，返回原始回复文本"""
+        ...
+
     @abstractmethod
     def translate_field(self, field_name: str, text: str) -> str:
         """翻译单个字段"""
@@ -64,3 +138,13 @@ class BaseTranslator(ABC):
     def translate_character_book_content(self, content: str) -> str:
         """翻译 character_book 中的 content 字段"""
         ...
+
+    @abstractmethod
+    async def async_translate_field(self, field_name: str, text: str) -> str:
+        """异步翻译单个字段"""
+        ...
+
+    @abstractmethod
+    async def async_translate_character_book_content(self, content: str) -> str:
+        """异步翻译 character_book 中的 content 字段"""
+        ...
@@ -0,0 +1,222 @@
+"""
+上传目录的内容哈希索引
+以 SQLite 记录 文件名 ↔ 内容哈希 ↔ 角色名称，写入时同步更新，启动时按 (大小, 修改时间) 增量重建，
+使重复检测变为 O(1) 查询，不必在每次名称冲突时重新读取并哈希已有文件
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from ..config.settings import get_settings
+from ..extract_text import read_character_metadata
+
+logger = logging.getLogger(__name__)
+
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: str) -> str:
+    """分块计算文件的 SHA-256，不将整个文件读入内存"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def _character_name_of(path: str) -> Optional[str]:
+    try:
+        character_data = read_character_metadata(path)
+    except Exception:
+        return None
+    if not character_data:
+        return None
+    return (character_data.get("data") or character_data).get("name")
+
+
+class UploadIndex:
+    """上传目录（仅顶层 .png 文件）的持久化哈希索引（线程安全）"""
+
+    def __init__(self, upload_folder: str, db_path: Optional[str] = None):
+        self.upload_folder = upload_folder
+        self.db_path = db_path or ":memory:"
+        self._lock = threading.Lock()
+        self._conn = self._open_db(self.db_path)
+
+    def _open_db(self, db_path: str) -> sqlite3.Connection:
+        try:
+            conn = sqlite3.connect(db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.Error as e:
+            logger.warning(f"无法打开上传索引数据库 {db_path}，改用内存索引: {e}")
+            conn = sqlite3.connect(":memory:", check_same_thread=False)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS uploads ("
+            " filename TEXT PRIMARY KEY,"
+            " content_hash TEXT NOT NULL,"
+            " character_name TEXT,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_uploads_hash ON uploads (content_hash)")
+        conn.commit()
+        return conn
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.upload_folder, filename)
+
+    def _upsert_locked(self, filename: str, content_hash: str, character_name: Optional[str],
+                       stat: os.stat_result) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO uploads (filename, content_hash, character_name, size, mtime_ns)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (filename, content_hash, character_name, stat.st_size, stat.st_mtime_ns),
+        )
+
+    def record(self, filename: str, content_hash: str, character_name: Optional[str] = None) -> None:
+        """记录一个刚写入（或改名）的文件"""
+        stat = os.stat(self._path(filename))
+        with self._lock:
+            self._upsert_locked(filename, content_hash, character_name, stat)
+            self._conn.commit()
+
+    def remove(self, filename: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM uploads WHERE filename = ?", (filename,))
+            self._conn.commit()
+
+    def rename(self, old_filename: str, new_filename: str) -> None:
+        """文件改名后同步索引（改名不改变内容和修改时间）"""
+        with self._lock:
+            self._conn.execute("DELETE FROM uploads WHERE filename = ?", (new_filename,))
+            self._conn.execute(
+                "UPDATE uploads SET filename = ? WHERE filename = ?", (new_filename, old_filename)
+            )
+            self._conn.commit()
+
+    def apply_renames(self, renames: List[Tuple[str, str]], removed: List[str]) -> None:
+        """在一个事务中同步一批改名和删除"""
+        with self._lock:
+            for old_filename, new_filename in renames:
+                self._conn.execute("DELETE FROM uploads WHERE filename = ?", (new_filename,))
+                self._conn.execute(
+                    "UPDATE uploads SET filename = ? WHERE filename = ?", (new_filename, old_filename)
+                )
+            self._conn.executemany("DELETE FROM uploads WHERE filename = ?", [(f,) for f in removed])
+            self._conn.commit()
+
+    def get_hash(self, filename: str) -> Optional[str]:
+        """
+        返回文件的内容哈希；文件不存在时返回 None。
+        仅做一次 stat 校验，索引缺失或文件被外部修改时才重新哈希。
+        """
+        path = self._path(filename)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.remove(filename)
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, size, mtime_ns FROM uploads WHERE filename = ?", (filename,)
+            ).fetchone()
+        if row is not None and row[1] == stat.st_size and row[2] == stat.st_mtime_ns:
+            return row[0]
+
+        content_hash = hash_file(path)
+        with self._lock:
+            self._upsert_locked(filename, content_hash, _character_name_of(path), stat)
+            self._conn.commit()
+        return content_hash
+
+    def find_by_hash(self, content_hash: str) -> Optional[str]:
+        """按内容哈希查找仍存在于磁盘上的文件名"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT filename FROM uploads WHERE content_hash = ?", (content_hash,)
+            ).fetchall()
+        for (filename,) in rows:
+            if self.get_hash(filename) == content_hash:
+                return filename
+        return None
+
+    def sync(self) -> Dict[str, int]:
+        """
+        增量重建索引：只为新增或 (大小, 修改时间) 变化的文件重新计算哈希，
+        并删除已不存在文件的记录。返回各类文件的数量。
+        """
+        with self._lock:
+            known = {
+                row[0]: (row[1], row[2])
+                for row in self._conn.execute("SELECT filename, size, mtime_ns FROM uploads")
+            }
+
+        seen = set()
+        hashed = 0
+        try:
+            entries = list(os.scandir(self.upload_folder))
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            if not entry.is_file() or not entry.name.endswith('.png'):
+                continue
+            seen.add(entry.name)
+            stat = entry.stat()
+            if known.get(entry.name) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            # 哈希与解析在事务之外进行，写入时每个文件单独提交，避免长时间持有写锁
+            try:
+                content_hash = hash_file(entry.path)
+            except OSError as e:
+                logger.warning(f"索引文件 {entry.name} 失败: {e}")
+                continue
+            character_name = _character_name_of(entry.path)
+            with self._lock:
+                self._upsert_locked(entry.name, content_hash, character_name, stat)
+                self._conn.commit()
+            hashed += 1
+
+        removed = [name for name in known if name not in seen]
+        with self._lock:
+            self._conn.executemany("DELETE FROM uploads WHERE filename = ?", [(n,) for n in removed])
+            self._conn.commit()
+        stats = {"files": len(seen), "hashed": hashed, "removed": len(removed)}
+        logger.info(f"上传索引已同步：{stats}")
+        return stats
+
+    def close(self) -> None:
+        """关闭数据库连接。"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_index: Optional[UploadIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_upload_index() -> UploadIndex:
+    """获取进程级共享的上传索引"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                settings = get_settings()
+                _index = UploadIndex(
+                    settings.upload_folder_abs,
+                    db_path=os.path.join(settings.upload_folder_abs, settings.upload_index_filename),
+                )
+    return _index
+
+
+def close_upload_index() -> None:
+    """关闭共享上传索引（应用退出时调用）"""
+    global _index
+    with _index_lock:
+        if _index is not None:
+            _index.close()
+            _index = None
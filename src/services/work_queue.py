@@ -0,0 +1,332 @@
+"""
+跨进程共享的字段级工作队列
+基于 SQLite WAL：所有 uvicorn 工作进程从同一个数据库文件领取字段任务。
+- 领取任务即获得租约，租约到期（进程崩溃或卡死）后任务重新可见，由其他进程接手
+- 所有进程同时持有的租约数受全局并发预算限制，不再随进程数线性放大
+- 任务载荷中包含调用上游所需的 API 设置（其他进程需要用它接手任务），
+  数据库文件仅所有者可读写，任务结束后立即清除
+- 字段结果在写事务内分配单调递增的完成序号，读取方按序号增量获取不会遗漏或重复
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+TASK_PENDING = "pending"
+TASK_LEASED = "leased"
+TASK_DONE = "done"
+TASK_CANCELLED = "cancelled"
+
+
+class SharedWorkQueue:
+    """SQLite 持久化的任务队列（线程安全，可被多个进程同时打开）"""
+
+    def __init__(self, db_path: str, lease_seconds: float = 300.0, global_budget: int = 16,
+                 max_attempts: int = 3):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.global_budget = global_budget
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # 任务选项含 API Key：数据库仅所有者可读写（WAL/SHM 文件沿用数据库文件的权限）
+        os.close(os.open(db_path, os.O_CREAT | os.O_RDWR, 0o600))
+        os.chmod(db_path, 0o600)
+        # isolation_level=None：由代码显式控制事务，使用 BEGIN IMMEDIATE 在进程间互斥
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " job_id TEXT PRIMARY KEY,"
+            " options TEXT,"
+            " card TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " total INTEGER NOT NULL,"
+            " error TEXT,"
+            " created_at REAL NOT NULL,"
+            " finished_at REAL);"
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            " task_id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " job_id TEXT NOT NULL,"
+            " seq INTEGER NOT NULL,"
+            " field TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " lease_owner TEXT,"
+            " lease_expires REAL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " result TEXT,"
+            " completed_at REAL,"
+            " done_seq INTEGER);"
+            "CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, lease_expires);"
+            "CREATE INDEX IF NOT EXISTS idx_tasks_job ON tasks (job_id, seq);"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(tasks)")}
+        if "done_seq" not in columns:
+            self._conn.execute("ALTER TABLE tasks ADD COLUMN done_seq INTEGER")
+
+    def _transaction(self):
+        return _ImmediateTransaction(self._conn, self._lock)
+
+    # ---- 任务提交与查询 ----
+
+    def enqueue_job(self, job_id: str, options: Dict[str, Any], card: Dict[str, Any],
+                    fields: List[Dict[str, Any]]) -> None:
+        """写入任务及其全部字段；没有字段的任务直接完成"""
+        now = time.time()
+        status = "queued" if fields else "completed"
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, options, card, status, total, created_at, finished_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, json.dumps(options) if fields else None, json.dumps(card, ensure_ascii=False),
+                 status, len(fields), now, None if fields else now),
+            )
+            conn.executemany(
+                "INSERT INTO tasks (job_id, seq, field, status) VALUES (?, ?, ?, ?)",
+                [(job_id, seq, json.dumps(f, ensure_ascii=False), TASK_PENDING) for seq, f in enumerate(fields)],
+            )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """返回任务状态与按完成序号排列的字段结果；不存在时返回 None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, total, error, created_at, finished_at, card FROM jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            results = self._conn.execute(
+                "SELECT result FROM tasks WHERE job_id = ? AND status = ? ORDER BY done_seq",
+                (job_id, TASK_DONE),
+            ).fetchall()
+        status, total, error, created_at, finished_at, card = row
+        return {
+            "job_id": job_id,
+            "status": status,
+            "total": total,
+            "error": error,
+            "created_at": created_at,
+            "finished_at": finished_at,
+            "card": json.loads(card),
+            "results": [json.loads(r[0]) for r in results],
+        }
+
+    def cancel_job(self, job_id: str) -> bool:
+        """取消未结束的任务：未领取的字段不再执行，已完成的结果保留"""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None or row[0] not in ("queued", "running"):
+                return False
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', options = NULL, finished_at = ? WHERE job_id = ?",
+                (time.time(), job_id),
+            )
+            conn.execute(
+                "UPDATE tasks SET status = ? WHERE job_id = ? AND status IN (?, ?)",
+                (TASK_CANCELLED, job_id, TASK_PENDING, TASK_LEASED),
+            )
+        return True
+
+    def prune(self, retention: float) -> int:
+        """删除结束超过 retention 秒的任务"""
+        cutoff = time.time() - retention
+        with self._transaction() as conn:
+            expired = [r[0] for r in conn.execute(
+                "SELECT job_id FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (cutoff,)
+            )]
+            conn.executemany("DELETE FROM tasks WHERE job_id = ?", [(j,) for j in expired])
+            conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(j,) for j in expired])
+        return len(expired)
+
+    # ---- 工作进程接口 ----
+
+    def lease(self, owner: str, limit: int) -> List[Tuple[int, str, Dict[str, Any], Dict[str, Any]]]:
+        """
+        领取至多 limit 个任务（受全局并发预算限制），
+        返回 [(task_id, job_id, 字段, 任务选项)]。租约已过期的任务会被重新领取。
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            in_flight = conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE status = ? AND lease_expires > ?", (TASK_LEASED, now)
+            ).fetchone()[0]
+            available = min(limit, self.global_budget - in_flight)
+            if available <= 0:
+                return []
+
+            # 超过最大尝试次数的过期任务记为失败
+            exhausted = conn.execute(
+                "SELECT task_id, job_id, field FROM tasks WHERE status = ? AND lease_expires <= ? AND attempts >= ?",
+                (TASK_LEASED, now, self.max_attempts),
+            ).fetchall()
+            for task_id, job_id, field in exhausted:
+                self._finish_task_locked(conn, task_id, job_id, failed_result(json.loads(field), "任务多次超时"), now)
+
+            rows = conn.execute(
+                "SELECT t.task_id, t.job_id, t.field, j.options FROM tasks t JOIN jobs j ON j.job_id = t.job_id"
+                " WHERE t.status = ? OR (t.status = ? AND t.lease_expires <= ?)"
+                " ORDER BY j.created_at, t.seq LIMIT ?",
+                (TASK_PENDING, TASK_LEASED, now, available),
+            ).fetchall()
+            conn.executemany(
+                "UPDATE tasks SET status = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1"
+                " WHERE task_id = ?",
+                [(TASK_LEASED, owner, now + self.lease_seconds, r[0]) for r in rows],
+            )
+            conn.executemany(
+                "UPDATE jobs SET status = 'running' WHERE job_id = ? AND status = 'queued'",
+                [(job_id,) for job_id in {r[1] for r in rows}],
+            )
+        return [(task_id, job_id, json.loads(field), json.loads(options or "{}"))
+                for task_id, job_id, field, options in rows]
+
+    def heartbeat(self, owner: str, task_ids: List[int]) -> None:
+        """延长仍在执行的任务的租约"""
+        if not task_ids:
+            return
+        expires = time.time() + self.lease_seconds
+        with self._transaction() as conn:
+            conn.executemany(
+                "UPDATE tasks SET lease_expires = ? WHERE task_id = ? AND lease_owner = ? AND status = ?",
+                [(expires, task_id, owner, TASK_LEASED) for task_id in task_ids],
+            )
+
+    def complete(self, task_id: int, owner: str, result: Dict[str, Any]) -> bool:
+        """提交任务结果；租约已被他人接手或任务已取消时忽略并返回 False"""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT job_id FROM tasks WHERE task_id = ? AND lease_owner = ? AND status = ?",
+                (task_id, owner, TASK_LEASED),
+            ).fetchone()
+            if row is None:
+                return False
+            self._finish_task_locked(conn, task_id, row[0], result, now)
+        return True
+
+    def release(self, owner: str, task_ids: List[int], error: Optional[str] = None) -> None:
+        """
+        归还未完成的任务，使其立即可被重新领取；
+        已达到最大尝试次数的任务不再归还，直接记为失败，避免反复出错的任务无限重试。
+        """
+        if not task_ids:
+            return
+        now = time.time()
+        with self._transaction() as conn:
+            for task_id in task_ids:
+                row = conn.execute(
+                    "SELECT job_id, field, attempts FROM tasks WHERE task_id = ? AND lease_owner = ? AND status = ?",
+                    (task_id, owner, TASK_LEASED),
+                ).fetchone()
+                if row is None:
+                    continue
+                job_id, field, attempts = row
+                if attempts >= self.max_attempts:
+                    self._finish_task_locked(
+                        conn, task_id, job_id, failed_result(json.loads(field), error or "任务多次执行失败"), now
+                    )
+                else:
+                    conn.execute(
+                        "UPDATE tasks SET status = ?, lease_owner = NULL, lease_expires = NULL WHERE task_id = ?",
+                        (TASK_PENDING, task_id),
+                    )
+
+    def _finish_task_locked(self, conn: sqlite3.Connection, task_id: int, job_id: str,
+                            result: Dict[str, Any], now: float) -> None:
+        # 完成序号在写事务内分配，提交顺序与序号顺序一致（completed_at 在事务外取得，可能乱序）
+        done_seq = conn.execute(
+            "SELECT COALESCE(MAX(done_seq), 0) + 1 FROM tasks WHERE job_id = ?", (job_id,)
+        ).fetchone()[0]
+        conn.execute(
+            "UPDATE tasks SET status = ?, result = ?, completed_at = ?, done_seq = ?, lease_expires = NULL"
+            " WHERE task_id = ?",
+            (TASK_DONE, json.dumps(result, ensure_ascii=False), now, done_seq, task_id),
+        )
+        remaining = conn.execute(
+            "SELECT COUNT(*) FROM tasks WHERE job_id = ? AND status IN (?, ?)",
+            (job_id, TASK_PENDING, TASK_LEASED),
+        ).fetchone()[0]
+        if remaining == 0:
+            conn.execute(
+                "UPDATE jobs SET status = 'completed', options = NULL, finished_at = ?"
+                " WHERE job_id = ? AND status IN ('queued', 'running')",
+                (now, job_id),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class _ImmediateTransaction:
+    """BEGIN IMMEDIATE 事务：进程内用锁串行，进程间由 SQLite 写锁互斥"""
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock):
+        self._conn = conn
+        self._lock = lock
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._lock.acquire()
+        try:
+            self._conn.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self._lock.release()
+            raise
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        try:
+            self._conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self._lock.release()
+
+
+def failed_result(field: Dict[str, Any], error: str) -> Dict[str, Any]:
+    result = {
+        "field_name": field["field_name"],
+        "original_text": field["text"],
+        "translated_text": "",
+        "success": False,
+        "error": error,
+        "attempts": 0,
+    }
+    if "key" in field:
+        result["key"] = field["key"]
+    return result
+
+
+_queue: Optional[SharedWorkQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_work_queue() -> SharedWorkQueue:
+    """获取共享工作队列（数据库位于上传目录，所有工作进程共用）"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                settings = get_settings()
+                _queue = SharedWorkQueue(
+                    os.path.join(settings.upload_folder_abs, settings.job_queue_filename),
+                    lease_seconds=settings.job_lease_seconds,
+                    global_budget=settings.job_global_budget,
+                )
+    return _queue
+
+
+def close_work_queue() -> None:
+    global _queue
+    with _queue_lock:
+        if _queue is not None:
+            _queue.close()
+            _queue = None
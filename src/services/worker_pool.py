@@ -0,0 +1,85 @@
+"""
+进程级批量翻译工作池
+所有批量请求共享同一个线程池和全局并发上限，由应用生命周期负责创建与关闭
+"""
+import asyncio
+import logging
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from ..config.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWorkerPool:
+    """共享线程池 + 全局并发槽位"""
+
+    def __init__(self, max_concurrent: int = 16):
+        self.max_concurrent = max_concurrent
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_concurrent, thread_name_prefix="batch-translate"
+        )
+        # asyncio.Semaphore 绑定到事件循环，按循环分别维护
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._closed = False
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrent)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    @asynccontextmanager
+    async def slot(self):
+        """占用一个全局并发槽位"""
+        async with self._semaphore():
+            yield
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def shutdown(self) -> None:
+        """关闭线程池，不阻塞事件循环等待正在运行的任务。"""
+        if self._closed:
+            return
+        self._closed = True
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool: Optional[BatchWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def init_batch_worker_pool() -> BatchWorkerPool:
+    """创建共享工作池（应用启动时调用）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            _pool = BatchWorkerPool(max_concurrent=get_settings().batch_global_max_concurrent)
+            logger.info(f"批量翻译工作池已创建，全局并发上限 {_pool.max_concurrent}。")
+    return _pool
+
+
+def get_batch_worker_pool() -> BatchWorkerPool:
+    """获取共享工作池；未经生命周期初始化时按需创建"""
+    if _pool is None or _pool.closed:
+        return init_batch_worker_pool()
+    return _pool
+
+
+def shutdown_batch_worker_pool() -> None:
+    """关闭共享工作池（应用退出时调用）"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
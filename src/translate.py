@@ -2,13 +2,13 @@
 角色卡翻译器 - 基于 LangChain 的同步实现
 """
 from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate
-from langchain_core.messages import SystemMessage
-from langchain_openai import ChatOpenAI
-from pydantic import SecretStr
+from langchain_core.messages import SystemMessage, HumanMessage
 import logging
-from typing import Dict
+from typing import Dict, Optional
 
-from .services.translation_service import BaseTranslator
+from .services.translation_service import BaseTranslator, base_field_name
+from .services.llm_pool import get_chat_llm
+from .services.translation_cache import TranslationCache
 from .errors import parse_openai_error
 
 logging.basicConfig(level=logging.INFO)
@@ -19,15 +19,10 @@ class CharacterCardTranslator(BaseTranslator):
 
     def __init__(self, model_name: str, base_url: str, api_key: str,
                  prompts: Dict[str, str], glossary: str = '',
-                 custom_logger=None):
-        super().__init__(model_name, base_url, api_key, prompts, glossary, custom_logger)
+                 custom_logger=None, cache: Optional[TranslationCache] = None):
+        super().__init__(model_name, base_url, api_key, prompts, glossary, custom_logger, cache)
 
-        self.llm = ChatOpenAI(
-            model=model_name,
-            base_url=base_url,
-            api_key=SecretStr(api_key),
-            max_completion_tokens=8192,
-        )
+        self.llm = get_chat_llm(model_name, base_url, api_key)
 
         # 从传入的 prompts 字典动态创建模板
         self.base_template = self._create_prompt_template(prompts.get("base_template", ""))
@@ -44,6 +39,7 @@ class CharacterCardTranslator(BaseTranslator):
 
     def _select_template(self, field_name: str) -> ChatPromptTemplate:
         """根据字段名选择对应的提示模板"""
+        field_name = base_field_name(field_name)
         if field_name == "description":
             return self.description_template
         elif field_name in ("first_mes", "mes_example", "alternate_greetings"):
@@ -57,6 +53,12 @@ class CharacterCardTranslator(BaseTranslator):
             self.logger.debug(f"字段 {field_name} 为空，跳过翻译。")
             return text
 
+        system_prompt = self._get_system_prompt(field_name)
+        cached = self._get_cached_translation(system_prompt, text)
+        if cached is not None:
+            self.logger.debug(f"字段 {field_name} 命中翻译缓存。")
+            return cached
+
         template = self._select_template(field_name)
 
         try:
@@ -65,9 +67,9 @@ class CharacterCardTranslator(BaseTranslator):
 
             self.logger.debug(f"字段 {field_name} 翻译完成。")
 
-            if isinstance(response.content, str):
-                return response.content
-            return str(response.content)
+            translated = response.content if isinstance(response.content, str) else str(response.content)
+            self._store_cached_translation(system_prompt, text, translated)
+            return translated
 
         except Exception as e:
             error = parse_openai_error(e)
@@ -80,17 +82,104 @@ class CharacterCardTranslator(BaseTranslator):
             self.logger.debug("character_book.content 为空，跳过翻译。")
             return content
 
+        system_prompt = self._get_system_prompt("character_book.content")
+        cached = self._get_cached_translation(system_prompt, content)
+        if cached is not None:
+            self.logger.debug("character_book.content 命中翻译缓存。")
+            return cached
+
         try:
             messages = self.base_template.format_messages(text=content)
             response = self.llm.invoke(messages)
 
             self.logger.debug("character_book.content 翻译完成。")
 
-            if isinstance(response.content, str):
-                return response.content
-            return str(response.content)
+            translated = response.content if isinstance(response.content, str) else str(response.content)
+            self._store_cached_translation(system_prompt, content, translated)
+            return translated
 
         except Exception as e:
             error = parse_openai_error(e)
             self.logger.error(f"翻译 character_book.content 时出错: {error.message}")
             raise error
+
+    # ------------------------------------------------------------------
+    # 异步接口（不阻塞事件循环）
+    # ------------------------------------------------------------------
+
+    async def async_translate_field(self, field_name: str, text: str) -> str:
+        """异步版本的 translate_field"""
+        if not text or not text.strip():
+            self.logger.debug(f"字段 {field_name} 为空，跳过翻译。")
+            return text
+
+        system_prompt = self._get_system_prompt(field_name)
+        cached = self._get_cached_translation(system_prompt, text)
+        if cached is not None:
+            self.logger.debug(f"字段 {field_name} 命中翻译缓存。")
+            return cached
+
+        template = self._select_template(field_name)
+
+        async def run() -> str:
+            messages = template.format_messages(text=text)
+            response = await self.llm.ainvoke(messages)
+
+            self.logger.debug(f"字段 {field_name} 翻译完成。")
+
+            translated = response.content if isinstance(response.content, str) else str(response.content)
+            self._store_cached_translation(system_prompt, text, translated)
+            return translated
+
+        try:
+            return await self._coalesced(system_prompt, text, run)
+
+        except Exception as e:
+            error = parse_openai_error(e)
+            self.logger.error(f"翻译字段 {field_name} 时出错: {error.message}")
+            raise error
+
+    async def async_translate_character_book_content(self, content: str) -> str:
+        """异步版本的 translate_character_book_content"""
+        if not content or not content.strip():
+            self.logger.debug("character_book.content 为空，跳过翻译。")
+            return content
+
+        system_prompt = self._get_system_prompt("character_book.content")
+        cached = self._get_cached_translation(system_prompt, content)
+        if cached is not None:
+            self.logger.debug("character_book.content 命中翻译缓存。")
+            return cached
+
+        async def run() -> str:
+            messages = self.base_template.format_messages(text=content)
+            response = await self.llm.ainvoke(messages)
+
+            self.logger.debug("character_book.content 翻译完成。")
+
+            translated = response.content if isinstance(response.content, str) else str(response.content)
+            self._store_cached_translation(system_prompt, content, translated)
+            return translated
+
+        try:
+            return await self._coalesced(system_prompt, content, run)
+
+        except Exception as e:
+            error = parse_openai_error(e)
+            self.logger.error(f"翻译 character_book.content 时出错: {error.message}")
+            raise error
+
+    async def _async_complete(self, label: str, system_prompt: str, text: str) -> str:
+        """使用自定义系统提示词异步调用模型，返回原始回复"""
+        try:
+            messages = [SystemMessage(content=system_prompt), HumanMessage(content=text)]
+            response = await self.llm.ainvoke(messages)
+
+            self.logger.debug(f"{label} 完成。")
+
+            return response.content if isinstance(response.content, str) else str(response.content)
+
+        except Exception as e:
+            error = parse_openai_error(e)
+            self.logger.error(f"{label} 时出错: {error.message}")
+            raise error
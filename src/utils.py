@@ -3,6 +3,7 @@ import json
 import os
 import re
 import hashlib
+import shutil
 import logging
 
 import functools
@@ -11,6 +12,8 @@ import asyncio
 
 from .translate import CharacterCardTranslator
 from .graphs.langgraph_translator import LangGraphCharacterCardTranslator
+from .services.translation_cache import TranslationCache
+from .services.upload_index import UploadIndex, hash_file
 
 logger = logging.getLogger(__name__)
 
@@ -67,7 +70,7 @@ def pretty_print_json(data: Dict[str, Any]) -> None:
     """以美化格式打印JSON数据。"""
     print(json.dumps(data, indent=4, ensure_ascii=False))
 
-def get_translator(settings: Dict[str, str], prompts: Dict[str, str], use_langgraph: bool = True, glossary: str = '') -> CharacterCardTranslator:
+def get_translator(settings: Dict[str, str], prompts: Dict[str, str], use_langgraph: bool = True, glossary: str = '', cache: Optional[TranslationCache] = None) -> CharacterCardTranslator:
     """根据提供的设置和提示词初始化并返回翻译器实例。"""
     api_key = settings.get('api_key')
     base_url = settings.get('base_url', "https://api.openai.com/v1")
@@ -78,41 +81,116 @@ def get_translator(settings: Dict[str, str], prompts: Dict[str, str], use_langgr
 
     if use_langgraph:
         logger.info("使用基于LangGraph的翻译器")
-        return LangGraphCharacterCardTranslator(model_name=model_name, base_url=base_url, api_key=api_key, prompts=prompts, glossary=glossary)
+        return LangGraphCharacterCardTranslator(model_name=model_name, base_url=base_url, api_key=api_key, prompts=prompts, glossary=glossary, cache=cache)
     else:
         logger.info("使用传统翻译器")
-        return CharacterCardTranslator(model_name=model_name, base_url=base_url, api_key=api_key, prompts=prompts, glossary=glossary)
+        return CharacterCardTranslator(model_name=model_name, base_url=base_url, api_key=api_key, prompts=prompts, glossary=glossary, cache=cache)
 
-def handle_uploaded_file(content: bytes, upload_folder: str, character_data: Dict) -> str:
-    """
-    根据角色数据，使用净化后的名称将文件保存到上传文件夹，
-    处理重复和名称冲突。
-    返回保存文件的最终路径。
-    """
+UPLOAD_OBJECTS_DIRNAME = ".objects"
+_SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+
+def sanitize_character_name(character_data: Dict) -> str:
+    """由角色名称生成安全的文件名主干"""
     char_name = character_data.get("data", {}).get("name", "未命名")
     # 用下划线替换空格
     safe_name = re.sub(r'\s+', '_', char_name)
     # 移除无效的文件名字符并清理
-    sanitized_name = re.sub(r'[\\/*?:"<>|]', '', safe_name).strip('._ ') or "未命名"
+    return re.sub(r'[\\/*?:"<>|]', '', safe_name).strip('._ ') or "未命名"
 
-    incoming_hash = hashlib.sha256(content).hexdigest()
+
+def resolve_upload_path(upload_folder: str, character_data: Dict, incoming_hash: str,
+                        index: Optional[UploadIndex] = None) -> tuple:
+    """
+    计算上传文件的保存路径，返回 (最终路径, 是否已存在相同文件)。
+    同名文件内容不同时追加哈希前缀避免冲突；传入索引时按索引查询已有文件的哈希。
+    """
+    if index is not None:
+        existing = index.find_by_hash(incoming_hash)
+        if existing is not None:
+            return os.path.join(upload_folder, existing), True
+
+    def existing_hash(filename: str) -> Optional[str]:
+        if index is not None:
+            return index.get_hash(filename)
+        path = os.path.join(upload_folder, filename)
+        return hash_file(path) if os.path.exists(path) else None
+
+    sanitized_name = sanitize_character_name(character_data)
     final_filename = f"{sanitized_name}.png"
-    final_path = os.path.join(upload_folder, final_filename)
 
     # 处理已存在的文件和名称冲突
-    if os.path.exists(final_path):
-        with open(final_path, 'rb') as f_existing:
-            existing_hash = hashlib.sha256(f_existing.read()).hexdigest()
-
-        if existing_hash == incoming_hash:
+    current_hash = existing_hash(final_filename)
+    if current_hash is not None:
+        if current_hash == incoming_hash:
             # 发现完全相同的文件，无需保存新文件
-            return final_path
-        else:
-            # 名称冲突，创建唯一的文件名
-            unique_filename = f"{sanitized_name}_{incoming_hash[:7]}.png"
-            final_path = os.path.join(upload_folder, unique_filename)
-    
-    with open(final_path, "wb") as buffer:
-        buffer.write(content)
-
-    return final_path
\ No newline at end of file
+            return os.path.join(upload_folder, final_filename), True
+        # 名称冲突，创建唯一的文件名
+        final_filename = f"{sanitized_name}_{incoming_hash[:7]}.png"
+        if existing_hash(final_filename) == incoming_hash:
+            return os.path.join(upload_folder, final_filename), True
+    return os.path.join(upload_folder, final_filename), False
+
+
+def get_content_object_path(upload_folder: str, content_hash: str) -> Optional[str]:
+    """返回内容寻址图片的存储路径；哈希格式非法时返回 None"""
+    if not _SHA256_PATTERN.match(content_hash):
+        return None
+    return os.path.join(upload_folder, UPLOAD_OBJECTS_DIRNAME, f"{content_hash}.png")
+
+
+def link_content_object(file_path: str, upload_folder: str, content_hash: str) -> str:
+    """
+    为已保存的上传文件建立内容寻址入口（优先硬链接，不支持时复制），
+    供图片 URL 按哈希访问。返回对象路径。
+    """
+    object_path = get_content_object_path(upload_folder, content_hash)
+    if object_path is None:
+        raise ValueError(f"非法的内容哈希: {content_hash}")
+    if os.path.exists(object_path):
+        return object_path
+
+    os.makedirs(os.path.dirname(object_path), exist_ok=True)
+    tmp_path = f"{object_path}.{os.getpid()}.tmp"
+    try:
+        os.link(file_path, tmp_path)
+    except OSError:
+        shutil.copyfile(file_path, tmp_path)
+    os.replace(tmp_path, object_path)
+    return object_path
+
+
+def store_spooled_upload(spool_path: str, content_hash: str, upload_folder: str, character_data: Dict,
+                         index: Optional[UploadIndex] = None) -> str:
+    """
+    将已流式落盘的临时文件移动到最终位置（重复文件直接丢弃临时文件），
+    并建立内容寻址入口。返回保存文件的最终路径。
+    """
+    final_path, exists = resolve_upload_path(upload_folder, character_data, content_hash, index)
+    if exists:
+        os.remove(spool_path)
+    else:
+        os.replace(spool_path, final_path)
+        if index is not None:
+            index.record(os.path.basename(final_path), content_hash,
+                         character_data.get("data", {}).get("name"))
+    link_content_object(final_path, upload_folder, content_hash)
+    return final_path
+
+
+def handle_uploaded_file(content: bytes, upload_folder: str, character_data: Dict,
+                         index: Optional[UploadIndex] = None, content_hash: Optional[str] = None) -> str:
+    """
+    根据角色数据，使用净化后的名称将文件保存到上传文件夹，
+    处理重复和名称冲突。
+    返回保存文件的最终路径。
+    """
+    incoming_hash = content_hash or hashlib.sha256(content).hexdigest()
+    final_path, exists = resolve_upload_path(upload_folder, character_data, incoming_hash, index)
+    if not exists:
+        with open(final_path, "wb") as buffer:
+            buffer.write(content)
+        if index is not None:
+            index.record(os.path.basename(final_path), incoming_hash,
+                         character_data.get("data", {}).get("name"))
+    return final_path
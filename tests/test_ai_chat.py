@@ -0,0 +1,107 @@
+"""
+Tests for the async and streaming AI chat endpoints.
+"""
+import sys
+import os
+import json
+from unittest.mock import Mock, AsyncMock, patch
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.routers import ai_chat as ai_chat_router
+
+CHAT_PAYLOAD = {
+    "messages": [{"role": "user", "content": "Create a knight"}],
+    "settings": {"api_key": "sk-test-key", "model_name": "gpt-3.5-turbo"},
+    "character_card": {"data": {"name": "Alice"}},
+}
+
+
+def _make_client() -> TestClient:
+    app = FastAPI()
+    app.include_router(ai_chat_router.router)
+    return TestClient(app)
+
+
+def _make_streaming_llm(pieces):
+    async def astream(messages):
+        for piece in pieces:
+            yield Mock(content=piece)
+
+    llm = Mock()
+    llm.astream = astream
+    return llm
+
+
+def test_ai_chat_uses_ainvoke():
+    """The plain endpoint awaits the LLM instead of blocking."""
+    llm = Mock()
+    llm.ainvoke = AsyncMock(return_value=Mock(content="Sir Alice"))
+    with patch('src.routers.ai_chat.get_chat_llm', return_value=llm):
+        response = _make_client().post("/api/v1/character/ai-chat", json=CHAT_PAYLOAD)
+    assert response.status_code == 200
+    assert response.json() == {"reply": "Sir Alice"}
+    llm.invoke.assert_not_called()
+    messages = llm.ainvoke.await_args[0][0]
+    assert "Alice" in messages[0].content
+    print("✓ Async chat works")
+
+
+def test_ai_chat_sse_stream():
+    """The SSE endpoint emits token events followed by the full reply."""
+    llm = _make_streaming_llm(["Sir ", "", "Alice"])
+    with patch('src.routers.ai_chat.get_chat_llm', return_value=llm):
+        response = _make_client().post("/api/v1/character/ai-chat/stream", json=CHAT_PAYLOAD)
+    assert response.status_code == 200
+    events = [
+        json.loads(line[len("data: "):])
+        for line in response.text.splitlines() if line.startswith("data: ")
+    ]
+    assert [e["content"] for e in events if e["type"] == "token"] == ["Sir ", "Alice"]
+    assert events[-1] == {"type": "done", "reply": "Sir Alice"}
+    print("✓ SSE chat stream works")
+
+
+def test_ai_chat_ws_stream():
+    """The WebSocket endpoint streams one reply per request message."""
+    llm = _make_streaming_llm(["Hello"])
+    with patch('src.routers.ai_chat.get_chat_llm', return_value=llm):
+        with _make_client().websocket_connect("/api/v1/character/ai-chat/ws") as ws:
+            ws.send_json(CHAT_PAYLOAD)
+            assert ws.receive_json() == {"type": "token", "content": "Hello"}
+            assert ws.receive_json() == {"type": "done", "reply": "Hello"}
+    print("✓ WebSocket chat stream works")
+
+
+def test_ai_chat_ws_rejects_bad_messages():
+    """Malformed frames and missing API keys get an error event without dropping the socket."""
+    llm = _make_streaming_llm(["Hello"])
+    with patch('src.routers.ai_chat.get_chat_llm', return_value=llm) as get_llm:
+        with _make_client().websocket_connect("/api/v1/character/ai-chat/ws") as ws:
+            ws.send_text("not json")
+            event = ws.receive_json()
+            assert event["type"] == "error" and event["status"] == 400
+
+            ws.send_json({"messages": "oops"})
+            assert ws.receive_json()["type"] == "error"
+
+            ws.send_json({**CHAT_PAYLOAD, "settings": {"api_key": "   ", "model_name": "gpt-3.5-turbo"}})
+            assert ws.receive_json() == {"type": "error", "status": 400, "detail": "请先在设置中提供您的 API Key。"}
+            assert not get_llm.called
+
+            ws.send_json(CHAT_PAYLOAD)
+            assert ws.receive_json() == {"type": "token", "content": "Hello"}
+            assert ws.receive_json() == {"type": "done", "reply": "Hello"}
+    print("✓ WebSocket chat rejects bad messages")
+
+
+if __name__ == "__main__":
+    test_ai_chat_uses_ainvoke()
+    test_ai_chat_sse_stream()
+    test_ai_chat_ws_stream()
+    test_ai_chat_ws_rejects_bad_messages()
+    print("All AI chat tests completed successfully!")
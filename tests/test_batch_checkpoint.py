@@ -0,0 +1,104 @@
+"""
+Tests for checkpointed, resumable batch translation.
+"""
+import sys
+import os
+import tempfile
+from unittest.mock import patch
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.routers import translate as translate_router
+from src.services.batch_checkpoint import BatchCheckpointStore, make_field_hash
+
+BATCH_PAYLOAD = {
+    "fields": [
+        {"field_name": "description", "text": "A curious girl"},
+        {"field_name": "first_mes", "text": "Hello!"},
+        {"field_name": "scenario", "text": "A garden"},
+    ],
+    "settings": {"api_key": "sk-test-key", "model_name": "gpt-3.5-turbo"},
+    "prompts": {"base_template": "Base prompt"},
+    "pack_short_fields": False,
+    "batch_id": "batch-1",
+}
+
+
+def test_store_roundtrip():
+    """Checkpoints are keyed by batch ID and field content hash."""
+    store = BatchCheckpointStore(os.path.join(tempfile.mkdtemp(), "checkpoints.sqlite3"))
+    field_hash = make_field_hash("description", "text", "Base prompt", "gpt-3.5-turbo")
+    assert field_hash != make_field_hash("first_mes", "text", "Base prompt", "gpt-3.5-turbo")
+    assert field_hash != make_field_hash("description", "text", "Other prompt", "gpt-3.5-turbo")
+    assert field_hash != make_field_hash("description", "text", "Base prompt", "gpt-4o")
+    assert field_hash != make_field_hash("description", "text", "Base prompt", "gpt-3.5-turbo", "Alice=爱丽丝")
+    store.save("batch", field_hash, {"translated_text": "译文", "success": True})
+    assert store.load("batch") == {field_hash: {"translated_text": "译文", "success": True}}
+    assert store.load("other") == {}
+    store.discard("batch")
+    assert store.load("batch") == {}
+    store.close()
+    print("✓ Checkpoint store works")
+
+
+def test_resubmitted_batch_skips_completed_fields():
+    """A batch interrupted by failures only re-translates the missing fields on resubmission."""
+    store = BatchCheckpointStore(os.path.join(tempfile.mkdtemp(), "checkpoints.sqlite3"))
+    calls = []
+    failing = {"first_mes"}
+
+    async def fake_translate_field(self, field_name, text):
+        calls.append(field_name)
+        if field_name in failing:
+            raise ValueError("upstream down")
+        return f"[{field_name}] {text}"
+
+    async def no_sleep(delay):
+        return None
+
+    app = FastAPI()
+    app.include_router(translate_router.router)
+    with patch('src.routers.translate.get_translation_cache', return_value=None), \
+         patch('src.routers.translate.get_batch_checkpoint_store', return_value=store), \
+         patch('src.batch_translate.asyncio.sleep', no_sleep), \
+         patch('src.graphs.langgraph_translator.LangGraphCharacterCardTranslator.async_translate_field',
+               fake_translate_field):
+        client = TestClient(app)
+        first = client.post("/api/v1/character/batch-translate", json=BATCH_PAYLOAD).json()["results"]
+        assert sum(r["success"] for r in first) == 2
+        assert not any(r["resumed"] for r in first)
+
+        failing.clear()
+        calls.clear()
+        second = client.post("/api/v1/character/batch-translate", json=BATCH_PAYLOAD).json()["results"]
+        assert calls == ["first_mes"]
+        assert all(r["success"] for r in second)
+        assert {r["field_name"]: r["resumed"] for r in second} == {
+            "description": True, "scenario": True, "first_mes": False,
+        }
+
+        # 更换模型或词库后，同一批次 ID 不复用旧译文
+        for changes in ({"settings": {**BATCH_PAYLOAD["settings"], "model_name": "gpt-4o"}},
+                        {"glossary": "Alice=爱丽丝"}):
+            calls.clear()
+            results = client.post("/api/v1/character/batch-translate", json={**BATCH_PAYLOAD, **changes}).json()["results"]
+            assert sorted(calls) == ["description", "first_mes", "scenario"], changes
+            assert not any(r["resumed"] for r in results)
+
+        # 不带批次 ID 的请求不使用检查点
+        calls.clear()
+        payload = {k: v for k, v in BATCH_PAYLOAD.items() if k != "batch_id"}
+        client.post("/api/v1/character/batch-translate", json=payload)
+        assert sorted(calls) == ["description", "first_mes", "scenario"]
+    store.close()
+    print("✓ Resumable batch translation works")
+
+
+if __name__ == "__main__":
+    test_store_roundtrip()
+    test_resubmitted_batch_skips_completed_fields()
+    print("All batch checkpoint tests completed successfully!")
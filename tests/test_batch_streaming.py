@@ -0,0 +1,137 @@
+"""
+Tests for the streaming batch translation endpoints.
+"""
+import sys
+import os
+import json
+from unittest.mock import patch
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.routers import translate as translate_router
+
+BATCH_PAYLOAD = {
+    "fields": [
+        {"field_name": "name", "text": "Alice"},
+        {"field_name": "description", "text": "A curious girl"},
+    ],
+    "settings": {"api_key": "sk-test-key", "model_name": "gpt-3.5-turbo"},
+    "prompts": {"base_template": "Base prompt"},
+}
+
+
+async def fake_translate_field(self, field_name, text):
+    return f"[{field_name}] {text}"
+
+
+def _make_client() -> TestClient:
+    app = FastAPI()
+    app.include_router(translate_router.router)
+    return TestClient(app)
+
+
+def test_ndjson_stream_emits_results_and_progress():
+    """The NDJSON endpoint emits a progress frame, one result per field and a done frame."""
+    with patch('src.routers.translate.get_translation_cache', return_value=None), \
+         patch('src.graphs.langgraph_translator.LangGraphCharacterCardTranslator.async_translate_field',
+               fake_translate_field):
+        client = _make_client()
+        response = client.post("/api/v1/character/batch-translate/stream", json=BATCH_PAYLOAD)
+        assert response.status_code == 200
+        frames = [json.loads(line) for line in response.text.splitlines() if line]
+
+    assert frames[0] == {"type": "progress", "completed": 0, "total": 2}
+    results = [f["result"] for f in frames if f["type"] == "result"]
+    assert {r["translated_text"] for r in results} == {"[name] Alice", "[description] A curious girl"}
+    assert frames[-1] == {"type": "done", "progress": {"completed": 2, "total": 2}}
+    print("✓ NDJSON stream works")
+
+
+def test_websocket_stream():
+    """The WebSocket endpoint streams the same frames."""
+    with patch('src.routers.translate.get_translation_cache', return_value=None), \
+         patch('src.graphs.langgraph_translator.LangGraphCharacterCardTranslator.async_translate_field',
+               fake_translate_field):
+        client = _make_client()
+        with client.websocket_connect("/api/v1/character/batch-translate/ws") as ws:
+            ws.send_json(BATCH_PAYLOAD)
+            frames = []
+            while True:
+                frame = ws.receive_json()
+                frames.append(frame)
+                if frame["type"] in ("done", "error"):
+                    break
+
+    assert sum(1 for f in frames if f["type"] == "result") == 2
+    assert frames[-1]["type"] == "done"
+    print("✓ WebSocket stream works")
+
+
+def test_websocket_rejects_invalid_request():
+    """Invalid payloads get an error frame."""
+    client = _make_client()
+    with client.websocket_connect("/api/v1/character/batch-translate/ws") as ws:
+        ws.send_json({"fields": []})
+        frame = ws.receive_json()
+        assert frame["type"] == "error"
+    print("✓ WebSocket validation works")
+
+
+def test_list_fields_are_translated_per_element():
+    """List fields are split into per-element tasks and reassembled in order, blanks kept in place."""
+    calls = []
+
+    async def fake_packed(self, field_name, items):
+        calls.append((field_name, sorted(items.values())))
+        return {key: f"<{text}>" for key, text in items.items()}
+
+    payload = {
+        **BATCH_PAYLOAD,
+        "fields": [
+            {"field_name": "alternate_greetings", "text": ["Hi", "", "Good day"]},
+            {"field_name": "tags", "text": ["cute", "fantasy"]},
+            {"field_name": "tags", "text": []},
+        ],
+        "pack_short_fields": True,
+    }
+    with patch('src.routers.translate.get_translation_cache', return_value=None), \
+         patch('src.graphs.langgraph_translator.LangGraphCharacterCardTranslator.async_translate_packed',
+               fake_packed):
+        response = _make_client().post("/api/v1/character/batch-translate", json=payload)
+        assert response.status_code == 200
+        results = response.json()["results"]
+
+    by_name = {(r["field_name"], len(r["original_text"])): r for r in results}
+    assert by_name[("alternate_greetings", 3)]["translated_text"] == ["<Hi>", "", "<Good day>"]
+    assert by_name[("tags", 2)]["translated_text"] == ["<cute>", "<fantasy>"]
+    assert by_name[("tags", 0)]["translated_text"] == []
+    assert all(r["success"] for r in results)
+    # 短元素按提示模板打包：问候语与标签使用不同模板，分别打包
+    assert sorted(calls) == [("alternate_greetings", ["Good day", "Hi"]), ("tags", ["cute", "fantasy"])]
+    print("✓ List field translation works")
+
+
+def test_indexed_field_names_use_list_template():
+    """alternate_greetings[0] selects the same dialogue template as alternate_greetings."""
+    from src.graphs.langgraph_translator import LangGraphCharacterCardTranslator
+
+    translator = LangGraphCharacterCardTranslator(
+        model_name="gpt-3.5-turbo", base_url="https://api.openai.com/v1", api_key="sk-test-key",
+        prompts={"base_template": "Base prompt", "dialogue_template": "Dialogue prompt"},
+    )
+    assert translator._get_system_prompt("alternate_greetings[0]") == "Dialogue prompt"
+    assert translator._get_system_prompt("tags") == "Base prompt"
+    print("✓ Indexed field names work")
+
+
+if __name__ == "__main__":
+    test_ndjson_stream_emits_results_and_progress()
+    test_websocket_stream()
+    test_websocket_rejects_invalid_request()
+    test_list_fields_are_translated_per_element()
+    test_indexed_field_names_use_list_template()
+    print("All streaming tests completed successfully!")
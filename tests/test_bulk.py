@@ -0,0 +1,127 @@
+"""
+Tests for the bulk ZIP import/export endpoints.
+"""
+import sys
+import os
+import io
+import zipfile
+import tempfile
+import threading
+import time
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PIL import Image
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.extract_text import embed_text_in_bytes, extract_embedded_text
+from src.routers import bulk
+from src.services.upload_index import UploadIndex
+from src.services.io_pool import shutdown_io_executor
+
+
+def make_card(name: str, color) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buffer, format="PNG")
+    return embed_text_in_bytes(buffer.getvalue(), {"data": {"name": name}})
+
+
+def test_bulk_import_and_export_round_trip():
+    """A ZIP of cards is imported in one request and exported back as a streamed ZIP."""
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("cards/alice.png", make_card("Alice", (255, 0, 0)))
+        zf.writestr("cards/bob.png", make_card("Bob", (0, 255, 0)))
+        zf.writestr("cards/broken.png", b"not a png")
+        zf.writestr("readme.txt", b"ignored")
+
+    app = FastAPI()
+    app.include_router(bulk.router)
+    client = TestClient(app)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fake_settings = SimpleNamespace(upload_folder_abs=tmp, bulk_max_cards=10, bulk_max_card_size=1024 * 1024,
+                                        bulk_import_concurrency=4)
+        try:
+            with patch("src.routers.bulk.get_settings", return_value=fake_settings), \
+                    patch("src.routers.bulk.get_upload_index", return_value=UploadIndex(tmp)):
+                response = client.post("/api/v1/character/bulk/import",
+                                       files={"files": ("cards.zip", archive.getvalue(), "application/zip")})
+                assert response.status_code == 200
+                cards = response.json()["cards"]
+                assert [c["filename"] for c in cards] == ["cards/alice.png", "cards/bob.png", "cards/broken.png"]
+                assert [c["success"] for c in cards] == [True, True, False]
+                assert cards[0]["character_data"] == {"data": {"name": "Alice"}}
+                assert os.path.exists(os.path.join(tmp, "Alice.png"))
+
+                export_request = {"cards": [
+                    {"image_hash": cards[0]["image_hash"], "character_data": {"data": {"name": "Alice 译"}}},
+                    {"image_hash": cards[1]["image_hash"], "character_data": {"data": {"name": "Alice 译"}}},
+                ]}
+                response = client.post("/api/v1/character/bulk/export", json=export_request)
+                assert response.status_code == 200
+                with zipfile.ZipFile(io.BytesIO(response.content)) as zf:
+                    assert zf.namelist() == ["Alice_译.png", "Alice_译_2.png"]
+                    assert extract_embedded_text(zf.read("Alice_译.png")) == {"name": "Alice 译"}
+
+                missing = {"cards": [{"image_hash": "0" * 64, "character_data": {}}]}
+                assert client.post("/api/v1/character/bulk/export", json=missing).status_code == 404
+        finally:
+            shutdown_io_executor()
+    print("✓ Bulk import/export works")
+
+
+def test_bulk_import_bounds_members_in_flight():
+    """Members are read lazily and at most bulk_import_concurrency of them are processed at once."""
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for i in range(6):
+            zf.writestr(f"card{i}.png", make_card(f"Card{i}", (i * 40, 0, 0)))
+        zf.writestr("huge.png", b"\x00" * 2048)
+
+    app = FastAPI()
+    app.include_router(bulk.router)
+    client = TestClient(app)
+
+    lock = threading.Lock()
+    active = [0, 0]  # 当前并发数, 最大并发数
+    real_import_member = bulk._import_member
+
+    def tracking_import_member(*args):
+        with lock:
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+        try:
+            time.sleep(0.02)
+            return real_import_member(*args)
+        finally:
+            with lock:
+                active[0] -= 1
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fake_settings = SimpleNamespace(upload_folder_abs=tmp, bulk_max_cards=10, bulk_max_card_size=1024,
+                                        bulk_import_concurrency=2)
+        try:
+            with patch("src.routers.bulk.get_settings", return_value=fake_settings), \
+                    patch("src.routers.bulk.get_upload_index", return_value=UploadIndex(tmp)), \
+                    patch("src.routers.bulk._import_member", tracking_import_member):
+                response = client.post("/api/v1/character/bulk/import",
+                                       files={"files": ("cards.zip", archive.getvalue(), "application/zip")})
+            assert response.status_code == 200
+            cards = response.json()["cards"]
+            assert [c["success"] for c in cards] == [True] * 6 + [False]
+            assert cards[-1]["error"] == "文件过大"
+            assert active[1] == 2, active
+        finally:
+            shutdown_io_executor()
+    print("✓ Bulk import concurrency is bounded")
+
+
+if __name__ == "__main__":
+    test_bulk_import_and_export_round_trip()
+    test_bulk_import_bounds_members_in_flight()
+    print("All bulk tests completed successfully!")
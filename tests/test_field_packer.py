@@ -0,0 +1,96 @@
+"""
+Tests for packing short fields into a single LLM request.
+"""
+import sys
+import os
+import json
+import asyncio
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services.field_packer import plan_packs, parse_packed_response
+from src.graphs.langgraph_translator import LangGraphCharacterCardTranslator
+from src.batch_translate import BatchTranslator
+
+PROMPTS = {
+    "base_template": "Base prompt",
+    "description_template": "Description prompt",
+    "dialogue_template": "Dialogue prompt"
+}
+
+
+def _make_translator():
+    return LangGraphCharacterCardTranslator(
+        model_name="gpt-3.5-turbo",
+        base_url="https://api.openai.com/v1",
+        api_key="sk-test-key",
+        prompts=PROMPTS,
+    )
+
+
+def test_plan_groups_by_prompt_template():
+    """Short fields are grouped by prompt; long and lonely fields stay single."""
+    translator = _make_translator()
+    fields = [
+        {"field_name": "name", "text": "Alice"},
+        {"field_name": "personality", "text": "Curious"},
+        {"field_name": "first_mes", "text": "Hello!"},
+        {"field_name": "description", "text": "x" * 500},
+        {"field_name": "tags", "text": "fantasy"},
+    ]
+    packs, singles = plan_packs(fields, translator._get_system_prompt, 300, 1500)
+    assert packs == [[0, 1, 4]], f"Unexpected packs: {packs}"
+    assert singles == [2, 3]
+    print("✓ Pack planning works")
+
+
+def test_parse_packed_response_validates_keys():
+    """Only expected keys with string values survive parsing."""
+    raw = '```json\n{"f0": "爱丽丝", "f1": 3, "f9": "extra"}\n```'
+    assert parse_packed_response(raw, ["f0", "f1", "f2"]) == {"f0": "爱丽丝"}
+    assert parse_packed_response("not json", ["f0"]) == {}
+    print("✓ Packed response parsing works")
+
+
+def test_batch_packing_with_fallback():
+    """A packed request covers most fields; unparsed keys fall back to single calls."""
+    translator = _make_translator()
+    packed_calls = []
+    single_calls = []
+
+    async def fake_complete(label, system_prompt, text):
+        items = json.loads(text)
+        packed_calls.append(items)
+        assert system_prompt.startswith("Base prompt")
+        # Drop the last key to force a fallback
+        keys = sorted(items)[:-1]
+        return json.dumps({k: items[k].upper() for k in keys})
+
+    async def fake_translate_field(field_name, text):
+        single_calls.append(text)
+        return f"single:{text}"
+
+    translator._async_complete = fake_complete
+    translator.async_translate_field = fake_translate_field
+
+    fields = [
+        {"field_name": "name", "text": "Alice"},
+        {"field_name": "personality", "text": "Curious"},
+        {"field_name": "tags", "text": "fantasy"},
+    ]
+    batch = BatchTranslator(translator, max_concurrent=2, pack_short_fields=True)
+    results = asyncio.run(batch.translate_fields(fields))
+    by_text = {r["original_text"]: r["translated_text"] for r in results}
+
+    assert len(packed_calls) == 1
+    assert by_text == {"Alice": "ALICE", "Curious": "CURIOUS", "fantasy": "single:fantasy"}
+    assert single_calls == ["fantasy"]
+    print("✓ Batch packing with fallback works")
+
+
+if __name__ == "__main__":
+    test_plan_groups_by_prompt_template()
+    test_parse_packed_response_validates_keys()
+    test_batch_packing_with_fallback()
+    print("All packing tests completed successfully!")
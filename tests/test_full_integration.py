@@ -3,7 +3,8 @@ Full integration test for the LangGraph upgrade.
 """
 import sys
 import os
-from unittest.mock import Mock, patch
+import asyncio
+from unittest.mock import Mock, AsyncMock, patch
 
 # Add the src directory to the Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -81,7 +82,7 @@ def test_api_integration():
     mock_response.content = "你好世界"
     mock_llm.invoke.return_value = mock_response
     
-    with patch('src.translate.ChatOpenAI') as mock_chat_openai:
+    with patch('src.translate.get_chat_llm') as mock_chat_openai:
         mock_chat_openai.return_value = mock_llm
         
         # Test legacy translator
@@ -124,8 +125,44 @@ def test_batch_translator_integration():
     
     print("Batch translator integration test passed!")
 
+def test_legacy_async_translation():
+    """Test that the legacy translator exposes non-blocking async methods."""
+    print("Testing legacy async translation...")
+
+    settings = {
+        "model_name": "gpt-3.5-turbo",
+        "base_url": "https://api.openai.com/v1",
+        "api_key": "sk-test-key"
+    }
+
+    prompts = {
+        "base_template": "Translate this text",
+        "description_template": "Translate description",
+        "dialogue_template": "Translate dialogue"
+    }
+
+    mock_llm = Mock()
+    mock_response = Mock()
+    mock_response.content = "你好世界"
+    mock_llm.ainvoke = AsyncMock(return_value=mock_response)
+
+    with patch('src.translate.get_chat_llm') as mock_chat_openai:
+        mock_chat_openai.return_value = mock_llm
+
+        translator = get_translator(settings, prompts, use_langgraph=False)
+        result = asyncio.run(translator.async_translate_field("name", "Hello world"))
+        assert result == "你好世界"
+        result = asyncio.run(translator.async_translate_character_book_content("Hello world"))
+        assert result == "你好世界"
+        assert mock_llm.ainvoke.await_count == 2
+        mock_llm.invoke.assert_not_called()
+        print("✓ Legacy async translation works")
+
+    print("Legacy async translation test passed!")
+
 if __name__ == "__main__":
     test_backward_compatibility()
     test_api_integration()
     test_batch_translator_integration()
+    test_legacy_async_translation()
     print("All integration tests completed successfully!")
\ No newline at end of file
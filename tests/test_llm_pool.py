@@ -0,0 +1,67 @@
+"""
+Tests for the shared ChatOpenAI client pool.
+"""
+import sys
+import os
+import gc
+import time
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services.llm_pool import LLMClientPool
+
+
+def test_pool_reuses_clients():
+    """Same configuration returns the same LLM instance."""
+    pool = LLMClientPool(max_size=4)
+    llm_a = pool.get("gpt-3.5-turbo", "https://api.openai.com/v1", "sk-test-key")
+    llm_b = pool.get("gpt-3.5-turbo", "https://api.openai.com/v1/", "sk-test-key")
+    llm_c = pool.get("gpt-3.5-turbo", "https://api.openai.com/v1", "sk-other-key")
+    assert llm_a is llm_b, "Trailing slash should not create a new client"
+    assert llm_a is not llm_c, "Different keys must not share a client"
+    assert len(pool) == 2
+    pool.clear()
+    assert len(pool) == 0
+    print("✓ Client reuse works")
+
+
+def test_pool_bounded_and_idle_eviction():
+    """Pool evicts least recently used and idle clients."""
+    pool = LLMClientPool(max_size=2, idle_timeout=0.05)
+    first = pool.get("model-a", "https://example.com/v1", "sk-test")
+    pool.get("model-b", "https://example.com/v1", "sk-test")
+    pool.get("model-c", "https://example.com/v1", "sk-test")
+    assert len(pool) == 2, "Pool should stay within max_size"
+    assert pool.get("model-a", "https://example.com/v1", "sk-test") is not first
+
+    time.sleep(0.1)
+    pool.get("model-d", "https://example.com/v1", "sk-test")
+    assert len(pool) == 1, "Idle clients should be evicted"
+    pool.clear()
+    print("✓ Eviction works")
+
+
+def test_evicted_clients_stay_open_while_referenced():
+    """An evicted client still held by a caller keeps working and is closed once released."""
+    pool = LLMClientPool(max_size=1)
+    held = pool.get("model-a", "https://example.com/v1", "sk-test")
+    http_client = held.http_client
+    async_client = held.http_async_client
+    pool.get("model-b", "https://example.com/v1", "sk-test")
+    assert len(pool) == 1
+    assert not http_client.is_closed and not async_client.is_closed
+
+    del held
+    gc.collect()
+    # 没有运行中的事件循环时，异步客户端也会被关闭
+    assert http_client.is_closed and async_client.is_closed
+    pool.clear()
+    print("✓ Evicted clients close after release")
+
+
+if __name__ == "__main__":
+    test_pool_reuses_clients()
+    test_pool_bounded_and_idle_eviction()
+    test_evicted_clients_stay_open_while_referenced()
+    print("All pool tests completed successfully!")
@@ -0,0 +1,139 @@
+"""
+Tests for whole-lorebook translation.
+"""
+import sys
+import os
+import json
+from unittest.mock import Mock, patch
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.routers import translate as translate_router
+from src.services.lorebook import collect_lorebook_fields, rebuild_lorebook
+
+BOOK = {
+    "name": "World",
+    "description": "The world of Alice",
+    "entries": [
+        {"keys": ["rabbit", "white rabbit"], "secondary_keys": [], "comment": "Rabbit", "content": "A white rabbit"},
+        {"keys": ["rabbit", "white rabbit"], "secondary_keys": [], "comment": "Rabbit", "content": "A white rabbit"},
+        {"keys": ["queen", ""], "comment": "", "content": "The Queen of Hearts"},
+    ],
+}
+
+PAYLOAD = {
+    "character_book": BOOK,
+    "settings": {"api_key": "sk-test-key", "model_name": "gpt-3.5-turbo"},
+    "prompts": {"base_template": "Base prompt"},
+    "pack_short_fields": True,
+}
+
+
+def test_collect_and_rebuild():
+    """Contents, comments and key lists are collected with their paths and written back."""
+    fields = collect_lorebook_fields(BOOK, translate_comments=False)
+    assert [f["key"] for f in fields] == [
+        ["description"],
+        ["entries", 0, "content"], ["entries", 0, "keys"],
+        ["entries", 1, "content"], ["entries", 1, "keys"],
+        ["entries", 2, "content"], ["entries", 2, "keys"],
+    ]
+    results = [
+        {"key": ["entries", 2, "content"], "success": False, "translated_text": ""},
+        {"key": ["entries", 2, "keys"], "success": False, "translated_text": ["女王", ""]},
+    ]
+    rebuilt = rebuild_lorebook(BOOK, results)
+    assert rebuilt["entries"][2]["keys"] == ["女王", ""]
+    assert rebuilt["entries"][2]["content"] == "The Queen of Hearts"
+    assert BOOK["entries"][2]["keys"] == ["queen", ""]
+    print("✓ Lorebook collection works")
+
+
+def test_lorebook_endpoint_dedups_and_packs():
+    """Identical entries are translated once, keys and comments go out in packed requests."""
+    single_calls = []
+    packed_calls = []
+
+    async def fake_book(self, text):
+        single_calls.append(text)
+        return f"<{text}>"
+
+    async def fake_field(self, field_name, text):
+        single_calls.append(text)
+        return f"<{text}>"
+
+    async def fake_packed(self, field_name, items):
+        packed_calls.append(sorted(items.values()))
+        return {key: f"<{text}>" for key, text in items.items()}
+
+    app = FastAPI()
+    app.include_router(translate_router.router)
+    with patch('src.routers.translate.get_translation_cache', return_value=None), \
+         patch('src.graphs.langgraph_translator.LangGraphCharacterCardTranslator.async_translate_character_book_content',
+               fake_book), \
+         patch('src.graphs.langgraph_translator.LangGraphCharacterCardTranslator.async_translate_field',
+               fake_field), \
+         patch('src.graphs.langgraph_translator.LangGraphCharacterCardTranslator.async_translate_packed',
+               fake_packed):
+        response = TestClient(app).post("/api/v1/character/translate-character-book/bulk", json=PAYLOAD)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["errors"] == []
+    book = data["character_book"]
+    assert book["name"] == "World"
+    assert book["entries"][0]["content"] == book["entries"][1]["content"] == "<A white rabbit>"
+    assert book["entries"][0]["keys"] == ["<rabbit>", "<white rabbit>"]
+    assert book["entries"][2]["keys"] == ["<queen>", ""]
+    assert book["entries"][1]["comment"] == "<Rabbit>"
+    # 内容、描述与关键词、备注共用基础模板，短文本被打包，重复条目只出现一次
+    all_texts = single_calls + [t for pack in packed_calls for t in pack]
+    assert sorted(all_texts) == sorted([
+        "The world of Alice", "A white rabbit", "The Queen of Hearts",
+        "rabbit", "white rabbit", "queen", "Rabbit",
+    ])
+    assert len(single_calls) + len(packed_calls) < len(all_texts)
+    print("✓ Lorebook endpoint works")
+
+
+def test_lorebook_endpoint_packs_by_default():
+    """Without pack_short_fields the endpoint still packs, so each upstream call covers several texts."""
+    upstream_calls = []
+
+    async def fake_ainvoke(state):
+        upstream_calls.append(state["original_text"])
+        try:
+            items = json.loads(state["original_text"])
+        except ValueError:
+            items = None
+        if isinstance(items, dict):
+            translated = json.dumps({key: f"<{text}>" for key, text in items.items()}, ensure_ascii=False)
+        else:
+            translated = f"<{state['original_text']}>"
+        return {**state, "status": "completed", "translated_text": translated}
+
+    payload = {k: v for k, v in PAYLOAD.items() if k != "pack_short_fields"}
+    app = FastAPI()
+    app.include_router(translate_router.router)
+    with patch('src.routers.translate.get_translation_cache', return_value=None), \
+         patch('src.graphs.langgraph_translator.async_translation_graph', Mock(ainvoke=fake_ainvoke)):
+        response = TestClient(app).post("/api/v1/character/translate-character-book/bulk", json=payload)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["errors"] == []
+    assert data["character_book"]["entries"][2]["keys"] == ["<queen>", ""]
+    # 7 个不同文本，逐个翻译需要 7 次上游调用
+    assert len(upstream_calls) < 7, upstream_calls
+    print("✓ Lorebook endpoint packs by default")
+
+
+if __name__ == "__main__":
+    test_collect_and_rebuild()
+    test_lorebook_endpoint_dedups_and_packs()
+    test_lorebook_endpoint_packs_by_default()
+    print("All lorebook tests completed successfully!")
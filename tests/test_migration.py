@@ -0,0 +1,88 @@
+"""
+Tests for the parallel, resumable filename migration.
+"""
+import sys
+import os
+import io
+import json
+import tempfile
+from unittest.mock import patch
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PIL import Image
+
+from src.extract_text import embed_text_in_png
+from src.migration import migrate_filenames, JOURNAL_FILENAME
+
+
+def write_card(folder: str, filename: str, name: str, color=(255, 0, 0)) -> None:
+    path = os.path.join(folder, filename)
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buffer, format="PNG")
+    with open(path, "wb") as f:
+        f.write(buffer.getvalue())
+    embed_text_in_png(path, {"data": {"name": name}})
+
+
+def test_parallel_migration_renames_and_dedups():
+    """Files are renamed by character name; duplicates are removed and collisions get a suffix."""
+    with tempfile.TemporaryDirectory() as tmp:
+        write_card(tmp, "old1.png", "Alice")
+        write_card(tmp, "old2.png", "Alice")
+        write_card(tmp, "old3.png", "Alice", color=(0, 255, 0))
+        write_card(tmp, "old4.png", "Bob Smith")
+
+        counts = migrate_filenames(folder=tmp, workers=2, batch_size=2)
+        assert counts["renamed"] == 3 and counts["duplicate"] == 1, counts
+
+        pngs = sorted(f for f in os.listdir(tmp) if f.endswith(".png"))
+        assert "Alice.png" in pngs and "Bob_Smith.png" in pngs and len(pngs) == 3
+        assert not os.path.exists(os.path.join(tmp, JOURNAL_FILENAME))
+    print("✓ Parallel migration works")
+
+
+def test_migration_resumes_from_journal():
+    """Files recorded in the progress journal are not processed again."""
+    with tempfile.TemporaryDirectory() as tmp:
+        write_card(tmp, "old1.png", "Alice")
+        write_card(tmp, "old2.png", "Bob")
+        with open(os.path.join(tmp, JOURNAL_FILENAME), "w", encoding="utf-8") as f:
+            f.write(json.dumps({"filename": "old1.png", "result": "skipped"}) + "\n")
+            f.write('{"filename": "trunc')
+
+        counts = migrate_filenames(folder=tmp, workers=1)
+        assert counts["renamed"] == 1, counts
+        assert sorted(f for f in os.listdir(tmp) if f.endswith(".png")) == ["Bob.png", "old1.png"]
+    print("✓ Resumable migration works")
+
+
+def test_migration_hashes_only_colliding_files():
+    """Files whose target names are free are renamed without reading their full contents."""
+    from src.services import upload_index as upload_index_module
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_card(tmp, "old1.png", "Alice")
+        write_card(tmp, "old2.png", "Bob")
+        write_card(tmp, "old3.png", "Bob", color=(0, 0, 255))
+        hashed = []
+        real_hash = upload_index_module.hash_file
+
+        def counting_hash(path):
+            hashed.append(os.path.basename(path))
+            return real_hash(path)
+
+        with patch.object(upload_index_module, "hash_file", counting_hash):
+            counts = migrate_filenames(folder=tmp, workers=1)
+        assert counts["renamed"] == 3, counts
+        # 只有两张 Bob 冲突时才需要哈希
+        assert sorted(hashed) == ["Bob.png", "old3.png"]
+    print("✓ Lazy hashing works")
+
+
+if __name__ == "__main__":
+    test_parallel_migration_renames_and_dedups()
+    test_migration_resumes_from_journal()
+    test_migration_hashes_only_colliding_files()
+    print("All migration tests completed successfully!")
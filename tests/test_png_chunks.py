@@ -0,0 +1,280 @@
+"""
+Tests for the PNG chunk index and the embed/extract round trip.
+"""
+import sys
+import os
+import io
+import json
+import tempfile
+from types import SimpleNamespace
+from unittest.mock import patch
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from PIL import Image
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.png_chunks import (
+    index_chunks, iter_png_parts, build_chunk, iter_chunk_headers, read_chunk_data, PngStreamScanner, PNG_SIGNATURE,
+)
+from src.extract_text import (
+    extract_embedded_text, embed_text_in_png, embed_text_in_bytes, read_character_metadata, build_text_chunk,
+)
+from src.routers import upload, export
+from src.services.upload_index import UploadIndex
+from src.services.export_cache import ExportCache
+
+CARD = {"data": {"name": "爱丽丝", "description": "A curious girl"}}
+
+
+def make_png_bytes(size=(32, 32)) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (255, 0, 0)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_index_chunks_records_offsets():
+    """The index covers the whole file and ends with IEND."""
+    data = make_png_bytes()
+    chunks = index_chunks(data)
+    assert chunks[0].type == b"IHDR" and chunks[0].offset == len(PNG_SIGNATURE)
+    assert chunks[-1].type == b"IEND" and chunks[-1].end == len(data)
+    for prev, nxt in zip(chunks, chunks[1:]):
+        assert prev.end == nxt.offset
+    print("✓ Chunk index works")
+
+
+def test_iter_png_parts_replaces_text_chunks():
+    """Text chunks are dropped and new chunks are inserted before IEND."""
+    data = make_png_bytes()
+    chunks = index_chunks(data)
+    text_chunk = build_chunk(b"tEXt", b"comment\x00hello")
+    with_text = b"".join(bytes(p) for p in iter_png_parts(data, chunks, [text_chunk]))
+    rebuilt_chunks = index_chunks(with_text)
+    assert [c.type for c in rebuilt_chunks][-2:] == [b"tEXt", b"IEND"]
+
+    stripped = b"".join(bytes(p) for p in iter_png_parts(with_text, rebuilt_chunks))
+    assert stripped == data
+    print("✓ Chunk rewriting works")
+
+
+def test_embed_and_extract_round_trip():
+    """Embedding writes a valid PNG whose metadata can be read back, also in place."""
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "base.png")
+        output = os.path.join(tmp, "out.png")
+        with open(source, "wb") as f:
+            f.write(make_png_bytes())
+
+        assert embed_text_in_png(source, CARD, output) == output
+        assert extract_embedded_text(output) == CARD["data"]
+        with open(output, "rb") as f:
+            assert extract_embedded_text(f.read()) == CARD["data"]
+        Image.open(output).verify()
+
+        updated = {"data": {"name": "Bob"}}
+        assert embed_text_in_png(output, updated) == output
+        assert extract_embedded_text(output) == {"name": "Bob"}
+        assert sorted(os.listdir(tmp)) == ["base.png", "out.png"], "No temp files should remain"
+    print("✓ Embed/extract round trip works")
+
+
+class CountingFile(io.BytesIO):
+    """BytesIO that records how many bytes were read."""
+    bytes_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def test_header_only_reader_skips_image_data():
+    """The metadata reader skips IDAT payloads and stops at the first match."""
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "base.png")
+        with open(source, "wb") as f:
+            f.write(make_png_bytes(size=(512, 512)))
+        embed_text_in_png(source, CARD)
+        with open(source, "rb") as f:
+            data = f.read()
+
+    # Put an unrelated text chunk first to exercise keyword skipping
+    chunks = index_chunks(data)
+    comment = build_chunk(b"tEXt", b"Comment\x00" + b"x" * 2000)
+    data = data[:chunks[1].offset] + comment + data[chunks[1].offset:]
+
+    f = CountingFile(data)
+    assert read_character_metadata(f) == CARD["data"]
+    payload = sum(c.length for c in index_chunks(data) if c.type in (b"IDAT", b"tEXt"))
+    assert f.bytes_read < len(data) - payload + 2000, f"Read too much: {f.bytes_read} of {len(data)}"
+    assert read_character_metadata(io.BytesIO(make_png_bytes())) is None
+    print("✓ Header-only reader works")
+
+
+def test_header_reader_from_non_zero_position():
+    """Chunk offsets are absolute, so a PNG embedded after other data is read correctly."""
+    data = embed_text_in_bytes(make_png_bytes(), CARD)
+    prefix = b"leading bytes that are not part of the PNG"
+    f = io.BytesIO(prefix + data)
+    f.seek(len(prefix))
+
+    headers = list(iter_chunk_headers(f))
+    assert [c.offset for c in headers] == [len(prefix) + c.offset for c in index_chunks(data)]
+    text_chunk = next(c for c in headers if c.type == b"tEXt")
+    assert read_chunk_data(f, text_chunk, limit=6) == b"chara\x00"
+
+    f.seek(len(prefix))
+    assert read_character_metadata(f) == CARD["data"]
+    print("✓ Header reader handles non-zero start positions")
+
+
+def test_compressed_embedding_formats():
+    """zTXt/iTXt cards are smaller than tEXt and read back by every reader, including ccv3."""
+    data = make_png_bytes()
+    card = {"data": {"name": "爱丽丝", "description": "很长的描述。" * 500}}
+    sizes = {}
+    for chunk_type in (b"tEXt", b"zTXt", b"iTXt"):
+        png = embed_text_in_bytes(data, card, chunk_type=chunk_type, compression_level=9)
+        sizes[chunk_type] = len(png)
+        assert [c.type for c in index_chunks(png)].count(chunk_type) == 1
+        assert extract_embedded_text(png) == card["data"]
+        assert read_character_metadata(io.BytesIO(png)) == card["data"]
+        # Re-embedding replaces the previous metadata chunk of any type
+        again = embed_text_in_bytes(png, CARD, chunk_type=b"tEXt")
+        assert extract_embedded_text(again) == CARD["data"]
+    assert sizes[b"iTXt"] < sizes[b"zTXt"] < sizes[b"tEXt"]
+
+    v3 = {"spec": "chara_card_v3", "spec_version": "3.0", "data": {"name": "Alice"}}
+    png = embed_text_in_bytes(data, v3, chunk_type=b"iTXt")
+    keywords = [bytes(c.data(memoryview(png))).split(b"\x00", 1)[0] for c in index_chunks(png) if c.type == b"iTXt"]
+    assert keywords == [b"chara", b"ccv3"]
+    assert extract_embedded_text(png) == v3
+    print("✓ Compressed embedding works")
+
+
+def test_stream_scanner_handles_arbitrary_splits():
+    """The incremental scanner captures text chunks regardless of how the stream is split."""
+    data = make_png_bytes()
+    chunks = index_chunks(data)
+    card_png = b"".join(bytes(p) for p in iter_png_parts(data, chunks, [build_text_chunk(CARD)]))
+    expected = [(c.type, bytes(c.data(memoryview(card_png))))
+                for c in index_chunks(card_png) if c.type == b"tEXt"]
+
+    for step in (1, 7, 4096):
+        scanner = PngStreamScanner()
+        for i in range(0, len(card_png), step):
+            scanner.feed(card_png[i:i + step])
+        assert scanner.is_png and scanner.done
+        assert scanner.text_chunks == expected
+
+    scanner = PngStreamScanner()
+    scanner.feed(b"not a png at all")
+    assert scanner.is_png is False
+    print("✓ Stream scanner works")
+
+
+def test_upload_streams_and_serves_by_hash():
+    """Uploads are spooled to disk and the image is served by its content hash."""
+    data = make_png_bytes()
+    card_png = b"".join(bytes(p) for p in iter_png_parts(data, index_chunks(data), [build_text_chunk(CARD)]))
+    app = FastAPI()
+    app.include_router(upload.router)
+    client = TestClient(app)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fake_settings = SimpleNamespace(upload_folder_abs=tmp, upload_chunk_size=100)
+        with patch("src.routers.upload.get_settings", return_value=fake_settings), \
+                patch("src.routers.upload.get_upload_index", return_value=UploadIndex(tmp)):
+            for _ in range(2):
+                response = client.post("/api/v1/character/upload",
+                                       files={"file": ("card.png", card_png, "image/png")})
+                assert response.status_code == 200
+                body = response.json()
+                assert body["character_data"] == CARD
+                assert "image_b64" not in body
+
+            assert sorted(os.listdir(tmp)) == [".objects", "爱丽丝.png"]
+            image = client.get(body["image_url"])
+            assert image.status_code == 200 and image.content == card_png
+            assert client.get("/api/v1/character/image/" + "0" * 64).status_code == 404
+            assert client.get("/api/v1/character/image/..").status_code == 404
+
+            inline = client.post("/api/v1/character/upload?inline_image=true",
+                                 files={"file": ("card.png", card_png, "image/png")}).json()
+            assert inline["image_b64"].startswith("data:image/png;base64,")
+    print("✓ Streaming upload works")
+
+
+def test_upload_skips_corrupt_unrelated_text_chunks():
+    """A corrupt non-character zTXt/iTXt chunk does not fail the upload or hide the card."""
+    data = make_png_bytes()
+    corrupt = [
+        build_chunk(b"zTXt", b"Comment\x00\x00not zlib data"),
+        build_chunk(b"iTXt", b"Comment\x00\x01\x00\x00\x00not zlib data"),
+    ]
+    plain_png = b"".join(bytes(p) for p in iter_png_parts(data, index_chunks(data), corrupt))
+    card_png = b"".join(bytes(p) for p in iter_png_parts(data, index_chunks(data), corrupt + [build_text_chunk(CARD)]))
+    app = FastAPI()
+    app.include_router(upload.router)
+    client = TestClient(app)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fake_settings = SimpleNamespace(upload_folder_abs=tmp, upload_chunk_size=100)
+        with patch("src.routers.upload.get_settings", return_value=fake_settings), \
+                patch("src.routers.upload.get_upload_index", return_value=UploadIndex(tmp)):
+            response = client.post("/api/v1/character/upload", files={"file": ("plain.png", plain_png, "image/png")})
+            assert response.status_code == 200
+            assert response.json()["character_data"] == {"data": {"name": "新角色", "description": ""}}
+
+            response = client.post("/api/v1/character/upload", files={"file": ("card.png", card_png, "image/png")})
+            assert response.status_code == 200
+            assert response.json()["character_data"] == CARD
+    assert extract_embedded_text(card_png) == CARD["data"]
+    print("✓ Corrupt unrelated text chunks are skipped")
+
+
+def test_export_embeds_in_memory():
+    """Export re-embeds the card in memory and serves repeats from the export cache."""
+    data = make_png_bytes()
+    assert extract_embedded_text(embed_text_in_bytes(data, CARD)) == CARD["data"]
+
+    app = FastAPI()
+    app.include_router(export.router)
+    client = TestClient(app)
+
+    def post(image):
+        return client.post("/api/v1/character/export",
+                           data={"json_data": json.dumps(CARD)},
+                           files={"image_file": ("base.png", image, "image/png")})
+
+    with patch("src.routers.export.get_export_cache", return_value=ExportCache()):
+        response = post(data)
+        assert response.status_code == 200
+        assert extract_embedded_text(response.content) == CARD["data"]
+        assert response.headers["content-length"] == str(len(response.content))
+        assert "filename*=utf-8''" in response.headers["content-disposition"]
+
+        with patch("src.routers.export.embed_text_in_bytes") as embed:
+            assert post(data).content == response.content
+            embed.assert_not_called()
+
+        assert post(b"not a png").status_code == 400
+    print("✓ In-memory export works")
+
+
+if __name__ == "__main__":
+    test_index_chunks_records_offsets()
+    test_iter_png_parts_replaces_text_chunks()
+    test_embed_and_extract_round_trip()
+    test_header_only_reader_skips_image_data()
+    test_header_reader_from_non_zero_position()
+    test_compressed_embedding_formats()
+    test_stream_scanner_handles_arbitrary_splits()
+    test_upload_streams_and_serves_by_hash()
+    test_upload_skips_corrupt_unrelated_text_chunks()
+    test_export_embeds_in_memory()
+    print("All PNG chunk tests completed successfully!")
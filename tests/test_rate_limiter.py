@@ -0,0 +1,161 @@
+"""
+Tests for the adaptive (AIMD) upstream concurrency limiter.
+"""
+import sys
+import os
+import asyncio
+import time
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from unittest.mock import Mock, patch
+
+import httpx
+import openai
+
+from src.services.rate_limiter import AdaptiveConcurrencyLimiter, TokenBucketLimiter, get_adaptive_limiter
+from src.errors import parse_openai_error, parse_http_error, ErrorCode, TranslationError
+from src.graphs.langgraph_translator import LangGraphCharacterCardTranslator
+from src.batch_translate import BatchTranslator
+
+
+def test_aimd_adjustments():
+    """Limits grow on success and halve on overload errors only."""
+    limiter = AdaptiveConcurrencyLimiter(initial=4, max_limit=8, decrease_cooldown=0)
+    for _ in range(8):
+        limiter.record_success()
+    assert 5 < limiter.limit < 6, f"Unexpected limit after successes: {limiter.limit}"
+
+    limiter.record_failure(parse_http_error(401))
+    assert 5 < limiter.limit < 6, "Auth errors must not shrink concurrency"
+
+    limiter.record_failure(parse_http_error(503))
+    assert 2.5 < limiter.limit < 3, f"Unexpected limit after 503: {limiter.limit}"
+    print("✓ AIMD adjustments work")
+
+
+def test_retry_after_is_extracted_and_honoured():
+    """Retry-After hints from messages pause the limiter."""
+    error = parse_openai_error(Exception("Error code: 429 - Rate limit reached. Please try again in 2s."))
+    assert error.error_code == ErrorCode.RATE_LIMIT_ERROR
+    assert error.retry_after == 2
+
+    limiter = AdaptiveConcurrencyLimiter(initial=2)
+    limiter.record_failure(error)
+    assert limiter.blocked_until > time.monotonic() + 1
+    print("✓ Retry-After handling works")
+
+
+def test_rate_limit_without_retry_after_backs_off_per_key():
+    """A bare 429 pauses only that key's limiter, with a short exponential backoff."""
+    error = parse_openai_error(Exception("Error code: 429 - Too many requests"))
+    assert error.error_code == ErrorCode.RATE_LIMIT_ERROR
+    assert error.retry_after is None
+    assert parse_http_error(429).retry_after is None
+
+    limiter = AdaptiveConcurrencyLimiter(initial=2, decrease_cooldown=0)
+    now = time.monotonic()
+    with patch("src.services.rate_limiter.time.monotonic", return_value=now):
+        limiter.record_failure(error)
+        assert limiter.blocked_until == now + 1
+        limiter.record_failure(error)
+        assert limiter.blocked_until == now + 2
+        limiter.record_success()
+        limiter.blocked_until = 0.0
+        limiter.record_failure(error)
+        assert limiter.blocked_until == now + 1, "A success resets the backoff"
+
+    url = "https://limiter-test.example/v1"
+    first = get_adaptive_limiter(url, "sk-first", "gpt-4o")
+    assert get_adaptive_limiter(url + "/", "sk-first", "gpt-4o") is first
+    assert get_adaptive_limiter(url, "sk-second", "gpt-4o") is not first
+    print("✓ Per-key rate limit backoff works")
+
+
+def test_graph_keeps_retry_after_header():
+    """A 429 whose delay is only in the Retry-After header keeps it through the LangGraph path."""
+    response = httpx.Response(429, headers={"retry-after": "7"},
+                              request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+    upstream_error = openai.RateLimitError("Error code: 429 - Rate limit reached", response=response, body=None)
+
+    async def failing_ainvoke(messages):
+        raise upstream_error
+
+    translator = LangGraphCharacterCardTranslator(
+        model_name="gpt-3.5-turbo",
+        base_url="https://api.openai.com/v1",
+        api_key="sk-test-key",
+        prompts={"base_template": "Base"},
+    )
+    with patch("src.graphs.translation_graph.get_chat_llm", return_value=Mock(ainvoke=failing_ainvoke)):
+        try:
+            asyncio.run(translator.async_translate_field("name", "alice"))
+            error = None
+        except TranslationError as e:
+            error = e
+    assert error is not None, "Expected a TranslationError"
+    assert error.error_code == ErrorCode.RATE_LIMIT_ERROR
+    assert error.http_status == 429 and error.retry_after == 7
+
+    limiter = AdaptiveConcurrencyLimiter(initial=2)
+    limiter.record_failure(error)
+    assert limiter.blocked_until > time.monotonic() + 6
+    print("✓ Retry-After header survives the translation graph")
+
+
+def test_batch_retries_until_success_and_stops_on_auth():
+    """Batch calls retry transient errors and stop immediately on auth errors."""
+    prompts = {"base_template": "Base", "description_template": "Desc", "dialogue_template": "Dialogue"}
+    translator = LangGraphCharacterCardTranslator(
+        model_name="gpt-3.5-turbo",
+        base_url="https://api.openai.com/v1",
+        api_key="sk-test-key",
+        prompts=prompts,
+    )
+    calls = {"name": 0, "personality": 0}
+
+    async def flaky_translate_field(field_name, text):
+        calls[field_name] += 1
+        if field_name == "personality":
+            raise Exception("Incorrect API key provided: invalid_api_key")
+        if calls[field_name] < 2:
+            raise Exception("Error code: 429 - Rate limit reached. Please try again in 0.01s.")
+        return text.upper()
+
+    translator.async_translate_field = flaky_translate_field
+    limiter = AdaptiveConcurrencyLimiter(initial=2)
+    batch = BatchTranslator(translator, max_concurrent=2, limiter=limiter)
+    results = asyncio.run(batch.translate_fields([
+        {"field_name": "name", "text": "alice"},
+        {"field_name": "personality", "text": "curious"},
+    ]))
+    by_field = {r["field_name"]: r for r in results}
+
+    assert by_field["name"]["success"] and by_field["name"]["attempts"] == 2
+    assert not by_field["personality"]["success"]
+    assert calls["personality"] == 1, "Auth errors must not be retried"
+    print("✓ Batch retry policy works")
+
+
+def test_token_bucket_paces_requests():
+    """The bucket allows a burst up to its budget, then paces calls."""
+    bucket = TokenBucketLimiter(requests_per_minute=60, tokens_per_minute=600)
+    with patch("src.services.rate_limiter.time.monotonic", return_value=bucket._updated):
+        assert bucket.reserve(100) == 0
+        assert bucket.reserve(500) == 0
+        # Token budget exhausted: 100 tokens at 10 tokens/s
+        assert abs(bucket.reserve(100) - 10.0) < 1e-6
+        # Oversized requests are capped at one full bucket
+        assert abs(bucket.reserve(10_000) - 70.0) < 1e-6
+    print("✓ Token bucket pacing works")
+
+
+if __name__ == "__main__":
+    test_aimd_adjustments()
+    test_retry_after_is_extracted_and_honoured()
+    test_rate_limit_without_retry_after_backs_off_per_key()
+    test_graph_keeps_retry_after_header()
+    test_batch_retries_until_success_and_stops_on_auth()
+    test_token_bucket_paces_requests()
+    print("All rate limiter tests completed successfully!")
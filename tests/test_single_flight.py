@@ -0,0 +1,142 @@
+"""
+Tests for in-flight deduplication of identical translations.
+"""
+import sys
+import os
+import asyncio
+from unittest.mock import patch
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services.single_flight import SingleFlight
+from src.graphs.langgraph_translator import LangGraphCharacterCardTranslator
+from src.batch_translate import BatchTranslator
+
+PROMPTS = {
+    "base_template": "Base prompt",
+    "description_template": "Description prompt",
+    "dialogue_template": "Dialogue prompt"
+}
+
+
+def _make_translator(api_key="sk-test-key"):
+    return LangGraphCharacterCardTranslator(
+        model_name="gpt-3.5-turbo",
+        base_url="https://api.openai.com/v1",
+        api_key=api_key,
+        prompts=PROMPTS,
+    )
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    """Concurrent callers with the same key get one call's result; errors fan out too."""
+    async def run():
+        flight = SingleFlight()
+        calls = []
+
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "译文"
+
+        results = await asyncio.gather(*(flight.do("same", call) for _ in range(5)), flight.do("other", call))
+        assert results == ["译文"] * 6
+        assert len(calls) == 2 and flight.coalesced == 4
+        assert flight.in_flight() == 0
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream down")
+
+        outcomes = await asyncio.gather(flight.do("bad", fail), flight.do("bad", fail), return_exceptions=True)
+        assert all(isinstance(o, ValueError) for o in outcomes)
+
+    asyncio.run(run())
+    print("✓ Single-flight coalescing works")
+
+
+def test_cancelled_waiter_does_not_cancel_others():
+    """The upstream call survives a cancelled waiter and is cancelled only when nobody waits."""
+    async def run():
+        flight = SingleFlight()
+        started = asyncio.Event()
+        cancelled = []
+
+        async def call():
+            started.set()
+            try:
+                await asyncio.sleep(0.05)
+            except asyncio.CancelledError:
+                cancelled.append(1)
+                raise
+            return "译文"
+
+        first = asyncio.ensure_future(flight.do("key", call))
+        second = asyncio.ensure_future(flight.do("key", call))
+        await started.wait()
+        first.cancel()
+        assert await second == "译文"
+        assert not cancelled
+
+        only = asyncio.ensure_future(flight.do("key", call))
+        await asyncio.sleep(0.01)
+        only.cancel()
+        await asyncio.sleep(0.01)
+        assert cancelled == [1]
+
+    asyncio.run(run())
+    print("✓ Waiter cancellation works")
+
+
+def test_duplicates_translate_once():
+    """Duplicate fields in one batch, and identical concurrent requests, are sent upstream once."""
+    calls = []
+
+    async def fake_ainvoke(state):
+        calls.append(state["original_text"])
+        await asyncio.sleep(0.01)
+        return {"translated_text": f"<{state['original_text']}>", "status": "completed", "error_message": None}
+
+    fields = [
+        {"field_name": "name", "text": "Alice", "key": ["a"]},
+        {"field_name": "character_book.content", "text": "Alice", "key": ["b"]},
+        {"field_name": "name", "text": "Bob", "key": ["c"]},
+        {"field_name": "description", "text": "Alice", "key": ["d"]},
+    ]
+    with patch('src.graphs.langgraph_translator.async_translation_graph') as mock_graph:
+        mock_graph.ainvoke.side_effect = fake_ainvoke
+        batch_translator = BatchTranslator(_make_translator(), max_concurrent=4, pack_short_fields=False)
+        results = asyncio.run(batch_translator.translate_fields(fields))
+
+        # 两个请求各自的翻译器并发翻译同一文本，也只调用一次上游
+        async def two_requests():
+            return await asyncio.gather(
+                _make_translator().async_translate_field("name", "Carol"),
+                _make_translator().async_translate_field("name", "Carol"),
+            )
+        assert asyncio.run(two_requests()) == ["<Carol>", "<Carol>"]
+
+        # 不同 API Key 的请求各自调用上游，不共享他人的密钥与错误
+        async def two_users():
+            return await asyncio.gather(
+                _make_translator("sk-user-a").async_translate_field("name", "Dave"),
+                _make_translator("sk-user-b").async_translate_field("name", "Dave"),
+            )
+        assert asyncio.run(two_users()) == ["<Dave>", "<Dave>"]
+
+    # name 与 character_book.content 共用基础模板，description 使用独立模板
+    assert sorted(calls) == ["Alice", "Alice", "Bob", "Carol", "Dave", "Dave"]
+    by_key = {tuple(r["key"]): r for r in results}
+    assert len(by_key) == 4
+    assert by_key[("b",)]["field_name"] == "character_book.content"
+    assert by_key[("b",)]["translated_text"] == "<Alice>"
+    assert all(r["success"] for r in results)
+    print("✓ In-batch deduplication works")
+
+
+if __name__ == "__main__":
+    test_concurrent_calls_share_one_upstream_call()
+    test_cancelled_waiter_does_not_cancel_others()
+    test_duplicates_translate_once()
+    print("All single-flight tests completed successfully!")
@@ -0,0 +1,91 @@
+"""
+Tests for long-field segmentation and parallel segment dispatch.
+"""
+import sys
+import os
+import asyncio
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services.text_segmenter import split_text, join_segments
+from src.graphs.langgraph_translator import LangGraphCharacterCardTranslator
+from src.batch_translate import BatchTranslator
+
+MES_EXAMPLE = (
+    "<START>\n{{user}}: Hello there.\n{{char}}: Hi! Nice to meet you.\n\n"
+    "<START>\n{{user}}: How are you?\n{{char}}: I am fine, thank you. And you?\n\n"
+    "<START>\n{{user}}: Goodbye.\n{{char}}: See you later!\n"
+)
+
+
+def test_short_text_is_single_segment():
+    """Texts within the limit are not split."""
+    segments = split_text("Hello world", 100)
+    assert len(segments) == 1
+    assert segments[0].text == "Hello world"
+    print("✓ Short text handling works")
+
+
+def test_split_preserves_text_and_markers():
+    """Segments respect <START> markers and reassemble to the original text."""
+    segments = split_text(MES_EXAMPLE, 80)
+    assert len(segments) > 1
+    for seg in segments:
+        assert len(seg.leading + seg.text + seg.trailing) <= 80
+        assert "{{" not in seg.text or seg.text.count("{{") == seg.text.count("}}")
+    assert all(seg.text.startswith("<START>") for seg in segments)
+    assert join_segments(segments, [seg.text for seg in segments]) == MES_EXAMPLE
+    print("✓ Segment boundaries work")
+
+
+def test_hard_split_does_not_break_macros():
+    """Hard splits never cut through a {{macro}}."""
+    text = ("x" * 18) + "{{char}}" + ("y" * 30)
+    segments = split_text(text, 20)
+    assert "".join(seg.leading + seg.text + seg.trailing for seg in segments) == text
+    assert any("{{char}}" in seg.text for seg in segments)
+
+    # 长度切分点恰好落在 {{user}} 的两个左花括号之间
+    text = "abcdefghij{{user}}xyz {{char}}xyz"
+    assert text[10:12] == "{{"
+    segments = split_text(text, 11)
+    assert "".join(seg.leading + seg.text + seg.trailing for seg in segments) == text
+    for seg in segments:
+        assert not seg.text.endswith("{") and not seg.text.startswith("{u")
+        assert seg.text.count("{{") == seg.text.count("}}")
+    print("✓ Macro-aware hard split works")
+
+
+def test_batch_translator_dispatches_segments():
+    """Long fields are translated per segment and reassembled in order."""
+    prompts = {"base_template": "Base", "description_template": "Desc", "dialogue_template": "Dialogue"}
+    translator = LangGraphCharacterCardTranslator(
+        model_name="gpt-3.5-turbo",
+        base_url="https://api.openai.com/v1",
+        api_key="sk-test-key",
+        prompts=prompts,
+    )
+    calls = []
+
+    async def fake_translate_field(field_name, text):
+        calls.append(text)
+        await asyncio.sleep(0.01 * (3 - len(calls)))
+        return text.upper()
+
+    translator.async_translate_field = fake_translate_field
+    batch = BatchTranslator(translator, max_concurrent=3, segment_max_chars=80)
+    results = asyncio.run(batch.translate_fields([{"field_name": "mes_example", "text": MES_EXAMPLE}]))
+
+    assert len(calls) == 3, f"Expected 3 segment calls, got {len(calls)}"
+    assert results[0]["success"]
+    assert results[0]["translated_text"] == MES_EXAMPLE.upper()
+    print("✓ Segment dispatch works")
+
+
+if __name__ == "__main__":
+    test_short_text_is_single_segment()
+    test_split_preserves_text_and_markers()
+    test_hard_split_does_not_break_macros()
+    test_batch_translator_dispatches_segments()
+    print("All segmenter tests completed successfully!")
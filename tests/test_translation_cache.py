@@ -0,0 +1,111 @@
+"""
+Tests for the content-addressed translation cache.
+"""
+import sys
+import os
+import tempfile
+from unittest.mock import patch
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services.translation_cache import TranslationCache, make_cache_key
+from src.graphs.langgraph_translator import LangGraphCharacterCardTranslator
+
+
+def test_cache_memory_and_disk_tiers():
+    """Entries survive a new cache instance through the SQLite tier."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.sqlite3")
+        key = make_cache_key("gpt-3.5-turbo", "Base prompt", "Hello world")
+
+        cache = TranslationCache(db_path=db_path, memory_size=2)
+        assert cache.get(key) is None
+        cache.set(key, "你好世界")
+        assert cache.get(key) == "你好世界"
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 1
+        cache.close()
+
+        reopened = TranslationCache(db_path=db_path, memory_size=2)
+        assert reopened.get(key) == "你好世界", "Disk tier should persist entries"
+        reopened.close()
+    print("✓ Cache tiers work")
+
+
+def test_disk_hits_are_read_only():
+    """Disk hits only read; access times are written in a batch with the next write."""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.sqlite3")
+        key = make_cache_key("m", "p", "hit")
+        with patch("src.services.translation_cache.time.time", return_value=1000.0):
+            cache = TranslationCache(db_path=db_path, memory_size=0)
+            cache.set(key, "value")
+
+        statements = []
+        cache._conn.set_trace_callback(statements.append)
+        with patch("src.services.translation_cache.time.time", return_value=2000.0):
+            assert cache.get(key) == "value"
+        assert statements and all(sql.lstrip().upper().startswith("SELECT") for sql in statements), statements
+
+        accessed = "SELECT accessed_at FROM translations WHERE key = ?"
+        assert cache._conn.execute(accessed, (key,)).fetchone()[0] == 1000.0
+        with patch("src.services.translation_cache.time.time", return_value=3000.0):
+            cache.set(make_cache_key("m", "p", "other"), "other")
+        assert cache._conn.execute(accessed, (key,)).fetchone()[0] == 2000.0
+        cache.close()
+    print("✓ Disk hits are read-only")
+
+
+def test_cache_ttl_expiry():
+    """Expired entries are treated as misses."""
+    cache = TranslationCache(ttl=1)
+    key = make_cache_key("m", "p", "t")
+    with patch("src.services.translation_cache.time.time", return_value=1000.0):
+        cache.set(key, "value")
+    with patch("src.services.translation_cache.time.time", return_value=1002.0):
+        assert cache.get(key) is None
+    print("✓ TTL expiry works")
+
+
+def test_translator_uses_cache():
+    """A cached field is not sent to the translation graph again."""
+    prompts = {
+        "base_template": "Base prompt",
+        "description_template": "Description prompt",
+        "dialogue_template": "Dialogue prompt"
+    }
+    translator = LangGraphCharacterCardTranslator(
+        model_name="gpt-3.5-turbo",
+        base_url="https://api.openai.com/v1",
+        api_key="sk-test-key",
+        prompts=prompts,
+        glossary="Alice -> 爱丽丝",
+        cache=TranslationCache(),
+    )
+    mock_result = {
+        "field_name": "name",
+        "original_text": "Hello world",
+        "translated_text": "你好世界",
+        "status": "completed",
+        "error_message": None
+    }
+
+    with patch('src.graphs.langgraph_translator.translation_graph') as mock_graph:
+        mock_graph.invoke.return_value = mock_result
+        assert translator.translate_field("name", "Hello world") == "你好世界"
+        assert translator.translate_field("name", "Hello world") == "你好世界"
+        mock_graph.invoke.assert_called_once()
+
+        # A different prompt template must not share the entry
+        translator.translate_field("description", "Hello world")
+        assert mock_graph.invoke.call_count == 2
+    print("✓ Translator cache integration works")
+
+
+if __name__ == "__main__":
+    test_cache_memory_and_disk_tiers()
+    test_disk_hits_are_read_only()
+    test_cache_ttl_expiry()
+    test_translator_uses_cache()
+    print("All cache tests completed successfully!")
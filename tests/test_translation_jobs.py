@@ -0,0 +1,107 @@
+"""
+Tests for the card-level translation job engine.
+"""
+import sys
+import os
+import json
+import tempfile
+from unittest.mock import patch
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.routers import jobs as jobs_router
+from src.services.translation_jobs import TranslationJobManager, collect_card_fields, apply_translations
+from src.services.work_queue import SharedWorkQueue
+
+CARD = {
+    "spec": "chara_card_v2",
+    "data": {
+        "name": "Alice",
+        "description": "A curious girl",
+        "first_mes": "Hello!",
+        "personality": "   ",
+        "alternate_greetings": ["Hi", "Good day"],
+        "character_book": {"entries": [{"keys": ["rabbit"], "content": "A white rabbit"}]},
+    },
+}
+
+JOB_PAYLOAD = {
+    "character_data": CARD,
+    "settings": {"api_key": "sk-test-key", "model_name": "gpt-3.5-turbo"},
+    "prompts": {"base_template": "Base prompt"},
+}
+
+
+async def fake_translate_field(self, field_name, text):
+    return f"[{field_name}] {text}"
+
+
+async def fake_translate_book(self, text):
+    return f"[book] {text}"
+
+
+def test_collect_and_apply_card_fields():
+    """All translatable card fields are collected with their paths and written back in place."""
+    fields = collect_card_fields(CARD)
+    assert [f["key"] for f in fields] == [
+        ["description"], ["first_mes"],
+        ["alternate_greetings", 0], ["alternate_greetings", 1],
+        ["character_book", "entries", 0, "content"],
+    ]
+    results = [{"key": f["key"], "success": True, "translated_text": f["text"].upper()} for f in fields]
+    results[1]["success"] = False
+    translated = apply_translations(CARD, results)
+    assert translated["data"]["alternate_greetings"] == ["HI", "GOOD DAY"]
+    assert translated["data"]["first_mes"] == "Hello!"
+    assert translated["data"]["character_book"]["entries"][0]["content"] == "A WHITE RABBIT"
+    assert CARD["data"]["description"] == "A curious girl"
+    print("✓ Card field collection works")
+
+
+def test_job_runs_in_background_and_streams():
+    """A submitted job translates the whole card in the background; status and stream report results."""
+    app = FastAPI()
+    app.include_router(jobs_router.router)
+    tmpdir = tempfile.mkdtemp()
+    queue = SharedWorkQueue(os.path.join(tmpdir, "jobs.sqlite3"))
+    manager = TranslationJobManager(queue, poll_interval=0.01)
+    with patch('src.services.translation_jobs.get_translation_cache', return_value=None), \
+         patch('src.routers.jobs.get_job_manager', return_value=manager), \
+         patch('src.graphs.langgraph_translator.LangGraphCharacterCardTranslator.async_translate_field',
+               fake_translate_field), \
+         patch('src.graphs.langgraph_translator.LangGraphCharacterCardTranslator.async_translate_character_book_content',
+               fake_translate_book), \
+         TestClient(app) as client:
+        response = client.post("/api/v1/character/translate-jobs", json=JOB_PAYLOAD)
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        assert response.json()["total"] == 5
+
+        frames = [json.loads(line) for line in
+                  client.get(f"/api/v1/character/translate-jobs/{job_id}/stream").text.splitlines()]
+        assert frames[0]["type"] == "progress"
+        assert len([f for f in frames if f["type"] == "result"]) == 5
+        done = frames[-1]["job"]
+        assert done["status"] == "completed"
+        data = done["character_data"]["data"]
+        assert data["alternate_greetings"] == ["[alternate_greetings] Hi", "[alternate_greetings] Good day"]
+        assert data["character_book"]["entries"][0]["content"] == "[book] A white rabbit"
+
+        status = client.get(f"/api/v1/character/translate-jobs/{job_id}?include_results=true").json()
+        assert status["completed"] == 5 and len(status["results"]) == 5
+        assert client.delete(f"/api/v1/character/translate-jobs/{job_id}").status_code == 409
+        assert client.get("/api/v1/character/translate-jobs/missing").status_code == 404
+        # API 设置在任务结束后从队列中清除
+        assert queue._conn.execute("SELECT options FROM jobs").fetchone()[0] is None
+    queue.close()
+    print("✓ Background translation job works")
+
+
+if __name__ == "__main__":
+    test_collect_and_apply_card_fields()
+    test_job_runs_in_background_and_streams()
+    print("All translation job tests completed successfully!")
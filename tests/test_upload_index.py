@@ -0,0 +1,98 @@
+"""
+Tests for the content-hash index of the uploads folder.
+"""
+import sys
+import os
+import hashlib
+import tempfile
+from unittest.mock import patch
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services.upload_index import UploadIndex
+from src.utils import handle_uploaded_file
+
+CARD = {"data": {"name": "Alice Liddell"}}
+
+
+def test_sync_is_incremental():
+    """Only new or changed files are hashed again; deleted files are dropped."""
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, content in (("a.png", b"aaa"), ("b.png", b"bbb")):
+            with open(os.path.join(tmp, name), "wb") as f:
+                f.write(content)
+        db_path = os.path.join(tmp, "index.sqlite3")
+
+        index = UploadIndex(tmp, db_path=db_path)
+        assert index.sync() == {"files": 2, "hashed": 2, "removed": 0}
+        index.close()
+
+        os.remove(os.path.join(tmp, "b.png"))
+        index = UploadIndex(tmp, db_path=db_path)
+        assert index.sync() == {"files": 1, "hashed": 0, "removed": 1}
+        assert index.find_by_hash(hashlib.sha256(b"aaa").hexdigest()) == "a.png"
+        assert index.find_by_hash(hashlib.sha256(b"bbb").hexdigest()) is None
+        index.close()
+    print("✓ Incremental sync works")
+
+
+def test_uploads_use_index_instead_of_rehashing():
+    """Duplicate and collision checks are answered from the index."""
+    with tempfile.TemporaryDirectory() as tmp:
+        index = UploadIndex(tmp)
+        first = handle_uploaded_file(b"card-v1", tmp, CARD, index)
+        assert os.path.basename(first) == "Alice_Liddell.png"
+
+        with patch("src.utils.hash_file") as hash_file, patch("src.services.upload_index.hash_file") as index_hash:
+            assert handle_uploaded_file(b"card-v1", tmp, CARD, index) == first
+            second = handle_uploaded_file(b"card-v2", tmp, CARD, index)
+            assert handle_uploaded_file(b"card-v2", tmp, CARD, index) == second
+            hash_file.assert_not_called()
+            index_hash.assert_not_called()
+
+        assert os.path.basename(second).startswith("Alice_Liddell_")
+        assert sorted(os.listdir(tmp)) == sorted(["Alice_Liddell.png", os.path.basename(second)])
+
+        # Files changed behind the index's back are re-hashed on lookup
+        with open(first, "wb") as f:
+            f.write(b"edited-on-disk")
+        assert index.get_hash("Alice_Liddell.png") == hashlib.sha256(b"edited-on-disk").hexdigest()
+    print("✓ Index-backed dedup works")
+
+
+def test_concurrent_sync_does_not_hold_write_lock():
+    """A second index (another worker process) can write while the first is still hashing."""
+    from src.services import upload_index as upload_index_module
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(3):
+            with open(os.path.join(tmp, f"{i}.png"), "wb") as f:
+                f.write(bytes([i]) * 10)
+        db_path = os.path.join(tmp, "index.sqlite3")
+        first = UploadIndex(tmp, db_path=db_path)
+        second = UploadIndex(tmp, db_path=db_path)
+        second._conn.execute("PRAGMA busy_timeout = 0")
+
+        real_hash = upload_index_module.hash_file
+        writes = []
+
+        def hash_while_other_writes(path):
+            # 第一个进程哈希下一个文件时，另一个进程的写入不应被锁住
+            second.remove("missing.png")
+            writes.append(path)
+            return real_hash(path)
+
+        with patch.object(upload_index_module, "hash_file", hash_while_other_writes):
+            assert first.sync()["hashed"] == 3
+        assert len(writes) == 3
+        first.close()
+        second.close()
+    print("✓ Concurrent sync works")
+
+
+if __name__ == "__main__":
+    test_sync_is_incremental()
+    test_concurrent_sync_does_not_hold_write_lock()
+    test_uploads_use_index_instead_of_rehashing()
+    print("All upload index tests completed successfully!")
@@ -0,0 +1,140 @@
+"""
+Tests for the cross-process shared work queue.
+"""
+import sys
+import os
+import stat
+import tempfile
+import time
+from unittest.mock import patch
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services.work_queue import SharedWorkQueue
+
+OPTIONS = {"settings": {"api_key": "sk-test-key"}}
+
+
+def _fields(n):
+    return [{"field_name": "description", "text": f"text {i}", "key": [i]} for i in range(n)]
+
+
+def _open_queue(**kwargs):
+    return SharedWorkQueue(os.path.join(tempfile.mkdtemp(), "queue.sqlite3"), **kwargs)
+
+
+def test_global_budget_is_shared():
+    """Two connections (as two worker processes) share one lease budget."""
+    queue = _open_queue(global_budget=3)
+    other = SharedWorkQueue(queue.db_path, global_budget=3)
+    queue.enqueue_job("job", OPTIONS, {"data": {}}, _fields(5))
+
+    first = queue.lease("worker-a", 2)
+    second = other.lease("worker-b", 5)
+    assert len(first) == 2 and len(second) == 1
+    assert other.lease("worker-b", 5) == []
+    assert first[0][3] == OPTIONS and first[0][2]["text"] == "text 0"
+    assert queue.get_job("job")["status"] == "running"
+    queue.close()
+    other.close()
+    print("✓ Global lease budget works")
+
+
+def test_complete_and_expired_lease():
+    """Expired leases are re-leased by another owner; stale owners cannot complete them."""
+    queue = _open_queue(lease_seconds=0.05)
+    queue.enqueue_job("job", OPTIONS, {"data": {}}, _fields(2))
+    leased = queue.lease("worker-a", 2)
+    task_a, task_b = leased[0][0], leased[1][0]
+    assert queue.complete(task_a, "worker-a", {"key": [0], "success": True})
+
+    time.sleep(0.1)
+    released = queue.lease("worker-b", 2)
+    assert [t[0] for t in released] == [task_b]
+    assert not queue.complete(task_b, "worker-a", {"key": [1], "success": True})
+    assert queue.complete(task_b, "worker-b", {"key": [1], "success": True})
+
+    job = queue.get_job("job")
+    assert job["status"] == "completed" and len(job["results"]) == 2
+    assert queue._conn.execute("SELECT options FROM jobs").fetchone()[0] is None
+    queue.close()
+    print("✓ Lease expiry and completion work")
+
+
+def test_release_cancel_and_prune():
+    """Released tasks are immediately available; cancelled jobs stop handing out tasks."""
+    queue = _open_queue()
+    queue.enqueue_job("job", OPTIONS, {"data": {}}, _fields(2))
+    leased = queue.lease("worker-a", 1)
+    queue.release("worker-a", [leased[0][0]])
+    assert [t[0] for t in queue.lease("worker-b", 1)] == [leased[0][0]]
+
+    assert queue.cancel_job("job")
+    assert not queue.cancel_job("job")
+    assert queue.lease("worker-b", 5) == []
+    assert queue.get_job("job")["status"] == "cancelled"
+
+    queue.enqueue_job("empty", OPTIONS, {"data": {}}, [])
+    assert queue.get_job("empty")["status"] == "completed"
+    assert queue.prune(-1) == 2
+    assert queue.get_job("job") is None
+    queue.close()
+    print("✓ Release, cancel and prune work")
+
+
+def test_release_fails_tasks_after_max_attempts():
+    """A task that keeps failing is not re-queued forever; its job finishes with a failed result."""
+    queue = _open_queue(max_attempts=2)
+    queue.enqueue_job("job", OPTIONS, {"data": {}}, _fields(1))
+    for attempt in range(2):
+        leased = queue.lease("worker-a", 1)
+        assert len(leased) == 1
+        queue.release("worker-a", [leased[0][0]], "boom")
+    assert queue.lease("worker-a", 1) == []
+
+    job = queue.get_job("job")
+    assert job["status"] == "completed"
+    assert job["results"][0]["success"] is False and job["results"][0]["error"] == "boom"
+    assert job["results"][0]["key"] == [0]
+    queue.close()
+    print("✓ Max attempts on release works")
+
+
+def test_results_follow_commit_order():
+    """Results are ordered by commit, even when an earlier timestamp commits later."""
+    queue = _open_queue()
+    queue.enqueue_job("job", OPTIONS, {"data": {}}, _fields(3))
+    leased = queue.lease("worker-a", 3)
+    seen = []
+    for (task_id, _, field_data, _), now in zip(leased, (300.0, 200.0, 100.0)):
+        with patch("src.services.work_queue.time.time", return_value=now):
+            queue.complete(task_id, "worker-a", {"key": field_data["key"], "success": True})
+        # 增量读取：已读到的前缀保持不变
+        results = queue.get_job("job")["results"]
+        assert results[:len(seen)] == seen
+        seen = results
+    assert [r["key"] for r in seen] == [[0], [1], [2]]
+    queue.close()
+    print("✓ Results follow commit order")
+
+
+def test_queue_file_is_private():
+    """The queue database holds API keys, so only its owner may read it."""
+    queue = _open_queue()
+    assert stat.S_IMODE(os.stat(queue.db_path).st_mode) == 0o600
+    queue.enqueue_job("job", OPTIONS, {"data": {}}, _fields(1))
+    assert queue.cancel_job("job")
+    assert queue._conn.execute("SELECT options FROM jobs").fetchone()[0] is None
+    queue.close()
+    print("✓ Queue database permissions work")
+
+
+if __name__ == "__main__":
+    test_global_budget_is_shared()
+    test_complete_and_expired_lease()
+    test_release_cancel_and_prune()
+    test_release_fails_tasks_after_max_attempts()
+    test_results_follow_commit_order()
+    test_queue_file_is_private()
+    print("All work queue tests completed successfully!")
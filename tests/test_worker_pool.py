@@ -0,0 +1,62 @@
+"""
+Tests for the shared batch worker pool.
+"""
+import sys
+import os
+import asyncio
+
+# Add the src directory to the Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services.worker_pool import BatchWorkerPool
+from src.graphs.langgraph_translator import LangGraphCharacterCardTranslator
+from src.batch_translate import BatchTranslator
+
+
+def _make_translator():
+    prompts = {"base_template": "Base", "description_template": "Desc", "dialogue_template": "Dialogue"}
+    return LangGraphCharacterCardTranslator(
+        model_name="gpt-3.5-turbo",
+        base_url="https://api.openai.com/v1",
+        api_key="sk-test-key",
+        prompts=prompts,
+    )
+
+
+def test_global_cap_applies_across_batches():
+    """Concurrent batches share one executor and one global concurrency cap."""
+    pool = BatchWorkerPool(max_concurrent=2)
+    in_flight = 0
+    peak = 0
+
+    async def fake_translate_field(field_name, text):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return text
+
+    batches = []
+    for _ in range(3):
+        translator = _make_translator()
+        translator.async_translate_field = fake_translate_field
+        batches.append(BatchTranslator(translator, max_concurrent=3, worker_pool=pool))
+
+    assert batches[0].executor is batches[1].executor, "Executor should be shared"
+
+    fields = [{"field_name": "name", "text": f"text {i}"} for i in range(4)]
+
+    async def run_all():
+        return await asyncio.gather(*(b.translate_fields(fields) for b in batches))
+
+    results = asyncio.run(run_all())
+    assert all(r["success"] for batch in results for r in batch)
+    assert peak <= 2, f"Global cap exceeded: {peak}"
+    pool.shutdown()
+    print("✓ Global concurrency cap works")
+
+
+if __name__ == "__main__":
+    test_global_cap_applies_across_batches()
+    print("All worker pool tests completed successfully!")
@@ -56,16 +56,18 @@ export interface Prompts {
 
 export interface BatchFieldItem {
   field_name: string;
-  text: string;
+  /** 列表字段（alternate_greetings、tags）传字符串数组，由后端逐元素翻译并按原顺序返回 */
+  text: string | string[];
 }
 
 export interface BatchResultItem {
   field_name: string;
-  original_text: string;
-  translated_text: string;
+  original_text: string | string[];
+  translated_text: string | string[];
   success: boolean;
   error?: string;
   attempts: number;
+  resumed?: boolean;
 }
 
 export interface ChatMessage {
@@ -85,7 +87,9 @@ export async function uploadCharacterCard(file: File) {
   });
   return response.data as {
     character_data: Record<string, any>;
-    image_b64: string;
+    image_url: string;
+    image_hash: string;
+    image_b64?: string;
   };
 }
 
@@ -124,12 +128,35 @@ export async function translateCharacterBook(params: {
   return response.data as { translated_content: string };
 }
 
+export async function translateLorebook(params: {
+  character_book: Record<string, any>;
+  settings: TranslationSettings;
+  prompts: Prompts;
+  glossary?: string;
+  use_langgraph?: boolean;
+  translate_keys?: boolean;
+  translate_comments?: boolean;
+}) {
+  const response = await apiClient.post('/character/translate-character-book/bulk', {
+    ...params,
+    glossary: params.glossary ?? '',
+    use_langgraph: params.use_langgraph ?? true,
+  }, { timeout: 0 }); // 整本角色书耗时与条目数相关，不设超时
+  return response.data as {
+    character_book: Record<string, any>;
+    progress: { completed: number; total: number };
+    errors: string[];
+  };
+}
+
 export async function batchTranslate(params: {
   fields: BatchFieldItem[];
   settings: TranslationSettings;
   prompts: Prompts;
   glossary?: string;
   use_langgraph?: boolean;
+  /** 批次 ID：中断后以相同 ID 重试时跳过已完成的字段 */
+  batch_id?: string;
 }) {
   const response = await apiClient.post('/character/batch-translate', {
     ...params,
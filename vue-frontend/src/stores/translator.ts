@@ -8,6 +8,7 @@ import {
   uploadCharacterCard as apiUpload,
   translateField as apiTranslate,
   batchTranslate as apiBatchTranslate,
+  translateLorebook as apiTranslateLorebook,
   exportCardAsImage as apiExportImage,
 } from '@/services/api';
 
@@ -22,6 +23,15 @@ function base64ToBlob(base64: string, mimeType: string): Blob {
   return new Blob([byteArray], { type: mimeType });
 }
 
+function readFileAsDataURL(file: File): Promise<string> {
+  return new Promise((resolve, reject) => {
+    const reader = new FileReader();
+    reader.onload = () => resolve(reader.result as string);
+    reader.onerror = () => reject(reader.error);
+    reader.readAsDataURL(file);
+  });
+}
+
 // --- Store Definition ---
 const CARD_STORAGE_KEY = 'characterCard';
 const SETTINGS_STORAGE_KEY = 'translationSettings';
@@ -148,9 +158,10 @@ export const useTranslatorStore = defineStore('translator', () => {
   const handleCardUpload = async (file: File) => {
     isLoading.value = true;
     try {
-      const data = await apiUpload(file);
+      // 图片预览在本地读取，服务端只返回按内容哈希寻址的图片 URL
+      const [data, imageDataUrl] = await Promise.all([apiUpload(file), readFileAsDataURL(file)]);
       characterCard.value = data.character_data as unknown as CharacterCard;
-      characterImageB64.value = data.image_b64;
+      characterImageB64.value = imageDataUrl;
       ElMessage.success('角色卡解析成功！');
     } catch (error: any) {
       ElNotification.error({ title: '上传失败', message: error.message || '解析角色卡失败' });
@@ -199,7 +210,7 @@ export const useTranslatorStore = defineStore('translator', () => {
     }
 
     // 收集所有需要翻译的字段
-    const fieldsToTranslate: { field_name: string; text: string }[] = [];
+    const fieldsToTranslate: { field_name: string; text: string | string[] }[] = [];
 
     const mainFields = [
       'data.description', 'data.personality', 'data.scenario',
@@ -213,13 +224,11 @@ export const useTranslatorStore = defineStore('translator', () => {
       }
     }
 
-    const greetings = get(characterCard.value, 'data.alternate_greetings', []) as string[];
-    if (Array.isArray(greetings)) {
-      for (let i = 0; i < greetings.length; i++) {
-        const greeting = greetings[i] as string;
-        if (greeting && typeof greeting === 'string' && greeting.trim()) {
-          fieldsToTranslate.push({ field_name: `alternate_greetings[${i}]`, text: greeting });
-        }
+    // 列表字段整体提交，后端逐元素并行翻译并保持下标对齐
+    for (const listField of ['alternate_greetings', 'tags']) {
+      const items = get(characterCard.value, `data.${listField}`, []);
+      if (Array.isArray(items) && items.some((item) => typeof item === 'string' && item.trim())) {
+        fieldsToTranslate.push({ field_name: listField, text: items.map((item) => String(item ?? '')) });
       }
     }
 
@@ -267,8 +276,13 @@ export const useTranslatorStore = defineStore('translator', () => {
       let completedCount = 0;
 
       for (const result of data.results) {
-        if (result.success) {
-          const path = `data.${result.field_name}`;
+        const path = `data.${result.field_name}`;
+        if (Array.isArray(result.translated_text)) {
+          // 列表字段：失败的元素保留原文
+          const original = result.original_text as string[];
+          set(characterCard.value, path, result.translated_text.map((text, i) => text || original[i]));
+          if (result.success) successCount++;
+        } else if (result.success) {
           set(characterCard.value, path, result.translated_text);
           successCount++;
         }
@@ -293,6 +307,38 @@ export const useTranslatorStore = defineStore('translator', () => {
     }
   };
 
+  const translateLorebook = async () => {
+    const characterBook = get(characterCard.value, 'data.character_book');
+    if (!characterCard.value || !characterBook) return;
+    if (!translationSettings.value.api_key) {
+      ElMessage.warning('请先在设置中提供您的 API Key');
+      return;
+    }
+    isLoading.value = true;
+    try {
+      const data = await apiTranslateLorebook({
+        character_book: characterBook,
+        settings: _getSettingsPayload(),
+        prompts: translationSettings.value.prompts,
+        glossary: buildGlossaryPromptText(),
+      });
+      set(characterCard.value, 'data.character_book', data.character_book);
+      const { completed } = data.progress;
+      if (data.errors.length) {
+        ElNotification.warning({
+          title: '角色书翻译部分完成',
+          message: `成功翻译 ${completed - data.errors.length}/${completed} 个字段，失败的字段保留原文`,
+        });
+      } else {
+        ElMessage.success(`角色书翻译完成，共 ${completed} 个字段`);
+      }
+    } catch (error: any) {
+      ElNotification.error({ title: '角色书翻译失败', message: error.message || '翻译服务出错' });
+    } finally {
+      isLoading.value = false;
+    }
+  };
+
   const exportCardAsImage = async () => {
     if (!characterCard.value || !characterImageB64.value) {
       ElMessage.error('没有角色卡数据或基础图片可供导出');
@@ -451,6 +497,7 @@ export const useTranslatorStore = defineStore('translator', () => {
     updateBaseImage,
     translateField,
     batchTranslate,
+    translateLorebook,
     exportCardAsImage,
     resetStore,
     exportCardAsJson,